@@ -0,0 +1,297 @@
+"""
+Polymarket套利机器人 - 基准测试
+基于可复现的合成市场数据测量检测、数据库、签名和完整扫描周期的耗时
+
+    python benchmark.py --markets 2000 --outcomes 3 --depth 10 --output bench.json
+    python benchmark.py --compare baseline.json bench.json --threshold 10
+
+内存基准用 tracemalloc 记录单次运行的峰值分配和运行结束后仍被结果引用的内存
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.arbitrage_bot import ArbitrageBot
+from src.arbitrage_detector import ArbitrageDetector
+from src.clock import SimulatedClock
+from src.database import TradeDatabase
+from src.metrics import LatencyHistogram
+from src.models import Order, OrderBook, Trade
+from src.synthetic import SyntheticAPI, SyntheticMarketGenerator
+from src.trade_executor import OrderSigner, TradeExecutor
+
+logger = logging.getLogger("Benchmark")
+
+# 固定的测试私钥，仅用于签名基准
+BENCH_PRIVATE_KEY = "0x" + "11" * 32
+
+
+def measure(fn: Callable[[], None], repeat: int, ops: int, setup: Optional[Callable[[], None]] = None) -> Dict:
+    """重复运行 fn，返回耗时统计（setup 不计时）"""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    median = statistics.median(timings)
+    return {
+        "repeat": repeat,
+        "ops": ops,
+        "min_s": min(timings),
+        "median_s": median,
+        "mean_s": statistics.mean(timings),
+        "per_op_us": median / ops * 1e6 if ops else 0.0,
+    }
+
+
+def measure_memory(fn: Callable[[], object]) -> Dict:
+    """运行一次 fn，返回峰值分配和结果仍占用的内存 (KB)"""
+    tracemalloc.start()
+    try:
+        result = fn()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"peak_kb": round(peak / 1024, 1), "retained_kb": round(retained / 1024, 1)}
+
+
+def make_trades(count: int) -> List[Trade]:
+    """生成用于数据库基准的交易记录"""
+    now = datetime.now()
+    trades = []
+    for i in range(count):
+        buy = Order(f"bench_buy_{i}", f"synthetic-{i % 500}", 0, 0.45, 10.0, True, 4.5, now)
+        sell = Order(f"bench_sell_{i}", f"synthetic-{i % 500}", 1, 0.5, 10.0, True, 5.0, now)
+        trades.append(Trade(
+            trade_id=f"bench_trade_{i}",
+            opportunity_id=f"bench_opp_{i}",
+            market_id=buy.market_id,
+            buy_order=buy,
+            sell_order=sell,
+            profit_amount=0.5 + (i % 17) * 0.01,
+            profit_percentage=5.26,
+            status="closed" if i % 3 else "executed",
+            executed_at=now,
+            closed_at=now,
+            leg_orders=[buy, sell]
+        ))
+    return trades
+
+
+def run_benchmarks(args) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+    """运行全部基准项，返回 (耗时结果, 内存结果)"""
+    # 检测和执行过程中的逐条日志会显著影响耗时，基准期间只保留警告
+    logging.getLogger("src").setLevel(logging.WARNING)
+    logging.getLogger("ArbitrageBot").setLevel(logging.WARNING)
+    generator = SyntheticMarketGenerator(
+        num_markets=args.markets,
+        num_outcomes=args.outcomes,
+        depth=args.depth,
+        seed=args.seed
+    )
+    api = SyntheticAPI(generator)
+    markets = generator.markets
+    raw_books = [generator.order_book(market["id"]) for market in markets]
+    books = [OrderBook.from_dict(raw, market["id"]) for market, raw in zip(markets, raw_books)]
+    outcomes = list(range(args.outcomes))
+    results = {}
+    memory = {}
+
+    def bench(name: str, fn: Callable[[], None], ops: int, setup: Optional[Callable[[], None]] = None, repeat: int = args.repeat):
+        results[name] = measure(fn, repeat, ops, setup)
+        logger.info(f"{name:<40} {results[name]['median_s'] * 1000:10.2f} ms  {results[name]['per_op_us']:10.2f} us/op")
+
+    def bench_memory(name: str, fn: Callable[[], object]):
+        memory[name] = measure_memory(fn)
+        logger.info(f"{name:<40} 峰值 {memory[name]['peak_kb']:10.1f} KB  保留 {memory[name]['retained_kb']:10.1f} KB")
+
+    # 检测
+    loop_detector = ArbitrageDetector(api, args.min_profit)
+    batch_detector = ArbitrageDetector(api, args.min_profit, engine="batch")
+    basket_detector = ArbitrageDetector(api, args.min_profit, strategy="basket")
+    prescreen_detector = ArbitrageDetector(api, args.min_profit, prescreen=True)
+    bench("detect_opportunities.loop", lambda: loop_detector.detect_opportunities(markets), len(markets))
+    bench("detect_opportunities.batch", lambda: batch_detector.detect_opportunities(markets), len(markets))
+    bench("detect_opportunities.basket", lambda: basket_detector.detect_opportunities(markets), len(markets))
+    bench("detect_opportunities.prescreen", lambda: prescreen_detector.detect_opportunities(markets), len(markets))
+    bench("detect_candidates.loop", lambda: loop_detector.detect_candidates(markets), len(markets))
+
+    # 检测的辅助函数
+    bench("helper.order_book_from_dict",
+          lambda: [OrderBook.from_dict(raw, market["id"]) for market, raw in zip(markets, raw_books)], len(markets))
+    bench("helper.detect_market_opportunities",
+          lambda: [loop_detector._detect_market_opportunities(market["id"], market, book)
+                   for market, book in zip(markets, books)], len(markets))
+    bench("helper.calculate_executable_size",
+          lambda: [loop_detector._calculate_executable_size(book, outcomes) for book in books], len(books))
+    bench("helper.passes_prescreen",
+          lambda: [prescreen_detector._passes_prescreen(market) for market in markets], len(markets))
+    entries = [(market["id"], args.outcomes, book) for market, book in zip(markets, books)]
+    bench("helper.batch_pack_top_of_book",
+          lambda: batch_detector.batch_detector.pack_top_of_book(entries), len(entries))
+
+    # 指标记录（每次记录的开销预算为 1 微秒）
+    histogram = LatencyHistogram("bench")
+    samples = [(i * 7919) % 50_000_000 for i in range(10000)]
+    bench("metrics.histogram_record", lambda: [histogram.record(value) for value in samples], len(samples))
+    
+    # 数据库
+    temp_dir = tempfile.mkdtemp(prefix="benchmark_")
+    trades = make_trades(args.trades)
+    state = {}
+
+    def fresh_db(write_behind: bool):
+        def setup():
+            if state.get("db"):
+                state["db"].close()
+            path = os.path.join(temp_dir, f"trades_{time.perf_counter_ns()}.db")
+            state["db"] = TradeDatabase(path, write_behind=write_behind)
+        return setup
+
+    def save_all():
+        db = state["db"]
+        for trade in trades:
+            db.save_trade(trade)
+        db.flush()
+
+    try:
+        bench("database.save_trade.sync", save_all, len(trades), setup=fresh_db(False))
+        bench("database.save_trade.write_behind", save_all, len(trades), setup=fresh_db(True))
+        reads = 200
+        bench("database.get_statistics", lambda: [state["db"].get_statistics() for _ in range(reads)], reads)
+        bench("database.get_trades_by_status",
+              lambda: [state["db"].get_trades_by_status("closed", 100) for _ in range(reads)], reads)
+        bench("database.get_trade",
+              lambda: [state["db"].get_trade(f"bench_trade_{i}") for i in range(reads)], reads)
+
+        # 签名
+        signer = OrderSigner(BENCH_PRIVATE_KEY)
+        order_data = {"market_id": "synthetic-0", "token_id": 0, "price": 0.45, "quantity": 10.0,
+                      "is_buy": True, "signer": signer.address}
+        bench("signer.sign_order", lambda: [signer.sign_order(order_data) for _ in range(args.signatures)],
+              args.signatures)
+
+        # 完整扫描周期：合成接口 + 模拟执行 + 数据库写入（模拟时钟，平仓前不真正等待）
+        clock = SimulatedClock()
+        scan_db = TradeDatabase(os.path.join(temp_dir, "scan.db"), write_behind=True)
+        executor = TradeExecutor(api, signer, enable_trading=False, clock=clock)
+        bot = ArbitrageBot(api, ArbitrageDetector(api, args.min_profit, clock=clock), executor, scan_db, clock=clock)
+        bench("bot.scan_cycle", bot._scan_for_opportunities, len(markets))
+
+        # 内存：单次运行的分配量（检测器与扫描周期已预热）
+        bench_memory("memory.detect_opportunities", lambda: loop_detector.detect_opportunities(markets))
+        bench_memory("memory.detect_candidates", lambda: loop_detector.detect_candidates(markets))
+        bench_memory("memory.bot.scan_cycle", bot._scan_for_opportunities)
+        scan_db.close()
+    finally:
+        if state.get("db"):
+            state["db"].close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return results, memory
+
+
+def compare(baseline_path: str, current_path: str, threshold_pct: float) -> bool:
+    """比较两次运行的中位耗时和峰值内存，返回是否存在性能回退"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline_report = json.load(f)
+    with open(current_path, "r", encoding="utf-8") as f:
+        current_report = json.load(f)
+    baseline = baseline_report["results"]
+    current = current_report["results"]
+
+    regressed = False
+    for name in sorted(set(baseline) | set(current)):
+        if name not in baseline or name not in current:
+            logger.info(f"{name:<40} {'仅存在于一次运行中':>20}")
+            continue
+        before = baseline[name]["median_s"]
+        after = current[name]["median_s"]
+        change = (after - before) / before * 100 if before else 0.0
+        flag = ""
+        if change > threshold_pct:
+            flag = "  <-- 回退"
+            regressed = True
+        elif change < -threshold_pct:
+            flag = "  (提升)"
+        logger.info(f"{name:<40} {before * 1000:10.2f} ms -> {after * 1000:10.2f} ms  {change:+7.1f}%{flag}")
+
+    # 较早的结果文件没有内存数据
+    baseline_memory = baseline_report.get("memory", {})
+    current_memory = current_report.get("memory", {})
+    for name in sorted(set(baseline_memory) & set(current_memory)):
+        before = baseline_memory[name]["peak_kb"]
+        after = current_memory[name]["peak_kb"]
+        change = (after - before) / before * 100 if before else 0.0
+        flag = ""
+        if change > threshold_pct:
+            flag = "  <-- 回退"
+            regressed = True
+        elif change < -threshold_pct:
+            flag = "  (提升)"
+        logger.info(f"{name:<40} {before:10.1f} KB -> {after:10.1f} KB  {change:+7.1f}%{flag}")
+
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Polymarket套利机器人基准测试")
+    parser.add_argument("--markets", type=int, default=1000, help="合成市场数")
+    parser.add_argument("--outcomes", type=int, default=2, help="每个市场的结果数")
+    parser.add_argument("--depth", type=int, default=5, help="每个结果每侧的订单簿档位数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-profit", type=float, default=0.5, help="最小利润率 (%%)")
+    parser.add_argument("--trades", type=int, default=2000, help="数据库基准写入的交易数")
+    parser.add_argument("--signatures", type=int, default=200, help="签名基准的签名次数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数（取中位数）")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果输出文件 (JSON)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="比较两次运行的结果")
+    parser.add_argument("--threshold", type=float, default=10.0, help="判定为回退的耗时增幅 (%%)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.compare:
+        regressed = compare(args.compare[0], args.compare[1], args.threshold)
+        sys.exit(1 if regressed else 0)
+
+    results, memory = run_benchmarks(args)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "markets": args.markets,
+            "outcomes": args.outcomes,
+            "depth": args.depth,
+            "seed": args.seed,
+            "min_profit": args.min_profit,
+            "trades": args.trades,
+            "repeat": args.repeat,
+        },
+        "results": results,
+        "memory": memory,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
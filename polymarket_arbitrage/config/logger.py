@@ -1,32 +1,225 @@
+"""
+日志配置
+调用线程只把日志记录放入有界队列，格式化和磁盘 / 控制台写入都在后台线程中完成，
+日志文件卡顿不会拖慢检测和下单；队列满时丢弃新记录而不是阻塞
+"""
+import atexit
+import glob
+import json
 import logging
 import os
+import queue
+import threading
+import time
 from datetime import datetime
+from logging.handlers import BaseRotatingHandler, QueueHandler, QueueListener
+from typing import Optional
+
+# 后台写入的共享状态：所有通过 setup_logger 配置的记录器共用一个队列和一个写线程
+_lock = threading.Lock()
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+_listener: Optional[QueueListener] = None
+
+# 延迟格式化时可以安全保留到后台线程的参数类型（不可变，之后不会被修改）
+_IMMUTABLE_ARGS = (str, int, float, bool, type(None))
+
+# 项目模块 (src.*) 的公共父记录器：各模块用 getLogger(__name__)，在这里统一挂上队列处理器
+PACKAGE_LOGGER = "src"
+
+# LogRecord 的标准属性，其余属性视为 extra 字段
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    把记录放入有界队列的处理器
+    参数都是不可变的标量时保留 msg / args，由后台线程格式化；
+    否则立即格式化，避免后台线程看到之后被修改的对象
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # 异常的回溯在当前线程格式化，不把帧对象交给后台线程
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """紧凑的 JSON-lines 格式：每条记录一行，extra 字段原样附加"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.threadName != "MainThread":
+            entry["thread"] = record.threadName
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class SizeAndTimeRotatingFileHandler(BaseRotatingHandler):
+    """
+    按大小或时间（先到者为准）轮转的文件处理器
+    轮转后的文件名为 "<文件名>.<时间戳>[.<序号>]"，不会相互覆盖；只保留最新的 backup_count 个
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int = 50 * 1024 * 1024,
+        interval: float = 24 * 3600,
+        backup_count: int = 14,
+        encoding: str = "utf-8"
+    ):
+        super().__init__(filename, "a", encoding=encoding)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        self._next_rollover = time.time() + interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.interval and time.time() >= self._next_rollover:
+            return True
+        if self.max_bytes and self.stream is not None:
+            self.stream.seek(0, 2)
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        target = f"{self.baseFilename}.{stamp}"
+        index = 1
+        while os.path.exists(target):
+            target = f"{self.baseFilename}.{stamp}.{index}"
+            index += 1
+        if os.path.exists(self.baseFilename):
+            self.rotate(self.baseFilename, target)
+
+        if self.backup_count:
+            backups = sorted(glob.glob(glob.escape(self.baseFilename) + ".*"), key=os.path.getmtime)
+            for path in backups[:-self.backup_count]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        self.stream = self._open()
+        self._next_rollover = time.time() + self.interval
+
+
+def _create_queue_handler(
+    log_format: str,
+    queue_size: int,
+    rotate_bytes: int,
+    rotate_interval: float,
+    backup_count: int
+) -> NonBlockingQueueHandler:
+    """创建文件 / 控制台处理器及其后台写线程"""
+    global _listener
 
-def setup_logger(name: str, log_level: str = "INFO") -> logging.Logger:
-    """配置日志记录器"""
-    logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, log_level))
-    
-    # 文件处理器
     log_dir = "logs"
     os.makedirs(log_dir, exist_ok=True)
-    
-    log_file = os.path.join(log_dir, f"arbitrage_{datetime.now().strftime('%Y%m%d')}.log")
-    fh = logging.FileHandler(log_file)
-    fh.setLevel(getattr(logging, log_level))
-    
+
+    text_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if log_format == "json":
+        fh = SizeAndTimeRotatingFileHandler(
+            os.path.join(log_dir, "arbitrage.jsonl"),
+            max_bytes=rotate_bytes,
+            interval=rotate_interval,
+            backup_count=backup_count
+        )
+        fh.setFormatter(JsonLinesFormatter())
+    else:
+        fh = logging.FileHandler(os.path.join(log_dir, f"arbitrage_{datetime.now().strftime('%Y%m%d')}.log"))
+        fh.setFormatter(text_formatter)
+
     # 控制台处理器
     ch = logging.StreamHandler()
-    ch.setLevel(getattr(logging, log_level))
-    
-    # 格式化器
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    fh.setFormatter(formatter)
-    ch.setFormatter(formatter)
-    
-    logger.addHandler(fh)
-    logger.addHandler(ch)
-    
+    ch.setFormatter(text_formatter)
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    # 级别由各记录器控制，处理器不再重复过滤
+    _listener = QueueListener(handler.queue, fh, ch, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return handler
+
+
+def setup_logger(
+    name: str,
+    log_level: str = "INFO",
+    log_format: str = "text",
+    queue_size: int = 10000,
+    rotate_bytes: int = 50 * 1024 * 1024,
+    rotate_interval: float = 24 * 3600,
+    backup_count: int = 14
+) -> logging.Logger:
+    """
+    配置日志记录器（可重复调用，不会重复添加处理器）
+    队列处理器同时挂到 src 父记录器上，各模块（检测器、执行器等）的记录同样由后台线程写出，
+    不会落到同步写 stderr 的 logging.lastResort；src 的级别与 log_level 一致
+    log_format: text=每日一个文本文件, json=按大小 / 时间轮转的 JSON-lines 文件；
+    输出格式和队列参数以第一次调用为准
+    """
+    global _queue_handler
+
+    level = getattr(logging, log_level)
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    package = logging.getLogger(PACKAGE_LOGGER)
+    package.setLevel(level)
+
+    with _lock:
+        if _queue_handler is None:
+            _queue_handler = _create_queue_handler(log_format, queue_size, rotate_bytes, rotate_interval, backup_count)
+        if _queue_handler not in package.handlers:
+            package.addHandler(_queue_handler)
+        # src 下的记录器经父记录器输出，不再单独挂处理器
+        if not _is_package_logger(name) and _queue_handler not in logger.handlers:
+            logger.addHandler(_queue_handler)
+
     return logger
+
+
+def _is_package_logger(name: str) -> bool:
+    return name == PACKAGE_LOGGER or name.startswith(PACKAGE_LOGGER + ".")
+
+
+def dropped_log_records() -> int:
+    """因队列满而丢弃的日志记录数"""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+def shutdown_logging():
+    """写出队列中剩余的记录并停止后台写线程（程序退出时自动调用）"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
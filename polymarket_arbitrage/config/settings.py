@@ -24,13 +24,97 @@ class PolymarketConfig:
     MIN_PROFIT_PERCENTAGE: float = 0.5  # 最小利润率 (%)
     MAX_POSITION_SIZE: float = 100.0    # 最大头寸大小 (USDC)
     GAS_LIMIT: int = 500000
+    CLOSE_DELAY: float = 1.0  # 成交后延时平仓的时间 (秒)，由调度器执行，不阻塞扫描
+    CONCURRENT_LEGS: bool = True  # 各腿预先签名后并发提交（否则逐腿提交）
     
     # 监控配置
     CHECK_INTERVAL: int = 5  # 检查间隔 (秒)
+    FETCH_CONCURRENCY: int = 8  # 并发获取订单簿的线程数 (1=串行)
+    MARKET_PAGE_SIZE: int = 100  # 市场列表分页大小
+    MAX_MARKETS: int = 0  # 每轮最多扫描的市场数 (0=不限)
+    DETECTION_ENGINE: str = "loop"  # 检测引擎: loop=逐市场检测, batch=NumPy向量化批量检测
+    DETECTION_BATCH_SIZE: int = 256  # batch引擎每批打包的市场数
+    ARBITRAGE_STRATEGY: str = "pair"  # 检测策略: pair=互补对, basket=整篮, both=两者（二元市场只检测互补对，避免同一笔交易重复出现）
+    IMMEDIATE_EXECUTION_PROFIT_PCT: float = 2.0  # 扫描模式下利润率不低于此值的机会检测到即执行，其余在本轮结束时按利润率排序执行 (<=0 时全部排序)
+    # 获取订单簿前先用市场列表中的指示价格预筛选；指示价格滞后时可能漏掉真实订单簿上的机会，默认关闭
+    PRESCREEN_MARKETS: bool = os.getenv("PRESCREEN_MARKETS", "false").lower() == "true"
+    PRESCREEN_SLACK_PCT: float = 0.25  # 预筛选宽容度 (百分点)，指示价格利润率 >= 最小利润率 - 宽容度 才获取订单簿
+    
+    # 跨市场检测（扫描模式和 --adaptive）：同一互斥事件 (negRisk) 的各市场组内比较
+    CROSS_MARKET_ENABLED: bool = os.getenv("CROSS_MARKET_ENABLED", "false").lower() == "true"
+    CROSS_MARKET_MAX_BOOK_AGE: float = 30.0  # 组内任一成员的订单簿超过此时间 (秒) 未更新时跳过该事件
+    
+    # 流水线模式配置 (--pipeline)
+    PIPELINE_QUEUE_SIZE: int = 1000  # 各阶段之间的队列容量
+    PIPELINE_DETECT_WORKERS: int = 2  # 检测阶段线程数（获取阶段使用 FETCH_CONCURRENCY）
+    PIPELINE_EXECUTE_QUEUE_SIZE: int = 20  # 待执行机会队列容量，满时丢弃最旧的机会
+    PIPELINE_STATS_INTERVAL: float = 30.0  # 输出各阶段队列深度和吞吐量的间隔 (秒)
+    
+    # 自适应扫描模式配置 (--adaptive)：按波动率、机会频率、流动性和到期时间为每个市场设定轮询间隔
+    SCAN_REQUEST_BUDGET: float = 20.0  # 订单簿请求预算 (次/秒)，所有市场共享
+    SCAN_MIN_INTERVAL: float = 0.5  # 最热市场的轮询间隔 (秒)，低于 RESPONSE_CACHE_TTL 时会命中缓存
+    SCAN_MAX_INTERVAL: float = 300.0  # 最冷市场的轮询间隔 (秒)
+    SCAN_OPPORTUNITY_HALF_LIFE: float = 600.0  # 机会频率的衰减半衰期 (秒)
+    SCAN_MARKET_REFRESH: float = 60.0  # 重新获取市场列表的间隔 (秒)
+    
+    # 分片扫描模式配置 (--shards N)：市场按 ID 哈希分配到多个工作进程
+    SHARD_MAX_MARKETS: int = 8192  # 每个分片在共享内存中发布最优报价的市场数上限
+    SHARD_MAX_CANDIDATES: int = 1024  # 每个分片每轮写回的候选机会上限（超出时保留利润率最高的）
+    SHARD_MAX_OUTCOMES: int = 8  # 共享内存中每个市场的结果数上限
+    SHARD_TIMEOUT: float = 60.0  # 等待单个分片完成一轮扫描的最长时间 (秒)
+    
+    # 集群模式配置 (--coordinator / --node)：多个扫描节点由一个协调者分配分片、裁决执行权
+    CLUSTER_HOST: str = os.getenv("CLUSTER_HOST", "127.0.0.1")
+    CLUSTER_PORT: int = int(os.getenv("CLUSTER_PORT", "9200"))
+    CLUSTER_SHARDS: int = 64  # 市场分片数（远大于节点数，重新平衡时移动的市场更少）
+    CLUSTER_HEARTBEAT_INTERVAL: float = 2.0  # 节点心跳间隔 (秒)
+    CLUSTER_HEARTBEAT_TIMEOUT: float = 10.0  # 超过此时间没有心跳的节点被移除 (秒)
+    CLUSTER_LEASE_TTL: float = 30.0  # 执行权租约的最长时间 (秒)，节点未归还时自动失效
+    CLUSTER_DEDUP_WINDOW: float = 60.0  # 机会去重 / 已成交机会不再授予执行权的时间窗口 (秒)
+    CLUSTER_STATS_INTERVAL: float = 30.0  # 协调者输出统计的间隔 (秒)
+    
+    # API响应缓存配置
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL: float = 1.0  # 缓存有效期 (秒)，过期后发起条件请求重新验证
+    RESPONSE_CACHE_MAX_ENTRIES: int = 5000  # 最大缓存条目数
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 最大缓存字节数
+    # 跳过订单簿内容自上次扫描以来未变化的市场；仍然存在的机会不会在后续扫描中再次检测，默认关闭
+    SKIP_UNCHANGED_BOOKS: bool = os.getenv("SKIP_UNCHANGED_BOOKS", "false").lower() == "true"
+    
+    # 订单簿快照记录（用于事后复现检测结果）
+    RECORD_BOOKS: bool = os.getenv("RECORD_BOOKS", "false").lower() == "true"
+    RECORD_DIR: str = os.getenv("RECORD_DIR", "book_records")
+    RECORD_QUEUE_SIZE: int = 10000  # 待写快照队列容量，满时丢弃新快照（不阻塞扫描）
+    
+    # 订单簿推送配置（订阅模式）
+    FEED_HOST: str = os.getenv("FEED_HOST", "127.0.0.1")
+    FEED_PORT: int = int(os.getenv("FEED_PORT", "9100"))
+    FEED_RECONNECT_ATTEMPTS: int = 5  # 推送连接断开后的最大连续重连次数，全部失败时停止机器人
+    FEED_RECONNECT_DELAY: float = 1.0  # 首次重连前的等待时间 (秒)，每次失败后翻倍
     LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")  # text=每日文本文件, json=按大小/时间轮转的 JSON-lines
+    LOG_QUEUE_SIZE: int = 10000  # 待写日志队列容量，满时丢弃新记录（不阻塞交易线程）
+    LOG_ROTATE_BYTES: int = 50 * 1024 * 1024  # json 日志文件达到此大小时轮转
+    LOG_ROTATE_INTERVAL: float = 24 * 3600  # json 日志文件的最长使用时间 (秒)
+    LOG_BACKUP_COUNT: int = 14  # 保留的已轮转 json 日志文件数
     ENABLE_TRADING: bool = os.getenv("ENABLE_TRADING", "false").lower() == "true"
     
+    # 指标导出（Prometheus 文本格式，0=关闭）
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
+    
+    # 慢周期分析：扫描周期超过阈值时写出该周期的折叠栈采样
+    PROFILE_SLOW_CYCLES: bool = os.getenv("PROFILE_SLOW_CYCLES", "false").lower() == "true"
+    PROFILE_THRESHOLD: float = 0.0  # 阈值 (秒)，0 表示使用 CHECK_INTERVAL
+    PROFILE_INTERVAL: float = 0.01  # 采样间隔 (秒)
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    
     # 数据库配置
     DB_PATH: str = "sqlite:///polymarket_trades.db"
+    DB_WRITE_BEHIND: bool = True  # 交易写入进入队列，由后台线程批量提交
+    DB_BATCH_SIZE: int = 100  # 每个事务最多提交的交易数
+    DB_FLUSH_INTERVAL: float = 0.5  # 写线程空闲轮询间隔 (秒)
+    DB_SYNCHRONOUS: str = "NORMAL"  # SQLite 同步级别: OFF / NORMAL / FULL
+    DB_FLUSH_ON_SHUTDOWN: bool = True  # 停止时等待队列中的交易写入完成
 
 config = PolymarketConfig()
@@ -0,0 +1,3 @@
+"""pytest 配置：项目根目录加入导入路径，test.py 是依赖线上 API 的演示脚本，不参与收集"""
+
+collect_ignore = ["test.py"]
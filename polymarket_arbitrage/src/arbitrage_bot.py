@@ -1,16 +1,45 @@
+import argparse
+import heapq
 import logging
+import threading
 import time
-from typing import List
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 from src.polymarket_api import PolymarketAPI
+from src.order_book_feed import OrderBookFeed
+from src.response_cache import ResponseCache
 from src.arbitrage_detector import ArbitrageDetector
 from src.trade_executor import TradeExecutor, OrderSigner
 from src.database import TradeDatabase
-from src.models import ArbitrageOpportunity
+from src.book_recorder import BookRecorder
+from src.clock import SystemClock, system_clock
+from src.scheduler import ActionScheduler
+from src.scan_scheduler import AdaptiveScanScheduler
+from src.sharded_scanner import ShardedScanner
+from src.cluster import ClusterCoordinator, ClusterNode
+from src.cross_market import CrossMarketDetector
+from src.pipeline import BLOCK, DROP_NEWEST, DROP_OLDEST, Pipeline, Stage
+from src.metrics import MetricsServer, registry as metrics
+from src.profiler import SlowCycleProfiler
+from src.models import ArbitrageOpportunity, OpportunityCandidate, Trade
 from config.settings import config
-from config.logger import setup_logger
+from config.logger import dropped_log_records, setup_logger
 
-logger = setup_logger("ArbitrageBot", config.LOG_LEVEL)
+logger = setup_logger(
+    "ArbitrageBot",
+    config.LOG_LEVEL,
+    log_format=config.LOG_FORMAT,
+    queue_size=config.LOG_QUEUE_SIZE,
+    rotate_bytes=config.LOG_ROTATE_BYTES,
+    rotate_interval=config.LOG_ROTATE_INTERVAL,
+    backup_count=config.LOG_BACKUP_COUNT
+)
+
+# 每轮扫描 / 每批机会最多执行的交易数
+MAX_EXECUTIONS_PER_SCAN = 5
+
+SCAN_LATENCY = metrics.histogram("scan_cycle_seconds", "一轮完整扫描（获取、检测、执行）的耗时")
 
 class ArbitrageBot:
     """套利机器人主类"""
@@ -21,19 +50,72 @@ class ArbitrageBot:
         detector: ArbitrageDetector,
         executor: TradeExecutor,
         db: TradeDatabase,
-        check_interval: int = 5
+        check_interval: int = 5,
+        max_position_size: float = config.MAX_POSITION_SIZE,
+        clock: SystemClock = system_clock,
+        close_delay: float = config.CLOSE_DELAY,
+        profiler: Optional[SlowCycleProfiler] = None,
+        cross_market: Optional[CrossMarketDetector] = None,
+        immediate_profit_pct: float = config.IMMEDIATE_EXECUTION_PROFIT_PCT
     ):
         self.api = api
         self.detector = detector
         self.executor = executor
         self.db = db
         self.check_interval = check_interval
+        self.max_position_size = max_position_size
+        # 回测时替换为模拟时钟，sleep 只推进时间
+        self.clock = clock
+        # 平仓等延时动作交给调度器，不阻塞扫描
+        self.close_delay = close_delay
+        # 调度线程在 start*() 中启动、stop() 中停止，只构造不运行的机器人不占用线程
+        self.scheduler = ActionScheduler(clock)
+        # 扫描模式下利润率不低于此值的机会检测到即执行，其余在本轮结束时按利润率排序执行 (<=0 时全部排序)
+        self.immediate_profit_pct = immediate_profit_pct
+        # 可选：扫描周期超时时写出该周期的采样分析
+        self.profiler = profiler
+        # 可选：执行前申请执行权（集群模式），需提供 acquire(opportunity) -> bool 与 release(opportunity, trade)
+        self.execution_gate = None
+        # 可选：跨市场检测（扫描模式和自适应扫描模式），事件成员不参与预筛选
+        self.cross_market = cross_market
+        if cross_market:
+            detector.prescreen_exempt = cross_market.tracks
         self.is_running = False
         self.total_opportunities = 0
         self.total_trades = 0
+        self.total_screened_out = 0
+        
+        # 导出指标的回调闭包引用本实例，在 start*() 中登记、stop() 中注销，避免多个实例互相覆盖或泄漏
+        self._metric_callbacks: List[tuple] = []
+    
+    def _register_metric(self, name: str, fn: Callable[[], float], help: str = "", kind: str = "gauge", **labels: str):
+        """在全局指标表登记回调，并记下以便 stop() 时注销"""
+        metrics.register_callback(name, fn, help, kind=kind, **labels)
+        self._metric_callbacks.append((name, fn, labels))
+    
+    def _register_metrics(self):
+        """登记所有运行模式共有的指标（已有的计数在导出指标时读取，热点路径不增加开销）"""
+        self._register_metric("opportunities_total", lambda: self.total_opportunities, "检测到的套利机会数", kind="counter")
+        self._register_metric("trades_total", lambda: self.total_trades, "执行的交易数", kind="counter")
+        self._register_metric("screened_out_total", lambda: self.total_screened_out, "预筛选剔除的市场数", kind="counter")
+        self._register_metric("scheduled_actions", self.scheduler.pending, "等待执行的延时动作数")
+        self._register_metric("log_records_dropped_total", dropped_log_records, "日志队列满时丢弃的记录数", kind="counter")
+        cross_market = self.cross_market
+        if cross_market:
+            self._register_metric("cross_market_events", lambda: len(cross_market.index), "跨市场索引中的互斥事件数")
+            self._register_metric("cross_market_markets", lambda: cross_market.index.market_count, "跨市场索引中的市场数")
     
-    def start(self):
-        """启动套利机器人"""
+    def _unregister_metrics(self):
+        """注销本实例登记的指标回调"""
+        for name, fn, labels in self._metric_callbacks:
+            metrics.unregister_callback(name, fn, **labels)
+        self._metric_callbacks.clear()
+    
+    def start(self, until: Optional[Callable[[], bool]] = None):
+        """
+        启动套利机器人
+        until 返回 True 时结束运行（回测数据耗尽时使用）
+        """
         logger.info("=" * 60)
         logger.info("Polymarket套利机器人已启动")
         logger.info(f"交易模式: {'启用' if self.executor.enable_trading else '模拟'}")
@@ -41,12 +123,24 @@ class ArbitrageBot:
         logger.info(f"检查间隔: {self.check_interval}秒")
         logger.info("=" * 60)
         
+        self._set_book_observer()
+        self._register_metrics()
+        self.scheduler.start()
         self.is_running = True
+        if self.profiler:
+            self.profiler.start()
         
         try:
-            while self.is_running:
-                self._scan_for_opportunities()
-                time.sleep(self.check_interval)
+            while self.is_running and not (until and until()):
+                if self.profiler:
+                    with self.profiler.cycle("scan"):
+                        self._scan_for_opportunities()
+                else:
+                    self._scan_for_opportunities()
+                self.clock.sleep(self.check_interval)
+                # 模拟时钟下没有调度线程，推进时间后执行到期动作
+                if not self.scheduler.threaded:
+                    self.scheduler.run_due()
         
         except KeyboardInterrupt:
             logger.info("收到中断信号，正在停止...")
@@ -59,16 +153,26 @@ class ArbitrageBot:
         """停止套利机器人"""
         self.is_running = False
         
+        # 立即执行所有待平仓动作
+        self.scheduler.shutdown(run_pending=True)
+        self._unregister_metrics()
+        
         # 平仓所有活跃交易
         for trade_id in list(self.executor.active_trades.keys()):
             self.executor.close_trade(trade_id)
         
         # 显示统计信息
-        stats = self.db.get_statistics()
+        stats = self.db.get_statistics(consistent=True)
         logger.info("=" * 60)
         logger.info("套利机器人已停止")
         logger.info(f"检测到的套利机会: {self.total_opportunities}")
         logger.info(f"执行的交易: {self.total_trades}")
+        logger.info(f"预筛选剔除的市场: {self.total_screened_out}")
+        for endpoint, counters in self.api.cache_stats().items():
+            logger.info(
+                f"缓存 {endpoint}: 命中 {counters['hits']} - 重新验证 {counters['revalidated']} "
+                f"- 未命中 {counters['misses']} - 命中率 {counters['hit_rate']:.1%}"
+            )
         logger.info("交易统计:")
         logger.info(f"  - 总交易数: {stats.get('total_trades', 0)}")
         logger.info(f"  - 已平仓: {stats.get('closed_trades', 0)}")
@@ -76,46 +180,474 @@ class ArbitrageBot:
         logger.info(f"  - 平均利润率: {stats.get('average_profit_pct', 0):.2f}%")
         logger.info(f"  - 最大单笔利润: ${stats.get('max_profit', 0):.2f}")
         logger.info("=" * 60)
+        
+        self.executor.shutdown()
+        if self.detector.recorder:
+            self.detector.recorder.close()
+        if self.profiler:
+            self.profiler.stop()
+        self.db.close()
     
     def _scan_for_opportunities(self):
         """扫描市场寻找套利机会"""
+        started = time.perf_counter_ns()
         try:
-            # 获取所有市场
+            # 分页流式获取全部市场，边获取边检测
             logger.debug("正在获取市场列表...")
-            markets = self.api.get_markets(limit=50)
+            markets = self.api.iter_markets(
+                page_size=config.MARKET_PAGE_SIZE,
+                max_markets=config.MAX_MARKETS or None
+            )
+            if self.cross_market:
+                # 边获取边更新事件索引
+                markets = self.cross_market.track(markets)
             
-            if not markets:
+            # 高利润的机会检测到即执行，不等后续分页获取完毕；其余只保留利润率最高的几个，
+            # 本轮结束（含分页中途失败）时按利润率补足每轮 MAX_EXECUTIONS_PER_SCAN 个的额度
+            found = 0
+            executed = 0
+            ranked: List[Tuple[float, int, OpportunityCandidate]] = []
+            try:
+                for candidate in self.detector.iter_candidates(markets):
+                    found += 1
+                    if executed >= MAX_EXECUTIONS_PER_SCAN:
+                        continue
+                    if 0 < self.immediate_profit_pct <= candidate.profit_percentage:
+                        executed += 1
+                        self._execute_opportunity(self.detector.to_opportunity(candidate))
+                        continue
+                    # 最小堆，利润率相同时先到者优先
+                    entry = (candidate.profit_percentage, -found, candidate)
+                    if len(ranked) < MAX_EXECUTIONS_PER_SCAN:
+                        heapq.heappush(ranked, entry)
+                    elif entry[:2] > ranked[0][:2]:
+                        heapq.heapreplace(ranked, entry)
+            finally:
+                for _, _, candidate in sorted(ranked, key=lambda e: e[:2], reverse=True)[:MAX_EXECUTIONS_PER_SCAN - executed]:
+                    executed += 1
+                    self._execute_opportunity(self.detector.to_opportunity(candidate))
+                
+                self.total_opportunities += found
+                self.total_screened_out += self.detector.last_screened_out
+                if self.detector.last_scan_count:
+                    logger.info(
+                        f"扫描了 {self.detector.last_scan_count} 个市场，"
+                        f"预筛选剔除 {self.detector.last_screened_out} 个，"
+                        f"订单簿未变化跳过 {self.detector.last_unchanged} 个，"
+                        f"检测到 {found} 个套利机会，执行了 {executed} 个"
+                    )
+                else:
+                    logger.warning("未获取到市场数据")
+                
+                if self.cross_market:
+                    # 跨市场检测需要本轮全部成员的订单簿，在列表遍历结束后进行；
+                    # 分页失败时已获取的成员订单簿同样有效（未列出的市场不会被移出索引）
+                    self._handle_opportunities(self._detect_cross_market())
+        
+        except Exception as e:
+            logger.error(f"扫描市场时出错: {e}")
+        finally:
+            SCAN_LATENCY.record_since(started)
+    
+    def start_sharded(self, scanner: ShardedScanner, until: Optional[Callable[[], bool]] = None):
+        """
+        分片扫描模式：获取、解析和检测在多个工作进程中进行，
+        本进程只排序候选机会并执行，TradeExecutor 只有一个，不会重复下单
+        """
+        logger.info("=" * 60)
+        logger.info("Polymarket套利机器人已启动（分片扫描模式）")
+        logger.info(f"交易模式: {'启用' if self.executor.enable_trading else '模拟'}")
+        logger.info(f"最小利润率: {self.detector.min_profit_pct}%")
+        logger.info(f"检查间隔: {self.check_interval}秒 - 工作进程: {scanner.shards}")
+        logger.info("=" * 60)
+        
+        scanner.start()
+        self._register_metrics()
+        self.scheduler.start()
+        self.is_running = True
+        if self.profiler:
+            self.profiler.start()
+        
+        try:
+            while self.is_running and not (until and until()):
+                if self.profiler:
+                    with self.profiler.cycle("scan"):
+                        self._scan_sharded(scanner)
+                else:
+                    self._scan_sharded(scanner)
+                self.clock.sleep(self.check_interval)
+                if not self.scheduler.threaded:
+                    self.scheduler.run_due()
+        
+        except KeyboardInterrupt:
+            logger.info("收到中断信号，正在停止...")
+        except Exception as e:
+            logger.error(f"机器人遇到错误: {e}")
+        finally:
+            scanner.stop()
+            self.stop()
+    
+    def _scan_sharded(self, scanner: ShardedScanner):
+        """一轮分片扫描：本进程获取市场列表，工作进程获取订单簿并检测"""
+        started = time.perf_counter_ns()
+        try:
+            markets = self.api.iter_markets(
+                page_size=config.MARKET_PAGE_SIZE,
+                max_markets=config.MAX_MARKETS or None
+            )
+            candidates = scanner.detect_candidates(markets)
+            
+            if not scanner.last_scan_count:
                 logger.warning("未获取到市场数据")
                 return
             
-            logger.debug(f"获取到 {len(markets)} 个市场")
-            
-            # 检测套利机会
-            opportunities = self.detector.detect_opportunities(markets)
+            self.total_screened_out += scanner.last_screened_out
+            # 各分片未写回的低利润候选也计入检测到的机会数
+            self.total_opportunities += scanner.last_truncated
+            logger.info(
+                f"扫描了 {scanner.last_scan_count} 个市场（{scanner.shards} 个分片，"
+                f"最慢分片 {max(scanner.last_shard_seconds):.2f} 秒），"
+                f"预筛选剔除 {scanner.last_screened_out} 个，"
+                f"订单簿未变化跳过 {scanner.last_unchanged} 个"
+            )
             
-            if opportunities:
-                logger.info(f"检测到 {len(opportunities)} 个套利机会")
-                self.total_opportunities += len(opportunities)
+            self._handle_opportunities(candidates)
+        
+        except Exception as e:
+            logger.error(f"分片扫描时出错: {e}")
+        finally:
+            SCAN_LATENCY.record_since(started)
+    
+    def _set_book_observer(self, callback: Optional[Callable] = None):
+        """设置检测器的订单簿回调；启用跨市场检测时它也需要看到每个订单簿"""
+        callbacks = [cb for cb in (callback, self.cross_market and self.cross_market.observe_book) if cb]
+        if len(callbacks) < 2:
+            self.detector.on_book = callbacks[0] if callbacks else None
+            return
+        
+        def on_book(market_id, order_book):
+            for cb in callbacks:
+                cb(market_id, order_book)
+        
+        self.detector.on_book = on_book
+    
+    def _detect_cross_market(self) -> List[OpportunityCandidate]:
+        """评估成员订单簿有更新的事件组"""
+        candidates = self.cross_market.detect_candidates()
+        logger.debug(
+            f"跨市场检测: 索引 {len(self.cross_market.index)} 个事件 / "
+            f"{self.cross_market.index.market_count} 个市场，评估 {self.cross_market.last_groups_evaluated} 个事件，"
+            f"发现 {len(candidates)} 个机会"
+        )
+        return candidates
+    
+    def _handle_opportunities(self, opportunities: List[OpportunityCandidate]):
+        """排序并执行检测到的套利机会（只为执行的几个构建完整对象）"""
+        if not opportunities:
+            logger.debug("未发现套利机会")
+            return
+        
+        logger.info(f"检测到 {len(opportunities)} 个套利机会")
+        self.total_opportunities += len(opportunities)
+        
+        # 按利润率排序
+        opportunities.sort(key=lambda x: x.profit_percentage, reverse=True)
+        
+        # 执行最好的几个机会
+        for candidate in opportunities[:MAX_EXECUTIONS_PER_SCAN]:  # 限制同时执行的交易数
+            self._execute_opportunity(self.detector.to_opportunity(candidate))
+    
+    def start_adaptive(self, scan_scheduler: AdaptiveScanScheduler, until: Optional[Callable[[], bool]] = None):
+        """
+        自适应扫描模式：每个市场按自身热度的间隔轮询，订单簿请求总量受全局预算限制
+        市场列表每 SCAN_MARKET_REFRESH 秒重新获取一次
+        """
+        self._set_book_observer(scan_scheduler.observe_book)
+        for tier in ("hot", "warm", "cold"):
+            self._register_metric("scan_markets", lambda tier=tier: scan_scheduler.stats()[tier],
+                                  "自适应扫描各层的市场数", tier=tier)
+        self._register_metric("scan_interval_scale", lambda: scan_scheduler.scale, "需求超过请求预算时轮询间隔的放大倍数")
+        
+        logger.info("=" * 60)
+        logger.info("Polymarket套利机器人已启动（自适应扫描模式）")
+        logger.info(f"交易模式: {'启用' if self.executor.enable_trading else '模拟'}")
+        logger.info(f"最小利润率: {self.detector.min_profit_pct}%")
+        logger.info(
+            f"请求预算: {scan_scheduler.request_budget}次/秒 - 轮询间隔: "
+            f"{scan_scheduler.min_interval}~{scan_scheduler.max_interval}秒"
+        )
+        logger.info("=" * 60)
+        
+        self._register_metrics()
+        self.scheduler.start()
+        self.is_running = True
+        if self.profiler:
+            self.profiler.start()
+        next_refresh = self.clock.time()
+        
+        try:
+            while self.is_running and not (until and until()):
+                if self.clock.time() >= next_refresh:
+                    self._refresh_scan_markets(scan_scheduler)
+                    next_refresh = self.clock.time() + config.SCAN_MARKET_REFRESH
                 
-                # 按利润率排序
-                opportunities.sort(key=lambda x: x.profit_percentage, reverse=True)
+                markets = scan_scheduler.due()
+                if markets:
+                    if self.profiler:
+                        with self.profiler.cycle("scan"):
+                            self._scan_markets(scan_scheduler, markets)
+                    else:
+                        self._scan_markets(scan_scheduler, markets)
                 
-                # 执行最好的几个机会
-                for opp in opportunities[:5]:  # 限制同时执行的交易数
-                    self._execute_opportunity(opp)
-            else:
-                logger.debug("未发现套利机会")
+                # 睡到下一个市场到期或下一次刷新市场列表
+                wait = min(scan_scheduler.next_due_in(), next_refresh - self.clock.time())
+                self.clock.sleep(max(wait, 0.01))
+                if not self.scheduler.threaded:
+                    self.scheduler.run_due()
         
+        except KeyboardInterrupt:
+            logger.info("收到中断信号，正在停止...")
+        except Exception as e:
+            logger.error(f"机器人遇到错误: {e}")
+        finally:
+            self._set_book_observer()
+            self.stop()
+    
+    def _refresh_scan_markets(self, scan_scheduler: AdaptiveScanScheduler):
+        """重新获取市场列表并同步到调度器，预筛选剔除的市场不参与轮询"""
+        try:
+            listed = list(self.api.iter_markets(
+                page_size=config.MARKET_PAGE_SIZE,
+                max_markets=config.MAX_MARKETS or None
+            ))
+            if self.cross_market:
+                # 先同步事件索引，事件成员不被预筛选剔除
+                self.cross_market.update_markets(listed)
+            
+            markets = []
+            for market in listed:
+                if self.detector.passes_prescreen(market):
+                    markets.append(market)
+                else:
+                    self.total_screened_out += 1
+            
+            added, removed = scan_scheduler.update_markets(markets)
+            stats = scan_scheduler.stats()
+            logger.info(
+                f"市场列表已刷新: 轮询 {stats['markets']} 个市场（新增 {added}，移除 {removed}） "
+                f"- 热门 {stats['hot']} / 一般 {stats['warm']} / 冷门 {stats['cold']} "
+                f"- 需求 {stats['demand_rate']:.2f}次/秒 - 间隔放大 {stats['scale']:.2f} 倍"
+            )
+        except Exception as e:
+            logger.error(f"刷新市场列表时出错: {e}")
+    
+    def _scan_markets(self, scan_scheduler: AdaptiveScanScheduler, markets: List[Dict]):
+        """检测一批到期的市场，并按结果重新安排它们的下一次扫描"""
+        opportunities: Dict[str, int] = {}
+        try:
+            candidates = list(self.detector.iter_candidates(markets))
+            opportunities = Counter(candidate.market_id for candidate in candidates)
+            if self.cross_market:
+                cross = self._detect_cross_market()
+                # 跨市场机会计入各腿所在市场的热度，让事件成员的订单簿保持新鲜
+                opportunities.update(leg.market_id for candidate in cross for leg in candidate.legs)
+                candidates.extend(cross)
+            self._handle_opportunities(candidates)
         except Exception as e:
             logger.error(f"扫描市场时出错: {e}")
+        finally:
+            # 出错时也要重新排队，否则这些市场不会再被扫描
+            scan_scheduler.complete(markets, opportunities)
     
-    def _execute_opportunity(self, opportunity: ArbitrageOpportunity):
-        """执行单个套利机会"""
+    def start_streaming(self, feed: OrderBookFeed, markets: List[Dict]):
+        """
+        订阅模式：基于推送维护的本地订单簿镜像检测套利
+        只对订单簿发生变化的市场重新检测，同一市场的多次更新会被合并
+        """
+        markets_by_id = {m["id"]: m for m in markets if m.get("id")}
+        dirty = set()
+        dirty_lock = threading.Lock()
+        dirty_event = threading.Event()
+        
+        def on_update(market_id: str):
+            with dirty_lock:
+                dirty.add(market_id)
+            dirty_event.set()
+        
+        logger.info("=" * 60)
+        logger.info("Polymarket套利机器人已启动（订阅模式）")
+        logger.info(f"交易模式: {'启用' if self.executor.enable_trading else '模拟'}")
+        logger.info(f"最小利润率: {self.detector.min_profit_pct}%")
+        logger.info(f"订阅市场数: {len(markets_by_id)}")
+        logger.info("=" * 60)
+        
+        feed.on_update = on_update
+        feed.connect(markets_by_id.keys())
+        self._register_metrics()
+        self.scheduler.start()
+        self.is_running = True
+        
+        try:
+            while self.is_running:
+                if not feed.connected and not self._reconnect_feed(feed, markets_by_id.keys()):
+                    break
+                
+                if not dirty_event.wait(timeout=1.0):
+                    continue
+                
+                with dirty_lock:
+                    changed = list(dirty)
+                    dirty.clear()
+                    dirty_event.clear()
+                
+                opportunities = []
+                for market_id in changed:
+                    order_book = feed.get_order_book(market_id)
+                    if order_book:
+                        opportunities.extend(
+                            self.detector.detect_market_candidates(markets_by_id[market_id], order_book)
+                        )
+                
+                self._handle_opportunities(opportunities)
+        
+        except KeyboardInterrupt:
+            logger.info("收到中断信号，正在停止...")
+        except Exception as e:
+            logger.error(f"机器人遇到错误: {e}")
+        finally:
+            feed.close()
+            self.stop()
+    
+    def _reconnect_feed(self, feed: OrderBookFeed, market_ids) -> bool:
+        """推送连接断开后按指数退避重新订阅，全部失败时返回 False"""
+        market_ids = list(market_ids)
+        delay = config.FEED_RECONNECT_DELAY
+        for attempt in range(1, config.FEED_RECONNECT_ATTEMPTS + 1):
+            logger.warning(f"订单簿推送已断开，{delay:.1f} 秒后第 {attempt} 次重连...")
+            self.clock.sleep(delay)
+            if not self.is_running:
+                return False
+            try:
+                feed.connect(market_ids)
+                return True
+            except OSError as e:
+                logger.error(f"重连订单簿推送失败: {e}")
+                delay *= 2
+        logger.error(f"连续 {config.FEED_RECONNECT_ATTEMPTS} 次重连订单簿推送失败，停止运行")
+        return False
+    
+    def start_pipeline(self):
+        """
+        流水线模式：发现 → 获取订单簿 → 检测 → 排序 → 执行 → 持久化
+        各阶段由有界队列连接并行运行，最慢的阶段不再拖慢其他阶段
+        """
+        pipeline = self._build_pipeline()
+        for stage in pipeline.stages:
+            self._register_metric("pipeline_queue_depth", stage.queue.qsize, "流水线各阶段的队列深度", stage=stage.name)
+            self._register_metric("pipeline_dropped_total", lambda stage=stage: stage.dropped,
+                                  "流水线各阶段因过载丢弃的条目数", kind="counter", stage=stage.name)
+        
+        logger.info("=" * 60)
+        logger.info("Polymarket套利机器人已启动（流水线模式）")
+        logger.info(f"交易模式: {'启用' if self.executor.enable_trading else '模拟'}")
+        logger.info(f"最小利润率: {self.detector.min_profit_pct}%")
+        logger.info(f"检查间隔: {self.check_interval}秒")
+        logger.info("=" * 60)
+        
+        pipeline.start()
+        self._register_metrics()
+        self.scheduler.start()
+        self.is_running = True
+        last_stats = self.clock.time()
+        
+        try:
+            while self.is_running:
+                # 上一轮发现尚未开始时丢弃本次触发，避免发现任务堆积
+                pipeline.submit(self.clock.time())
+                self.clock.sleep(self.check_interval)
+                
+                if self.clock.time() - last_stats >= config.PIPELINE_STATS_INTERVAL:
+                    self._log_pipeline_stats(pipeline)
+                    last_stats = self.clock.time()
+        
+        except KeyboardInterrupt:
+            logger.info("收到中断信号，正在停止...")
+        except Exception as e:
+            logger.error(f"机器人遇到错误: {e}")
+        finally:
+            pipeline.stop(drain=False)
+            self._log_pipeline_stats(pipeline)
+            self.stop()
+    
+    def _build_pipeline(self) -> Pipeline:
+        """按配置构建各阶段"""
+        queue_size = config.PIPELINE_QUEUE_SIZE
+        
+        def discover(_tick):
+            markets = self.api.iter_markets(
+                page_size=config.MARKET_PAGE_SIZE,
+                max_markets=config.MAX_MARKETS or None
+            )
+            for market in markets:
+                if not self.detector.passes_prescreen(market):
+                    self.total_screened_out += 1
+                    continue
+                yield market
+        
+        def fetch(market):
+            order_book = self.detector.fetch_order_book(market)
+            if not order_book:
+                return None
+            market_id = market.get("id")
+            if self.detector.skip_unchanged and self.detector.skip_book(market_id):
+                return None
+            return market, order_book
+        
+        def detect(item):
+            market, order_book = item
+            return self.detector.detect_market_candidates(market, order_book)
+        
+        def rank(candidates: List[OpportunityCandidate]):
+            self.total_opportunities += len(candidates)
+            candidates.sort(key=lambda x: x.profit_percentage, reverse=True)
+            # 限制每批执行的交易数，只为这几个构建完整对象
+            return [self.detector.to_opportunity(candidate) for candidate in candidates[:MAX_EXECUTIONS_PER_SCAN]]
+        
+        return Pipeline([
+            Stage("discovery", discover, queue_size=1, overflow=DROP_NEWEST),
+            Stage("fetch", fetch, workers=self.detector.max_workers, queue_size=queue_size, overflow=BLOCK),
+            Stage("detect", detect, workers=config.PIPELINE_DETECT_WORKERS, queue_size=queue_size, overflow=BLOCK),
+            Stage("rank", rank, queue_size=queue_size, overflow=DROP_OLDEST, batch_size=100, linger=0.05),
+            # 机会很快过期：执行跟不上时丢弃最旧的机会
+            Stage("execute", lambda opp: self._execute_opportunity(opp, persist=False),
+                  queue_size=config.PIPELINE_EXECUTE_QUEUE_SIZE, overflow=DROP_OLDEST),
+            Stage("persist", self.db.save_trade, queue_size=queue_size, overflow=BLOCK, critical=True),
+        ])
+    
+    def _log_pipeline_stats(self, pipeline: Pipeline):
+        """输出各阶段队列深度和吞吐量"""
+        for name, stats in pipeline.snapshot().items():
+            logger.info(
+                f"流水线 {name:<9} - 队列 {stats['queue_depth']}/{stats['queue_size']} "
+                f"- 吞吐 {stats['throughput']:.1f}/s - 已处理 {stats['processed']} "
+                f"- 丢弃 {stats['dropped']} - 错误 {stats['errors']} - 利用率 {stats['utilization']:.0%}"
+            )
+    
+    def _execute_opportunity(self, opportunity: ArbitrageOpportunity, persist: bool = True) -> Optional[Trade]:
+        """
+        执行单个套利机会
+        persist 为 False 时由调用方负责保存（流水线的持久化阶段）
+        """
+        gate = self.execution_gate
+        if gate and not gate.acquire(opportunity):
+            return None
+        
+        trade = None
         try:
             # 计算交易大小
             size = min(
                 opportunity.max_size,
-                config.MAX_POSITION_SIZE / opportunity.buy_price
+                self.max_position_size / opportunity.buy_price
             )
             
             logger.info(
@@ -129,36 +661,203 @@ class ArbitrageBot:
             
             if trade:
                 # 保存到数据库
-                self.db.save_trade(trade)
+                if persist:
+                    self.db.save_trade(trade)
                 self.total_trades += 1
                 
                 logger.info(
                     f"交易执行成功 - 预期利润: ${trade.profit_amount:.2f}"
                 )
                 
-                # 如果交易已完成，立即平仓
+                # 如果交易已完成，延时后平仓（不阻塞后续机会的执行）
                 if trade.status in ["executed", "simulated"]:
-                    time.sleep(1)
-                    self.executor.close_trade(trade.trade_id)
-                    self.db.save_trade(trade)
+                    self.scheduler.schedule(self.close_delay, self._close_trade, trade, name="close_trade")
+            
+            return trade
         
         except Exception as e:
             logger.error(f"执行套利机会失败: {e}")
+            return None
+        finally:
+            if gate:
+                gate.release(opportunity, trade)
+
+    def _close_trade(self, trade):
+        """平仓并保存交易（在调度器中执行）"""
+        if self.executor.close_trade(trade.trade_id):
+            self.db.save_trade(trade)
+
+def create_api() -> PolymarketAPI:
+    """按配置创建 API 客户端（分片扫描的工作进程也用它创建各自的客户端）"""
+    cache = None
+    if config.RESPONSE_CACHE_ENABLED:
+        cache = ResponseCache(
+            ttl=config.RESPONSE_CACHE_TTL,
+            max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+            max_bytes=config.RESPONSE_CACHE_MAX_BYTES
+        )
+    return PolymarketAPI(cache=cache)
+
+def run_coordinator():
+    """运行集群协调者，直到收到中断信号"""
+    coordinator = ClusterCoordinator(
+        config.CLUSTER_HOST,
+        config.CLUSTER_PORT,
+        num_shards=config.CLUSTER_SHARDS,
+        heartbeat_timeout=config.CLUSTER_HEARTBEAT_TIMEOUT,
+        lease_ttl=config.CLUSTER_LEASE_TTL,
+        dedup_window=config.CLUSTER_DEDUP_WINDOW
+    ).start()
+    try:
+        while True:
+            time.sleep(config.CLUSTER_STATS_INTERVAL)
+            stats = coordinator.stats()
+            logger.info(
+                f"集群: 节点 {stats['nodes']} - 机会 {stats['unique']} (重复 {stats['duplicates']}) "
+                f"- 授予执行权 {stats['granted']} - 拒绝 {stats['rejected']}"
+            )
+    except KeyboardInterrupt:
+        logger.info("收到中断信号，正在停止...")
+    finally:
+        coordinator.stop()
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="Polymarket套利机器人")
+    parser.add_argument("--stream", action="store_true", help="订阅模式：基于订单簿推送检测")
+    parser.add_argument("--local-feed", type=int, metavar="N", default=0,
+                        help="订阅模式下启动包含N个合成市场的本地推送服务（测试用）")
+    parser.add_argument("--pipeline", action="store_true", help="流水线模式：各阶段由有界队列连接并行运行")
+    parser.add_argument("--adaptive", action="store_true", help="自适应扫描模式：按市场热度分配轮询频率和请求预算")
+    parser.add_argument("--shards", type=int, metavar="N", default=0,
+                        help="分片扫描模式：由N个工作进程获取和检测（0=关闭，-1=CPU核数）")
+    parser.add_argument("--coordinator", action="store_true", help="作为集群协调者运行（分配分片、裁决执行权）")
+    parser.add_argument("--node", action="store_true", help="作为集群扫描节点运行，连接 CLUSTER_HOST:CLUSTER_PORT")
+    parser.add_argument("--node-id", default=None, help="集群节点ID（默认 主机名-进程号）")
+    parser.add_argument("--rebuild-stats", action="store_true", help="从交易表重新计算汇总统计后退出")
+    args = parser.parse_args()
+    
+    if args.coordinator:
+        run_coordinator()
+        return
+    
     # 初始化组件
-    api = PolymarketAPI()
-    detector = ArbitrageDetector(api, config.MIN_PROFIT_PERCENTAGE)
+    api = create_api()
+    recorder = BookRecorder(config.RECORD_DIR, max_queue=config.RECORD_QUEUE_SIZE) if config.RECORD_BOOKS else None
+    detector_options = dict(
+        min_profit_pct=config.MIN_PROFIT_PERCENTAGE,
+        max_workers=config.FETCH_CONCURRENCY,
+        engine=config.DETECTION_ENGINE,
+        batch_size=config.DETECTION_BATCH_SIZE,
+        strategy=config.ARBITRAGE_STRATEGY,
+        prescreen=config.PRESCREEN_MARKETS,
+        prescreen_slack_pct=config.PRESCREEN_SLACK_PCT,
+        skip_unchanged=config.SKIP_UNCHANGED_BOOKS
+    )
+    detector = ArbitrageDetector(api, recorder=recorder, **detector_options)
     signer = OrderSigner(config.PRIVATE_KEY)
-    executor = TradeExecutor(api, signer, config.ENABLE_TRADING)
-    db = TradeDatabase(config.DB_PATH)
+    executor = TradeExecutor(api, signer, config.ENABLE_TRADING, concurrent_legs=config.CONCURRENT_LEGS)
+    db = TradeDatabase(
+        config.DB_PATH,
+        write_behind=config.DB_WRITE_BEHIND,
+        batch_size=config.DB_BATCH_SIZE,
+        flush_interval=config.DB_FLUSH_INTERVAL,
+        synchronous=config.DB_SYNCHRONOUS,
+        flush_on_close=config.DB_FLUSH_ON_SHUTDOWN
+    )
+    
+    if args.rebuild_stats:
+        db.rebuild_statistics()
+        logger.info(f"交易统计: {db.get_statistics()}")
+        db.close()
+        return
+    
+    profiler = None
+    if config.PROFILE_SLOW_CYCLES:
+        profiler = SlowCycleProfiler(
+            threshold=config.PROFILE_THRESHOLD or config.CHECK_INTERVAL,
+            output_dir=config.PROFILE_DIR,
+            interval=config.PROFILE_INTERVAL
+        )
+    
+    cross_market = None
+    if config.CROSS_MARKET_ENABLED:
+        cross_market = CrossMarketDetector(
+            min_profit_pct=config.MIN_PROFIT_PERCENTAGE,
+            max_book_age=config.CROSS_MARKET_MAX_BOOK_AGE,
+            # 市场列表被截断时事件成员可能不全，YES 篮子不再成立
+            yes_baskets=not config.MAX_MARKETS
+        )
     
     # 创建机器人
-    bot = ArbitrageBot(api, detector, executor, db, config.CHECK_INTERVAL)
+    bot = ArbitrageBot(api, detector, executor, db, config.CHECK_INTERVAL, profiler=profiler, cross_market=cross_market)
+    
+    if config.METRICS_PORT:
+        # Prometheus 文本格式: http://METRICS_HOST:METRICS_PORT/metrics
+        MetricsServer(config.METRICS_PORT, config.METRICS_HOST).start()
+    
+    if args.pipeline:
+        bot.start_pipeline()
+        return
+    
+    if args.shards:
+        # 订单簿记录只在单进程模式下可用
+        bot.start_sharded(ShardedScanner(
+            create_api,
+            detector_options,
+            shards=None if args.shards < 0 else args.shards,
+            capacity=config.SHARD_MAX_MARKETS,
+            max_candidates=config.SHARD_MAX_CANDIDATES,
+            max_outcomes=config.SHARD_MAX_OUTCOMES,
+            timeout=config.SHARD_TIMEOUT
+        ))
+        return
+    
+    if args.node:
+        ClusterNode(
+            bot,
+            config.CLUSTER_HOST,
+            config.CLUSTER_PORT,
+            node_id=args.node_id,
+            heartbeat_interval=config.CLUSTER_HEARTBEAT_INTERVAL
+        ).run()
+        return
+    
+    if args.adaptive:
+        bot.start_adaptive(AdaptiveScanScheduler(
+            request_budget=config.SCAN_REQUEST_BUDGET,
+            min_interval=config.SCAN_MIN_INTERVAL,
+            max_interval=config.SCAN_MAX_INTERVAL,
+            opportunity_half_life=config.SCAN_OPPORTUNITY_HALF_LIFE
+        ))
+        return
+    
+    if not args.stream:
+        # 启动机器人
+        bot.start()
+        return
+    
+    server = None
+    if args.local_feed:
+        from src.feed_server import FeedServer
+        from src.synthetic import SyntheticMarketGenerator
+        
+        generator = SyntheticMarketGenerator(num_markets=args.local_feed)
+        server = FeedServer(generator, config.FEED_HOST, 0).start()
+        host, port = server.address
+        markets = generator.markets
+    else:
+        host, port = config.FEED_HOST, config.FEED_PORT
+        markets = list(api.iter_markets(
+            page_size=config.MARKET_PAGE_SIZE,
+            max_markets=config.MAX_MARKETS or None
+        ))
     
-    # 启动机器人
-    bot.start()
+    try:
+        bot.start_streaming(OrderBookFeed(host, port), markets)
+    finally:
+        if server:
+            server.stop()
 
 if __name__ == "__main__":
     main()
@@ -1,111 +1,427 @@
+import itertools
 import logging
-from typing import List, Dict, Optional, Tuple
-from datetime import datetime
-from src.models import Market, ArbitrageOpportunity, Order
-from src.polymarket_api import PolymarketAPI
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from src.models import Market, ArbitrageOpportunity, OpportunityCandidate, Order, OrderBook, OpportunityLeg
+from src.polymarket_api import PolymarketAPI, parse_json_list
+from src.batch_detector import BatchDetector
+from src.book_recorder import BookRecorder
+from src.clock import SystemClock, system_clock
+from src.sizing import max_cost_for_profit, walk_executable_size
+from src.metrics import registry as metrics
 
 logger = logging.getLogger(__name__)
 
+# 单个市场的检测耗时（loop 引擎）与每批的检测耗时（batch 引擎）
+DETECTION_LATENCY = metrics.histogram("detection_seconds", "单个市场的套利检测耗时")
+BATCH_DETECTION_LATENCY = metrics.histogram("batch_detection_seconds", "batch 引擎检测一批市场的耗时")
+
+# 机会 ID 序号：以进程启动时刻（微秒）为起点的全局计数器，重启后也不会与历史 ID 重复
+_opportunity_ids = itertools.count(time.time_ns() // 1000)
+
 class ArbitrageDetector:
     """套利机会检测引擎"""
     
-    def __init__(self, api: PolymarketAPI, min_profit_pct: float = 0.5):
+    def __init__(
+        self,
+        api: PolymarketAPI,
+        min_profit_pct: float = 0.5,
+        max_workers: int = 1,
+        engine: str = "loop",
+        batch_size: int = 256,
+        strategy: str = "pair",
+        prescreen: bool = False,
+        prescreen_slack_pct: float = 0.25,
+        skip_unchanged: bool = False,
+        recorder: Optional[BookRecorder] = None,
+        on_book: Optional[Callable[[str, OrderBook], None]] = None,
+        prescreen_exempt: Optional[Callable[[Dict], bool]] = None,
+        clock: SystemClock = system_clock
+    ):
         self.api = api
         self.min_profit_pct = min_profit_pct
+        # 并发获取订单簿的线程数，1 表示串行
+        self.max_workers = max(1, max_workers)
+        # 检测引擎: loop=逐市场逐对检测, batch=NumPy 向量化批量检测
+        self.engine = engine
+        self.batch_size = max(1, batch_size)
+        # 检测策略: pair=互补对, basket=整篮, both=两者
+        self.strategy = strategy
+        self.batch_detector = BatchDetector(self._check_complementary_pair, self._check_basket)
+        # 预筛选：用市场列表中的指示价格剔除不可能达到利润要求的市场，避免获取订单簿
+        self.prescreen = prescreen
+        self.prescreen_slack_pct = prescreen_slack_pct
+        # 可选：prescreen_exempt(market) 为 True 的市场不参与预筛选，如跨市场检测需要的事件成员
+        self.prescreen_exempt = prescreen_exempt
+        # 跳过订单簿内容自上次扫描以来未变化的市场（依赖 API 响应缓存的内容哈希）
+        self.skip_unchanged = skip_unchanged
+        self._book_hashes: Dict[str, str] = {}
+        # 可选：记录每个参与检测的订单簿，用于事后复现
+        self.recorder = recorder
+        # 可选：每个获取到的订单簿（含内容未变化的）回调 on_book(market_id, order_book)，如自适应扫描调度
+        self.on_book = on_book
+        # 时钟：回测时替换为模拟时钟，机会 ID 与检测时间随之确定
+        self.clock = clock
+        # 模拟时钟下每个检测器从模拟起点单独计数，回测结果可复现
+        self._ids = _opportunity_ids if clock.realtime else itertools.count(clock.time_ns() // 1000)
         self.opportunities = []
+        self.last_scan_count = 0
+        self.last_screened_out = 0
+        self.last_unchanged = 0
     
-    def detect_opportunities(self, markets: List[Dict]) -> List[ArbitrageOpportunity]:
+    def detect_opportunities(self, markets: Iterable[Dict]) -> List[ArbitrageOpportunity]:
         """检测所有市场中的套利机会"""
-        opportunities = []
+        opportunities = [self.to_opportunity(candidate) for candidate in self.detect_candidates(markets)]
+        self.opportunities = opportunities
+        return opportunities
+    
+    def iter_opportunities(self, markets: Iterable[Dict]) -> Iterator[ArbitrageOpportunity]:
+        """
+        流式检测套利机会
+        市场可以是生成器，边流入边检测，发现的机会立即产出
+        """
+        for candidate in self.iter_candidates(markets):
+            yield self.to_opportunity(candidate)
+    
+    def detect_candidates(self, markets: Iterable[Dict]) -> List[OpportunityCandidate]:
+        """检测所有市场，返回按市场顺序排列的候选机会（不构建完整对象）"""
+        results = {
+            index: market_opportunities
+            for index, market_opportunities in self._iter_market_results(markets)
+            if market_opportunities
+        }
+        
+        # 按市场原始顺序合并，与串行路径结果一致
+        candidates = []
+        for index in sorted(results):
+            candidates.extend(results[index])
+        return candidates
+    
+    def iter_candidates(self, markets: Iterable[Dict]) -> Iterator[OpportunityCandidate]:
+        """流式检测，发现的候选机会立即产出"""
+        for _, market_candidates in self._iter_market_results(markets):
+            yield from market_candidates
+    
+    def to_opportunity(self, candidate: OpportunityCandidate) -> ArbitrageOpportunity:
+        """为决定执行的候选机会分配 ID 并构建完整的 ArbitrageOpportunity"""
+        if candidate.strategy == "pair":
+            key = f"{candidate.buy_outcome}_{candidate.sell_outcome}"
+        else:
+            key = candidate.strategy
+        return candidate.to_opportunity(f"{candidate.market_id}_{key}_{next(self._ids)}")
+    
+    def _iter_market_results(
+        self,
+        markets: Iterable[Dict]
+    ) -> Iterator[Tuple[int, List[OpportunityCandidate]]]:
+        """按完成顺序产出 (市场序号, 该市场的套利机会)"""
+        order_books = self._iter_order_books(markets)
+        if self.on_book:
+            order_books = self._observe_books(order_books)
+        if self.skip_unchanged:
+            order_books = self._skip_unchanged_books(order_books)
+        if self.recorder:
+            order_books = self._record_books(order_books)
+        
+        if self.engine == "batch":
+            yield from self._iter_batches(order_books)
+            return
         
-        for market in markets:
+        for index, market, order_book in order_books:
+            yield index, self._detect_with_book(market, order_book)
+    
+    def _skip_unchanged_books(
+        self,
+        order_books: Iterator[Tuple[int, Dict, Dict]]
+    ) -> Iterator[Tuple[int, Dict, Dict]]:
+        """过滤掉内容哈希与上次扫描相同的订单簿"""
+        self.last_unchanged = 0
+        
+        for index, market, order_book in order_books:
+            if self.skip_book(market.get("id")):
+                self.last_unchanged += 1
+                continue
+            yield index, market, order_book
+    
+    def skip_book(self, market_id: str) -> bool:
+        """
+        订单簿未变化、应跳过检测时返回 True
+        跳过的订单簿在记录器中写入未变化标记，回放时能看到每轮实际获取到的全部订单簿
+        """
+        if self.book_changed(market_id):
+            return False
+        if self.recorder:
+            self.recorder.record_unchanged(market_id)
+        return True
+    
+    def book_changed(self, market_id: str) -> bool:
+        """订单簿内容自上次检测以来是否有变化（无法判断时视为有变化）"""
+        get_hash = getattr(self.api, "get_order_book_hash", None)
+        content_hash = get_hash(market_id) if get_hash else None
+        if content_hash is None:
+            return True
+        if self._book_hashes.get(market_id) == content_hash:
+            return False
+        self._book_hashes[market_id] = content_hash
+        return True
+    
+    def _record_books(
+        self,
+        order_books: Iterator[Tuple[int, Dict, Dict]]
+    ) -> Iterator[Tuple[int, Dict, Dict]]:
+        """将参与检测的订单簿交给记录器（仅入队，不阻塞扫描）"""
+        for index, market, order_book in order_books:
+            self.recorder.record(market.get("id"), order_book)
+            yield index, market, order_book
+    
+    def _observe_books(
+        self,
+        order_books: Iterator[Tuple[int, Dict, OrderBook]]
+    ) -> Iterator[Tuple[int, Dict, OrderBook]]:
+        """将获取到的订单簿交给 on_book 回调"""
+        for index, market, order_book in order_books:
+            try:
+                self.on_book(market.get("id"), order_book)
+            except Exception as e:
+                logger.error("订单簿回调处理市场 %s 时出错: %s", market.get('id'), e)
+            yield index, market, order_book
+    
+    def _iter_batches(
+        self,
+        order_books: Iterator[Tuple[int, Dict, Dict]]
+    ) -> Iterator[Tuple[int, List[OpportunityCandidate]]]:
+        """将到达的订单簿攒成批次，交给向量化引擎检测"""
+        batch = []
+        for index, market, order_book in order_books:
+            batch.append((index, market, order_book))
+            if len(batch) >= self.batch_size:
+                yield from self._detect_batch(batch)
+                batch = []
+        
+        if batch:
+            yield from self._detect_batch(batch)
+    
+    def _detect_batch(
+        self,
+        batch: List[Tuple[int, Dict, Dict]]
+    ) -> List[Tuple[int, List[OpportunityCandidate]]]:
+        """向量化检测一个批次"""
+        indexes = []
+        entries = []
+        for index, market, order_book in batch:
+            try:
+                if not isinstance(order_book, OrderBook):
+                    order_book = OrderBook.from_dict(order_book, market.get("id", ""))
+                entries.append((market.get("id"), len(parse_json_list(market.get("outcomes"))), order_book))
+                indexes.append(index)
+            except Exception as e:
+                logger.error("解析市场 %s 订单簿时出错: %s", market.get('id'), e)
+        
+        started = time.perf_counter_ns()
+        try:
+            return list(zip(indexes, self.batch_detector.detect(
+                entries,
+                self.min_profit_pct,
+                pairs=self.strategy in ("pair", "both"),
+                baskets=self.strategy in ("basket", "both"),
+                min_basket_outcomes=3 if self.strategy == "both" else 2
+            )))
+        except Exception as e:
+            logger.error("批量检测出错: %s", e)
+            return []
+        finally:
+            BATCH_DETECTION_LATENCY.record_since(started)
+    
+    def _iter_order_books(self, markets: Iterable[Dict]) -> Iterator[Tuple[int, Dict, Dict]]:
+        """按完成顺序产出 (市场序号, 市场, 订单簿)"""
+        self.last_scan_count = 0
+        self.last_screened_out = 0
+        
+        # 第一阶段：基于指示价格的廉价预筛选
+        markets = self._screen_markets(markets)
+        
+        if self.max_workers > 1:
+            yield from self._iter_concurrently(markets)
+            return
+        
+        for index, market in markets:
             try:
-                market_id = market.get("id")
-                if not market_id:
-                    continue
-                
                 # 获取订单簿
-                order_book = self.api.get_order_book(market_id)
-                if not order_book:
-                    continue
-                
-                # 检测该市场中的套利机会
-                market_opportunities = self._detect_market_opportunities(
-                    market_id, 
-                    market, 
-                    order_book
-                )
-                opportunities.extend(market_opportunities)
-                
+                order_book = self.fetch_order_book(market)
             except Exception as e:
-                logger.error(f"检测市场 {market.get('id')} 时出错: {e}")
+                logger.error("检测市场 %s 时出错: %s", market.get('id'), e)
                 continue
+            
+            if order_book:
+                yield index, market, order_book
+    
+    def _screen_markets(self, markets: Iterable[Dict]) -> Iterator[Tuple[int, Dict]]:
+        """产出通过预筛选的 (市场序号, 市场)，同时统计扫描和剔除数量"""
+        for index, market in enumerate(markets):
+            self.last_scan_count += 1
+            if not self.passes_prescreen(market):
+                self.last_screened_out += 1
+                continue
+            yield index, market
+    
+    def passes_prescreen(self, market: Dict) -> bool:
+        """市场是否值得获取订单簿（未启用预筛选时总是 True）"""
+        if not self.prescreen or (self.prescreen_exempt and self.prescreen_exempt(market)):
+            return True
+        return self._passes_prescreen(market)
+    
+    def _passes_prescreen(self, market: Dict) -> bool:
+        """
+        基于市场列表中的指示价格 (outcomePrices) 判断是否可能存在套利
+        取所选策略下可能的最低价格和，利润率低于 min_profit_pct - 宽容度 则剔除；
+        缺少指示价格的市场一律放行
+        """
+        try:
+            prices = sorted(float(p) for p in parse_json_list(market.get("outcomePrices")))
+        except (TypeError, ValueError):
+            return True
+        if len(prices) < 2:
+            return True
         
-        self.opportunities = opportunities
-        return opportunities
+        candidates = []
+        if self.strategy in ("pair", "both"):
+            candidates.append(prices[0] + prices[1])
+        if self.strategy in ("basket", "both"):
+            candidates.append(sum(prices))
+        
+        price_sum = min(candidates)
+        if price_sum <= 0:
+            return True
+        
+        profit_pct = ((1.0 - price_sum) / price_sum) * 100
+        return profit_pct >= self.min_profit_pct - self.prescreen_slack_pct
+    
+    def _iter_concurrently(self, markets: Iterator[Tuple[int, Dict]]) -> Iterator[Tuple[int, Dict, Dict]]:
+        """
+        在有界线程池中并发获取订单簿
+        在途请求数受限，每个订单簿到达后立即交给检测
+        """
+        market_iter = markets
+        max_in_flight = self.max_workers * 2
+        pending: Dict[Future, Tuple[int, Dict]] = {}
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            def submit_next() -> bool:
+                for index, market in market_iter:
+                    pending[pool.submit(self.fetch_order_book, market)] = (index, market)
+                    return True
+                return False
+            
+            while len(pending) < max_in_flight and submit_next():
+                pass
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, market = pending.pop(future)
+                    submit_next()
+                    
+                    try:
+                        order_book = future.result()
+                    except Exception as e:
+                        logger.error("获取市场 %s 订单簿时出错: %s", market.get('id'), e)
+                        continue
+                    
+                    if order_book:
+                        yield index, market, order_book
+    
+    def fetch_order_book(self, market: Dict) -> Optional[OrderBook]:
+        """获取并解析单个市场的订单簿，记录到达时间"""
+        market_id = market.get("id")
+        if not market_id:
+            return None
+        order_book = self.api.get_order_book(market_id)
+        if not order_book:
+            return None
+        received_ns = time.perf_counter_ns()
+        # 原始 JSON 只解析一次
+        if not isinstance(order_book, OrderBook):
+            order_book = OrderBook.from_dict(order_book, market_id)
+        order_book.received_ns = received_ns
+        return order_book
+    
+    def detect_market(self, market: Dict, order_book: OrderBook) -> List[ArbitrageOpportunity]:
+        """基于已有的订单簿（如推送镜像）检测单个市场"""
+        return [self.to_opportunity(candidate) for candidate in self.detect_market_candidates(market, order_book)]
+    
+    def detect_market_candidates(self, market: Dict, order_book: OrderBook) -> List[OpportunityCandidate]:
+        """同 detect_market，返回候选机会"""
+        if self.recorder:
+            self.recorder.record(market.get("id"), order_book)
+        return self._detect_with_book(market, order_book)
+    
+    def _detect_with_book(self, market: Dict, order_book) -> List[OpportunityCandidate]:
+        """基于已获取的订单簿检测该市场中的套利机会"""
+        started = time.perf_counter_ns()
+        try:
+            # 原始 JSON 只解析一次
+            if not isinstance(order_book, OrderBook):
+                order_book = OrderBook.from_dict(order_book, market.get("id", ""))
+            
+            return self._detect_market_opportunities(
+                market.get("id"),
+                market,
+                order_book
+            )
+        except Exception as e:
+            logger.error("检测市场 %s 时出错: %s", market.get('id'), e)
+            return []
+        finally:
+            DETECTION_LATENCY.record_since(started)
     
     def _detect_market_opportunities(
         self, 
         market_id: str, 
         market: Dict, 
-        order_book: Dict
-    ) -> List[ArbitrageOpportunity]:
+        order_book: OrderBook
+    ) -> List[OpportunityCandidate]:
         """检测单个市场中的套利机会"""
         opportunities = []
         
         try:
-            outcomes = market.get("outcomes", [])
+            outcomes = parse_json_list(market.get("outcomes"))
             if len(outcomes) < 2:
                 return opportunities
             
-            # 从订单簿获取价格
-            prices = self._extract_prices_from_orderbook(order_book, outcomes)
-            if not prices or len(prices) < 2:
-                return opportunities
+            if self.strategy in ("pair", "both"):
+                # 从订单簿获取价格
+                prices = self._extract_prices_from_orderbook(order_book, outcomes)
+                if not prices or len(prices) < 2:
+                    return opportunities
+                
+                # 检查互补对（如YES/NO）
+                for i in range(len(prices)):
+                    for j in range(i + 1, len(prices)):
+                        opp = self._check_complementary_pair(
+                            market_id, i, j, prices[i], prices[j], order_book
+                        )
+                        if opp:
+                            opportunities.append(opp)
             
-            # 检查互补对（如YES/NO）
-            for i in range(len(prices)):
-                for j in range(i + 1, len(prices)):
-                    opp = self._check_complementary_pair(
-                        market_id, i, j, prices[i], prices[j]
-                    )
-                    if opp:
-                        opportunities.append(opp)
+            if self.strategy == "basket" or (self.strategy == "both" and len(outcomes) > 2):
+                # 检查整篮（所有结果）；both 策略下二元市场的整篮与互补对是同一笔交易，只检测互补对
+                opp = self._check_basket(market_id, len(outcomes), order_book)
+                if opp:
+                    opportunities.append(opp)
             
             return opportunities
         except Exception as e:
-            logger.error(f"分析市场 {market_id} 时出错: {e}")
+            logger.error("分析市场 %s 时出错: %s", market_id, e)
             return opportunities
     
-    def _extract_prices_from_orderbook(self, order_book: Dict, outcomes: List[str]) -> List[float]:
+    def _extract_prices_from_orderbook(self, order_book: OrderBook, outcomes: List[str]) -> List[float]:
         """从订单簿提取最佳价格"""
         try:
-            prices = []
-            
-            for outcome_id, outcome_name in enumerate(outcomes):
-                # 获取该结果的最佳买入和卖出价格
-                best_bid = 0.0
-                best_ask = 1.0
-                
-                bids = order_book.get("bids", [])
-                asks = order_book.get("asks", [])
-                
-                # 找到该结果对应的最佳报价
-                for bid in bids:
-                    if bid.get("outcome_id") == outcome_id:
-                        best_bid = max(best_bid, float(bid.get("price", 0)))
-                
-                for ask in asks:
-                    if ask.get("outcome_id") == outcome_id:
-                        best_ask = min(best_ask, float(ask.get("price", 1)))
-                
-                # 使用中间价格
-                mid_price = (best_bid + best_ask) / 2 if best_bid > 0 else best_ask
-                prices.append(mid_price)
-            
-            return prices
+            # 使用中间价格
+            return [order_book.mid_price(outcome_id) for outcome_id in range(len(outcomes))]
         except Exception as e:
-            logger.error(f"提取价格失败: {e}")
+            logger.error("提取价格失败: %s", e)
             return []
     
     def _check_complementary_pair(
@@ -114,8 +430,9 @@ class ArbitrageDetector:
         outcome_1: int, 
         outcome_2: int, 
         price_1: float, 
-        price_2: float
-    ) -> Optional[ArbitrageOpportunity]:
+        price_2: float,
+        order_book: Optional[OrderBook] = None
+    ) -> Optional[OpportunityCandidate]:
         """
         检查互补对中是否存在套利机会
         在二元市场中，YES和NO价格之和应该接近1.0
@@ -133,37 +450,120 @@ class ArbitrageDetector:
             if profit_pct < self.min_profit_pct:
                 return None
             
-            # 创建套利机会对象
-            opportunity = ArbitrageOpportunity(
-                opportunity_id=f"{market_id}_{outcome_1}_{outcome_2}_{datetime.now().timestamp()}",
+            # 沿两条腿的订单簿深度计算可执行大小
+            max_size, expected_prices = self._calculate_executable_size(
+                order_book, [outcome_1, outcome_2]
+            )
+            if max_size <= 0:
+                return None
+            
+            # 候选机会：ID 和完整对象推迟到决定执行时再构建
+            opportunity = OpportunityCandidate(
                 market_id=market_id,
                 buy_outcome=outcome_1,  # 买较便宜的
                 sell_outcome=outcome_2 if price_2 > price_1 else outcome_1,
                 buy_price=min(price_1, price_2),
                 sell_price=max(price_1, price_2),
                 profit_percentage=profit_pct,
-                max_size=self._calculate_max_size(price_1, price_2),
-                detected_at=datetime.now()
+                max_size=max_size,
+                detected_ns=self.clock.time_ns(),
+                expected_prices=expected_prices,
+                book_received_ns=order_book.received_ns if order_book else 0
             )
             
             logger.info(
-                f"检测到套利机会: {market_id} - 利润: {profit_pct:.2f}% - "
-                f"价格和: {price_sum:.4f}"
+                "检测到套利机会: %s - 利润: %.2f%% - 价格和: %.4f",
+                market_id, profit_pct, price_sum
             )
             
             return opportunity
         
         except Exception as e:
-            logger.error(f"检查互补对时出错: {e}")
+            logger.error("检查互补对时出错: %s", e)
             return None
     
-    def _calculate_max_size(self, price_1: float, price_2: float) -> float:
+    def _check_basket(
+        self,
+        market_id: str,
+        num_outcomes: int,
+        order_book: OrderBook
+    ) -> Optional[OpportunityCandidate]:
         """
-        基于价格计算最大交易大小
-        使用流动性和风险考虑
+        检查整篮套利：以最佳卖价买入全部结果，成本之和小于1即存在套利
+        每个市场只需一次 O(n) 遍历
         """
-        # 简化计算：基于较低价格的可用流动性
-        min_price = min(price_1, price_2)
-        # 假设每个价格点有100美元的流动性
-        max_size = 100.0 / min_price if min_price > 0 else 100.0
-        return min(max_size, 1000.0)  # 最大1000个代币
+        try:
+            asks = []
+            for outcome_id in range(num_outcomes):
+                side = order_book.asks.get(outcome_id)
+                # 任一结果无卖单则无法凑齐整篮
+                if not side or not side.prices:
+                    return None
+                asks.append(min(side.prices[0], 1.0))
+            
+            basket_cost = sum(asks)
+            if basket_cost >= 1.0:
+                return None
+            
+            profit_pct = ((1.0 - basket_cost) / basket_cost) * 100
+            if profit_pct < self.min_profit_pct:
+                return None
+            
+            # 沿全部结果的订单簿深度计算可执行大小与成交均价
+            max_size, expected_prices = self._calculate_executable_size(
+                order_book, list(range(num_outcomes))
+            )
+            if max_size <= 0:
+                return None
+            
+            # 按可执行大小的成交均价计算整篮成本和利润率
+            basket_cost = sum(expected_prices)
+            profit_pct = ((1.0 - basket_cost) / basket_cost) * 100
+            
+            opportunity = OpportunityCandidate(
+                market_id=market_id,
+                buy_outcome=-1,
+                sell_outcome=-1,
+                buy_price=basket_cost,
+                sell_price=1.0,
+                profit_percentage=profit_pct,
+                max_size=max_size,
+                detected_ns=self.clock.time_ns(),
+                strategy="basket",
+                legs=[
+                    OpportunityLeg(market_id, o, order_book.asks[o].price_for_size(max_size))
+                    for o in range(num_outcomes)
+                ],
+                expected_prices=expected_prices,
+                book_received_ns=order_book.received_ns
+            )
+            
+            logger.info(
+                "检测到整篮套利机会: %s - 利润: %.2f%% - 整篮成本: %.4f - 可执行大小: %.2f",
+                market_id, profit_pct, basket_cost, opportunity.max_size
+            )
+            
+            return opportunity
+        
+        except Exception as e:
+            logger.error("检查整篮时出错: %s", e)
+            return None
+    
+    def _calculate_executable_size(
+        self,
+        order_book: OrderBook,
+        outcomes: List[int]
+    ) -> Tuple[float, List[float]]:
+        """
+        同时沿各腿卖单档位吃单，求组合成交均价仍满足最小利润率的最大数量
+        返回 (数量, 各腿成交均价)，最大1000个代币
+        """
+        sides = [order_book.asks.get(outcome_id) for outcome_id in outcomes]
+        if any(side is None for side in sides):
+            return 0.0, []
+        
+        return walk_executable_size(
+            sides,
+            max_cost_for_profit(self.min_profit_pct),
+            max_size=1000.0
+        )
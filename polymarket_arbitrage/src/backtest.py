@@ -0,0 +1,279 @@
+"""基于记录的订单簿快照回放：驱动真实的检测器与模拟执行器，快于实时运行"""
+import itertools
+import json
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.arbitrage_bot import ArbitrageBot
+from src.arbitrage_detector import ArbitrageDetector
+from src.book_recorder import UNCHANGED, BookRecordReader
+from src.clock import SimulatedClock
+from src.database import TradeDatabase
+from src.models import OrderBook
+from src.trade_executor import TradeExecutor
+from config.settings import config
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayAPI:
+    """
+    回放数据源，代替 PolymarketAPI
+    每次列出市场时只返回自上次列出以来有新快照的市场（相当于跳过未变化的订单簿，
+    否则同一份快照会在每轮扫描中被重复交易）；没有新快照时将模拟时钟快进到下一个快照
+    """
+
+    def __init__(self, reader: BookRecordReader, clock: SimulatedClock, days: Optional[List[str]] = None):
+        self.reader = reader
+        self.clock = clock
+        self._columns = [reader.load(day) for day in (days or reader.days())]
+
+        # 所有快照按时间排序 (稳定排序保持记录顺序)
+        ts = np.concatenate([c["ts"] for c in self._columns]) if self._columns else np.empty(0, np.int64)
+        market = np.concatenate([c["market"] for c in self._columns]).astype(np.int64) if self._columns else np.empty(0, np.int64)
+        day = np.concatenate([np.full(len(c["ts"]), i) for i, c in enumerate(self._columns)]) if self._columns else np.empty(0, np.int64)
+        row = np.concatenate([np.arange(len(c["ts"])) for c in self._columns]) if self._columns else np.empty(0, np.int64)
+        flags = np.concatenate([c["flags"] for c in self._columns]) if self._columns else np.empty(0, np.uint8)
+
+        order = np.argsort(ts, kind="stable")
+        self._ts = ts[order]
+        self._market = market[order]
+        self._day = day[order]
+        self._row = row[order]
+        unchanged = (flags[order] & UNCHANGED) != 0
+
+        # 每个市场的快照时间序列，用于二分查找某一时刻可见的快照；
+        # 未变化标记指向该市场之前最近的完整快照（没有时为 -1），内容哈希随之不变，检测器照常跳过
+        self._market_ts: Dict[str, np.ndarray] = {}
+        self._market_pos: Dict[str, np.ndarray] = {}
+        market_numbers: Dict[str, int] = {}
+        by_market = np.argsort(self._market, kind="stable")
+        boundaries = np.flatnonzero(np.diff(self._market[by_market])) + 1
+        for positions in np.split(by_market, boundaries) if len(by_market) else []:
+            number = int(self._market[positions[0]])
+            market_id = reader.market_ids[number]
+            market_numbers[market_id] = number
+            latest_full = np.maximum.accumulate(np.where(unchanged[positions], -1, np.arange(len(positions))))
+            self._market_ts[market_id] = self._ts[positions]
+            self._market_pos[market_id] = np.where(latest_full >= 0, positions[np.maximum(latest_full, 0)], -1)
+
+        num_outcomes = self._num_outcomes(len(reader.market_ids))
+        self.markets = {
+            market_id: {
+                "id": market_id,
+                "outcomes": json.dumps([str(i) for i in range(num_outcomes[number])]),
+            }
+            for market_id, number in market_numbers.items()
+        }
+        self._books: Dict[str, Tuple[int, OrderBook]] = {}
+        self._listed_ns = -1
+
+        if len(self._ts):
+            self.clock.advance_to(int(self._ts[0]))
+
+    @property
+    def start_ns(self) -> int:
+        return int(self._ts[0]) if len(self._ts) else 0
+
+    @property
+    def end_ns(self) -> int:
+        return int(self._ts[-1]) if len(self._ts) else 0
+
+    def exhausted(self) -> bool:
+        """所有快照都已被列出"""
+        return not len(self._ts) or self._listed_ns >= self.end_ns
+
+    def _num_outcomes(self, market_count: int) -> np.ndarray:
+        """由记录中出现过的最大结果 ID 推断每个市场的结果数（至少为 2）"""
+        largest = np.ones(market_count, dtype=np.int64)
+        for columns in self._columns:
+            nonempty = columns["levels"] > 0
+            if not nonempty.any():
+                continue
+            # 每个非空快照内的最大结果 ID，再按市场取最大
+            per_snapshot = np.maximum.reduceat(columns["outcome"], columns["offset"][nonempty])
+            np.maximum.at(largest, columns["market"][nonempty].astype(np.int64), per_snapshot)
+        return largest + 1
+
+    def iter_markets(self, page_size: int = 100, max_markets: Optional[int] = None, prefetch: bool = True) -> Iterator[Dict]:
+        """列出自上次列出以来订单簿有更新的市场"""
+        lower = int(self._ts.searchsorted(np.int64(self._listed_ns), side="right"))
+        if lower >= len(self._ts):
+            return
+        if self._ts[lower] > self.clock.time_ns():
+            self.clock.advance_to(int(self._ts[lower]))
+
+        now = self.clock.time_ns()
+        upper = int(self._ts.searchsorted(np.int64(now), side="right"))
+        self._listed_ns = now
+
+        changed = dict.fromkeys(self._market[lower:upper].tolist())
+        for count, market in enumerate(changed):
+            if max_markets and count >= max_markets:
+                return
+            yield self.markets[self.reader.market_ids[market]]
+
+    def get_markets(self, limit: int = 100, offset: int = 0) -> List[Dict]:
+        return list(self.markets.values())[offset:offset + limit]
+
+    def _visible(self, market_id: str) -> int:
+        """当前时刻该市场可见的最新快照位置，没有时返回 -1"""
+        market_ts = self._market_ts.get(market_id)
+        if market_ts is None:
+            return -1
+        index = int(market_ts.searchsorted(np.int64(self.clock.time_ns()), side="right")) - 1
+        return int(self._market_pos[market_id][index]) if index >= 0 else -1
+
+    def get_order_book(self, market_id: str) -> Optional[OrderBook]:
+        """返回当前时刻可见的最新快照"""
+        position = self._visible(market_id)
+        if position < 0:
+            return None
+        cached = self._books.get(market_id)
+        if cached and cached[0] == position:
+            return cached[1]
+        order_book = self.reader.order_book(self._columns[self._day[position]], int(self._row[position]))
+        self._books[market_id] = (position, order_book)
+        return order_book
+
+    def get_order_book_hash(self, market_id: str) -> Optional[str]:
+        position = self._visible(market_id)
+        return str(position) if position >= 0 else None
+
+    def cache_stats(self) -> Dict:
+        return {}
+
+    def create_order(self, order_data: Dict) -> Optional[Dict]:
+        logger.error("回放模式不支持真实下单")
+        return None
+
+    def cancel_order(self, order_id: str) -> bool:
+        return True
+
+
+def run_backtest(
+    record_dir: str,
+    min_profit_pct: float = config.MIN_PROFIT_PERCENTAGE,
+    max_position_size: float = config.MAX_POSITION_SIZE,
+    days: Optional[List[str]] = None,
+    check_interval: float = config.CHECK_INTERVAL,
+    db_path: Optional[str] = None,
+    quiet: bool = True
+) -> Dict:
+    """
+    对记录的数据运行一次回测
+    返回参数与 TradeDatabase 统计；db_path 为空时使用临时数据库
+    """
+    clock = SimulatedClock(0)
+    api = ReplayAPI(BookRecordReader(record_dir), clock, days)
+    detector = ArbitrageDetector(
+        api,
+        min_profit_pct,
+        engine=config.DETECTION_ENGINE,
+        batch_size=config.DETECTION_BATCH_SIZE,
+        strategy=config.ARBITRAGE_STRATEGY,
+        skip_unchanged=True,
+        clock=clock
+    )
+    # 回测只做模拟执行，不需要签名
+    executor = TradeExecutor(api, None, enable_trading=False, clock=clock)
+
+    temp_dir = None
+    if db_path is None:
+        temp_dir = tempfile.mkdtemp(prefix="backtest_")
+        db_path = os.path.join(temp_dir, "trades.db")
+
+    # 各模块的逐条机会 / 模拟成交日志经 src 父记录器输出；结束后恢复原级别
+    quiet_loggers = [logging.getLogger(name) for name in ("ArbitrageBot", "src")] if quiet else []
+    previous_levels = [quiet_logger.level for quiet_logger in quiet_loggers]
+    for quiet_logger in quiet_loggers:
+        quiet_logger.setLevel(logging.WARNING)
+
+    try:
+        db = TradeDatabase(db_path, write_behind=True, batch_size=config.DB_BATCH_SIZE, synchronous="OFF")
+        bot = ArbitrageBot(
+            api, detector, executor, db,
+            check_interval=check_interval,
+            max_position_size=max_position_size,
+            clock=clock
+        )
+        bot.start(until=api.exhausted)
+
+        # stop() 已关闭数据库，重新打开读取统计
+        db = TradeDatabase(db_path)
+        result = {
+            "min_profit_pct": min_profit_pct,
+            "max_position_size": max_position_size,
+            "opportunities": bot.total_opportunities,
+            "simulated_seconds": round((api.end_ns - api.start_ns) / 1e9, 3),
+            **db.get_statistics(),
+        }
+        db.close()
+        return result
+    finally:
+        for quiet_logger, level in zip(quiet_loggers, previous_levels):
+            quiet_logger.setLevel(level)
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def _run_backtest_args(args: Tuple) -> Dict:
+    return run_backtest(*args)
+
+
+def sweep(
+    record_dir: str,
+    min_profit_pcts: List[float],
+    max_position_sizes: List[float],
+    days: Optional[List[str]] = None,
+    check_interval: float = config.CHECK_INTERVAL,
+    workers: Optional[int] = None
+) -> List[Dict]:
+    """在多个进程中并行回测参数网格"""
+    grid = [
+        (record_dir, min_profit, max_position, days, check_interval)
+        for min_profit, max_position in itertools.product(min_profit_pcts, max_position_sizes)
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_backtest_args, grid))
+
+
+def main():
+    """命令行回测 / 参数扫描"""
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="基于记录的订单簿快照回测")
+    parser.add_argument("--record-dir", default=config.RECORD_DIR)
+    parser.add_argument("--days", nargs="*", help="回测的日期 (YYYY-MM-DD)，默认全部")
+    parser.add_argument("--min-profit", type=float, nargs="+", default=[config.MIN_PROFIT_PERCENTAGE])
+    parser.add_argument("--max-position", type=float, nargs="+", default=[config.MAX_POSITION_SIZE])
+    parser.add_argument("--check-interval", type=float, default=config.CHECK_INTERVAL)
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，默认为CPU核数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    results = sweep(
+        args.record_dir, args.min_profit, args.max_position,
+        args.days, args.check_interval, args.workers
+    )
+    elapsed = time.perf_counter() - started
+
+    for result in sorted(results, key=lambda r: r.get("total_profit", 0), reverse=True):
+        logger.info(
+            f"最小利润率 {result['min_profit_pct']}% - 最大头寸 {result['max_position_size']} "
+            f"- 交易 {result.get('total_trades', 0)} - 已平仓 {result.get('closed_trades', 0)} "
+            f"- 总利润 ${result.get('total_profit', 0):.2f} - 平均利润率 {result.get('average_profit_pct', 0):.2f}%"
+        )
+    logger.info(f"{len(results)} 组参数回测完成，用时 {elapsed:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""基于 NumPy 的向量化批量套利检测"""
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from src.models import OpportunityCandidate, OrderBook
+
+logger = logging.getLogger(__name__)
+
+# (market_id, 结果1, 结果2, 价格1, 价格2, 订单簿) -> 套利机会
+OpportunityBuilder = Callable[[str, int, int, float, float, OrderBook], Optional[OpportunityCandidate]]
+# (market_id, 结果数, 订单簿) -> 整篮套利机会
+BasketBuilder = Callable[[str, int, OrderBook], Optional[OpportunityCandidate]]
+
+
+class TopOfBook(NamedTuple):
+    """一批市场的最优报价矩阵 (市场数 × 结果数)"""
+    best_bids: np.ndarray
+    best_asks: np.ndarray
+    has_ask: np.ndarray
+    valid: np.ndarray
+
+
+class BatchDetector:
+    """
+    批量检测引擎
+    将一批市场的最优报价打包成 (市场数 × 结果数) 矩阵，
+    一次性向量化计算所有互补对 / 整篮的价格和、利润率并按阈值过滤，
+    只为通过过滤的行构建 OpportunityCandidate
+    """
+
+    def __init__(self, build_opportunity: OpportunityBuilder, build_basket: Optional[BasketBuilder] = None):
+        self.build_opportunity = build_opportunity
+        self.build_basket = build_basket
+        self._pair_cache: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def _pairs(self, num_outcomes: int) -> Tuple[np.ndarray, np.ndarray]:
+        """所有 i < j 的结果对索引，顺序与逐对循环一致"""
+        pairs = self._pair_cache.get(num_outcomes)
+        if pairs is None:
+            pairs = np.triu_indices(num_outcomes, k=1)
+            self._pair_cache[num_outcomes] = pairs
+        return pairs
+
+    def pack_top_of_book(self, entries: List[Tuple[str, int, OrderBook]]) -> TopOfBook:
+        """将每个市场各结果的最佳买卖价打包成矩阵"""
+        width = max((num_outcomes for _, num_outcomes, _ in entries), default=0)
+        best_bids = np.zeros((len(entries), width))
+        best_asks = np.ones((len(entries), width))
+        has_ask = np.zeros((len(entries), width), dtype=bool)
+        valid = np.zeros((len(entries), width), dtype=bool)
+
+        # 先收集 (行, 列, 价格) 再一次性散射写入，避免逐元素写 ndarray
+        bid_rows, bid_cols, bid_prices = [], [], []
+        ask_rows, ask_cols, ask_prices = [], [], []
+        for row, (_, num_outcomes, order_book) in enumerate(entries):
+            if num_outcomes < 2:
+                continue
+            valid[row, :num_outcomes] = True
+            for outcome_id, side in order_book.bids.items():
+                if side.prices and 0 <= outcome_id < num_outcomes:
+                    bid_rows.append(row)
+                    bid_cols.append(outcome_id)
+                    bid_prices.append(side.prices[0])
+            for outcome_id, side in order_book.asks.items():
+                if side.prices and 0 <= outcome_id < num_outcomes:
+                    ask_rows.append(row)
+                    ask_cols.append(outcome_id)
+                    ask_prices.append(side.prices[0])
+
+        best_bids[bid_rows, bid_cols] = bid_prices
+        best_asks[ask_rows, ask_cols] = ask_prices
+        has_ask[ask_rows, ask_cols] = True
+
+        return TopOfBook(
+            best_bids=np.maximum(best_bids, 0.0),
+            best_asks=np.minimum(best_asks, 1.0),
+            has_ask=has_ask,
+            valid=valid,
+        )
+
+    def pack_prices(self, entries: List[Tuple[str, int, OrderBook]]) -> np.ndarray:
+        """将每个市场各结果的中间价打包成矩阵，缺失位置填 NaN"""
+        return self._mid_prices(self.pack_top_of_book(entries))
+
+    def _mid_prices(self, top: TopOfBook) -> np.ndarray:
+        # 与 OrderBook.mid_price 相同：无买单时使用最佳卖价
+        prices = np.where(top.best_bids > 0, (top.best_bids + top.best_asks) / 2, top.best_asks)
+        prices[~top.valid] = np.nan
+        return prices
+
+    def detect(
+        self,
+        entries: List[Tuple[str, int, OrderBook]],
+        min_profit_pct: float,
+        pairs: bool = True,
+        baskets: bool = False,
+        min_basket_outcomes: int = 2
+    ) -> List[List[OpportunityCandidate]]:
+        """
+        批量检测
+        entries 为 (market_id, 结果数, 订单簿) 列表，返回与之对齐的套利机会列表；
+        结果数少于 min_basket_outcomes 的市场不检测整篮（同时检测互补对时，二元市场的整篮与互补对是同一笔交易）
+        """
+        results: List[List[OpportunityCandidate]] = [[] for _ in entries]
+        top = self.pack_top_of_book(entries)
+        if top.valid.shape[1] < 2:
+            return results
+
+        if pairs:
+            self._detect_pairs(entries, self._mid_prices(top), min_profit_pct, results)
+        if baskets and self.build_basket:
+            self._detect_baskets(entries, top, min_profit_pct, results, min_basket_outcomes)
+
+        return results
+
+    def _detect_pairs(
+        self,
+        entries: List[Tuple[str, int, OrderBook]],
+        prices: np.ndarray,
+        min_profit_pct: float,
+        results: List[List[OpportunityCandidate]]
+    ):
+        """向量化检测所有互补对"""
+        first, second = self._pairs(prices.shape[1])
+        price_1 = prices[:, first]
+        price_2 = prices[:, second]
+        price_sum = price_1 + price_2
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            profit_pct = (1.0 - price_sum) / price_sum * 100
+
+        # NaN 参与的比较均为 False，填充位置自然被过滤
+        mask = (price_sum < 1.0) & (profit_pct >= min_profit_pct)
+        rows, cols = np.nonzero(mask)
+
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            market_id, _, order_book = entries[row]
+            opportunity = self.build_opportunity(
+                market_id,
+                int(first[col]),
+                int(second[col]),
+                float(price_1[row, col]),
+                float(price_2[row, col]),
+                order_book
+            )
+            if opportunity:
+                results[row].append(opportunity)
+
+    def _detect_baskets(
+        self,
+        entries: List[Tuple[str, int, OrderBook]],
+        top: TopOfBook,
+        min_profit_pct: float,
+        results: List[List[OpportunityCandidate]],
+        min_outcomes: int = 2
+    ):
+        """向量化检测整篮：每行卖价求和一次即可"""
+        # 填充位置不计入成本；任一有效结果缺少卖单则整行无效
+        complete = np.all(top.has_ask | ~top.valid, axis=1) & top.valid.any(axis=1)
+        basket_cost = np.where(top.valid, top.best_asks, 0.0).sum(axis=1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            profit_pct = (1.0 - basket_cost) / basket_cost * 100
+
+        mask = complete & (basket_cost < 1.0) & (profit_pct >= min_profit_pct)
+        if min_outcomes > 2:
+            mask &= np.fromiter((num_outcomes for _, num_outcomes, _ in entries), np.int64, len(entries)) >= min_outcomes
+        for row in np.nonzero(mask)[0].tolist():
+            market_id, num_outcomes, order_book = entries[row]
+            opportunity = self.build_basket(market_id, num_outcomes, order_book)
+            if opportunity:
+                results[row].append(opportunity)
@@ -0,0 +1,341 @@
+"""订单簿快照记录：按日分段、按列存储的追加写文件 + 内存映射读取"""
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from src.models import OrderBook
+
+logger = logging.getLogger(__name__)
+
+# 各列单独存为定宽数组文件: <根目录>/<YYYY-MM-DD>/<列名>.bin
+# 快照列：每个订单簿一行
+SNAPSHOT_COLUMNS: Dict[str, np.dtype] = {
+    "ts": np.dtype("<i8"),        # 获取时间 (Unix 纳秒)
+    "market": np.dtype("<u4"),    # 市场编号，对应 markets.txt 中的行号
+    "levels": np.dtype("<u4"),    # 该快照的档位数
+    "flags": np.dtype("u1"),      # UNCHANGED=内容与该市场上一快照相同（不重复存储档位）
+}
+# 档位列：每个档位一行，按快照顺序连续存放
+LEVEL_COLUMNS: Dict[str, np.dtype] = {
+    "outcome": np.dtype("<u2"),   # 结果 ID
+    "side": np.dtype("u1"),       # 0=买单, 1=卖单
+    "price": np.dtype("<f4"),
+    "size": np.dtype("<f4"),
+}
+COLUMNS: Dict[str, np.dtype] = {**SNAPSHOT_COLUMNS, **LEVEL_COLUMNS}
+MARKETS_FILE = "markets.txt"
+BID, ASK = 0, 1
+UNCHANGED = 1
+# 早期记录没有这些列，读取时按全 0 补齐
+OPTIONAL_COLUMNS = ("flags",)
+# float32 价格还原时对齐到的小数位（远小于最小价格跳动）
+PRICE_DECIMALS = 6
+
+
+class BookRecorder:
+    """
+    订单簿快照记录器
+    record() 只把 (时间, 市场, 订单簿) 放入有界队列；
+    由后台线程转换为定宽数组并批量追加到当天的列文件，扫描循环几乎没有额外开销；
+    队列满时丢弃新快照（计入 dropped）而不是阻塞扫描
+    """
+
+    def __init__(self, root: str, batch_size: int = 256, flush_interval: float = 1.0, max_queue: int = 10000):
+        self.root = root
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        os.makedirs(root, exist_ok=True)
+
+        self._market_ids: Dict[str, int] = {}
+        self._load_market_ids()
+        self._files: Dict[str, Dict[str, object]] = {}
+        self._day: Optional[str] = None
+        self.recorded_books = 0
+        self.recorded_levels = 0
+        self.dropped = 0
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._writer = threading.Thread(target=self._writer_loop, name="BookRecorder", daemon=True)
+        self._writer.start()
+
+    def record(self, market_id: str, order_book: Union[Dict, OrderBook], ts_ns: Optional[int] = None):
+        """记录一个订单簿（原始 JSON 或 OrderBook）"""
+        if self._closed or not market_id:
+            return
+        self._enqueue((time.time_ns() if ts_ns is None else ts_ns, market_id, order_book))
+
+    def record_unchanged(self, market_id: str, ts_ns: Optional[int] = None):
+        """记录一次获取到的订单簿与该市场上一快照相同（只写一行标记，回放时沿用上一快照）"""
+        if self._closed or not market_id:
+            return
+        self._enqueue((time.time_ns() if ts_ns is None else ts_ns, market_id, None))
+
+    def _enqueue(self, item: Tuple[int, str, Optional[Union[Dict, OrderBook]]]):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """等待队列中的快照全部写入磁盘"""
+        if self._writer.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """写完剩余快照并关闭文件"""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+        self._close_files()
+        logger.info(
+            f"订单簿记录器已关闭: {self.recorded_books} 个快照, {self.recorded_levels} 个档位, "
+            f"队列满丢弃 {self.dropped} 个"
+        )
+
+    def _load_market_ids(self):
+        path = os.path.join(self.root, MARKETS_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for index, line in enumerate(f):
+                self._market_ids[line.rstrip("\n")] = index
+
+    def _market_index(self, market_id: str) -> int:
+        """返回市场编号，新市场追加到字典文件（先于数据写入）"""
+        index = self._market_ids.get(market_id)
+        if index is None:
+            index = len(self._market_ids)
+            with open(os.path.join(self.root, MARKETS_FILE), "a", encoding="utf-8") as f:
+                f.write(market_id + "\n")
+            self._market_ids[market_id] = index
+        return index
+
+    def _writer_loop(self):
+        """后台写线程：攒批转换并追加"""
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            if first is None:
+                self._queue.task_done()
+                return
+
+            batch = [first]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                logger.error(f"写入订单簿快照失败 ({len(batch)} 个): {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if stop:
+                return
+
+    def _write_batch(self, batch: List[Tuple[int, str, Union[Dict, OrderBook]]]):
+        """将一批快照按日分组后追加到列文件"""
+        by_day: Dict[str, Dict[str, list]] = {}
+        for ts_ns, market_id, order_book in batch:
+            day = time.strftime("%Y-%m-%d", time.gmtime(ts_ns / 1e9))
+            columns = by_day.setdefault(day, {name: [] for name in COLUMNS})
+            market = self._market_index(market_id)
+            rows = 0
+            if order_book is not None:
+                for side, outcome_id, price, size in _iter_levels(order_book):
+                    columns["outcome"].append(outcome_id)
+                    columns["side"].append(side)
+                    columns["price"].append(price)
+                    columns["size"].append(size)
+                    rows += 1
+            columns["ts"].append(ts_ns)
+            columns["market"].append(market)
+            columns["levels"].append(rows)
+            columns["flags"].append(UNCHANGED if order_book is None else 0)
+            self.recorded_books += 1
+            self.recorded_levels += rows
+
+        for day in sorted(by_day):
+            files = self._day_files(day)
+            # 先写档位列再写快照列：读取时只接受档位已完整落盘的快照
+            for columns in (LEVEL_COLUMNS, SNAPSHOT_COLUMNS):
+                for name, dtype in columns.items():
+                    files[name].write(np.asarray(by_day[day][name], dtype=dtype).tobytes())
+                    files[name].flush()
+
+    def _day_files(self, day: str) -> Dict[str, object]:
+        """打开（必要时切换到）某一天的列文件"""
+        if self._day != day:
+            self._close_files()
+            directory = os.path.join(self.root, day)
+            os.makedirs(directory, exist_ok=True)
+            _pad_optional_columns(directory)
+            self._files = {
+                name: open(os.path.join(directory, f"{name}.bin"), "ab")
+                for name in COLUMNS
+            }
+            self._day = day
+        return self._files
+
+    def _close_files(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        self._day = None
+
+
+def _pad_optional_columns(directory: str):
+    """早期记录的目录缺少可选列时按已有快照数补 0，保证追加后各快照列对齐"""
+    ts_path = os.path.join(directory, "ts.bin")
+    if not os.path.exists(ts_path):
+        return
+    snapshots = os.path.getsize(ts_path) // SNAPSHOT_COLUMNS["ts"].itemsize
+    for name in OPTIONAL_COLUMNS:
+        path = os.path.join(directory, f"{name}.bin")
+        missing = snapshots - (os.path.getsize(path) // COLUMNS[name].itemsize if os.path.exists(path) else 0)
+        if missing > 0:
+            with open(path, "ab") as f:
+                f.write(np.zeros(missing, dtype=COLUMNS[name]).tobytes())
+
+
+def _iter_levels(order_book: Union[Dict, OrderBook]) -> Iterator[Tuple[int, int, float, float]]:
+    """逐档产出 (方向, 结果ID, 价格, 数量)"""
+    if isinstance(order_book, OrderBook):
+        for side, sides in ((BID, order_book.bids), (ASK, order_book.asks)):
+            for outcome_id, book_side in sides.items():
+                for price, size in zip(book_side.prices, book_side.sizes):
+                    yield side, outcome_id, price, size
+        return
+
+    for side, key in ((BID, "bids"), (ASK, "asks")):
+        for level in order_book.get(key) or []:
+            outcome_id = level.get("outcome_id")
+            if outcome_id is None:
+                continue
+            yield side, int(outcome_id), float(level.get("price", 0)), float(level.get("size", 0))
+
+
+class BookRecordReader:
+    """
+    订单簿快照读取
+    各列通过 np.memmap 只读映射，不复制数据
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        path = os.path.join(root, MARKETS_FILE)
+        self.market_ids: List[str] = []
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.market_ids = [line.rstrip("\n") for line in f]
+
+    def days(self) -> List[str]:
+        """已记录的日期，按时间顺序"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def load(self, day: str) -> Dict[str, np.ndarray]:
+        """
+        以内存映射方式打开某一天的所有列
+        额外返回 offset 列：每个快照第一个档位所在的行
+        """
+        directory = os.path.join(self.root, day)
+
+        def exists(name: str) -> bool:
+            return os.path.exists(os.path.join(directory, f"{name}.bin"))
+
+        def row_count(names: Dict[str, np.dtype]) -> int:
+            counts = []
+            for name, dtype in names.items():
+                if name in OPTIONAL_COLUMNS and not exists(name):
+                    continue
+                path = os.path.join(directory, f"{name}.bin")
+                counts.append(os.path.getsize(path) // dtype.itemsize if exists(name) else 0)
+            return min(counts)
+
+        def open_columns(names: Dict[str, np.dtype], rows: int) -> Dict[str, np.ndarray]:
+            if rows == 0:
+                return {name: np.empty(0, dtype=dtype) for name, dtype in names.items()}
+            # np.asarray 得到普通 ndarray 视图（仍是同一映射），切片开销比 memmap 子类小得多
+            return {
+                name: (
+                    np.asarray(np.memmap(os.path.join(directory, f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,)))
+                    if exists(name) else np.zeros(rows, dtype=dtype)
+                )
+                for name, dtype in names.items()
+            }
+
+        # 写入中途崩溃时各列长度可能不一致，只读取完整的快照
+        level_rows = row_count(LEVEL_COLUMNS)
+        snapshots = open_columns(SNAPSHOT_COLUMNS, row_count(SNAPSHOT_COLUMNS))
+        ends = np.cumsum(snapshots["levels"], dtype=np.int64)
+        complete = int(np.searchsorted(ends, level_rows, side="right"))
+
+        columns = {name: column[:complete] for name, column in snapshots.items()}
+        columns["offset"] = np.concatenate(([0], ends[:complete - 1])) if complete else np.empty(0, dtype=np.int64)
+        columns.update(open_columns(LEVEL_COLUMNS, level_rows))
+        return columns
+
+    def iter_snapshots(self, day: Optional[str] = None) -> Iterator[Tuple[int, str, OrderBook]]:
+        """
+        按记录顺序重建 (时间, market_id, OrderBook)
+        未变化标记产出该市场上一快照的订单簿（之前没有读到该市场的快照时跳过）
+        """
+        last: Dict[str, OrderBook] = {}
+        for current_day in ([day] if day else self.days()):
+            columns = self.load(current_day)
+            for index, (ts, market, flags) in enumerate(zip(
+                columns["ts"].tolist(), columns["market"].tolist(), columns["flags"].tolist()
+            )):
+                market_id = self.market_ids[market]
+                if flags & UNCHANGED:
+                    order_book = last.get(market_id)
+                    if order_book is None:
+                        continue
+                else:
+                    order_book = last[market_id] = self.order_book(columns, index)
+                yield ts, market_id, order_book
+
+    def order_book(self, columns: Dict[str, np.ndarray], index: int) -> OrderBook:
+        """由 load() 返回的列重建第 index 个快照"""
+        start = int(columns["offset"][index])
+        end = start + int(columns["levels"][index])
+        prices = np.round(columns["price"][start:end].astype(np.float64), PRICE_DECIMALS)
+
+        levels = {BID: {}, ASK: {}}
+        for side, outcome_id, price, size in zip(
+            columns["side"][start:end].tolist(),
+            columns["outcome"][start:end].tolist(),
+            prices.tolist(),
+            columns["size"][start:end].tolist(),
+        ):
+            levels[side].setdefault(outcome_id, []).append((price, size))
+
+        market_id = self.market_ids[int(columns["market"][index])]
+        return OrderBook.from_levels(market_id, levels[BID], levels[ASK])
@@ -0,0 +1,55 @@
+"""时钟抽象：实盘使用系统时钟，回测使用可快进的模拟时钟"""
+import time
+from datetime import datetime
+from typing import Optional
+
+
+class SystemClock:
+    """系统时钟"""
+
+    realtime = True
+
+    def time(self) -> float:
+        return time.time()
+
+    def time_ns(self) -> int:
+        return time.time_ns()
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+class SimulatedClock:
+    """
+    模拟时钟
+    以纳秒整数计时，sleep() 只推进时间不真正等待，回测可以远快于实时运行
+    """
+
+    realtime = False
+
+    def __init__(self, start_ns: Optional[int] = None):
+        self._now_ns = time.time_ns() if start_ns is None else int(start_ns)
+
+    def time(self) -> float:
+        return self._now_ns / 1e9
+
+    def time_ns(self) -> int:
+        return self._now_ns
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self._now_ns / 1e9)
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            self._now_ns += int(seconds * 1e9)
+
+    def advance_to(self, ts_ns: int):
+        """快进到指定时间（不会倒退）"""
+        self._now_ns = max(self._now_ns, int(ts_ns))
+
+
+# 默认时钟
+system_clock = SystemClock()
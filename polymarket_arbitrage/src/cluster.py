@@ -0,0 +1,551 @@
+"""
+多节点扫描集群：协调者分配市场分片、在节点加入或失联时重新平衡，
+接收各节点的机会流并去重，执行前由协调者裁决执行权，同一市场不会被两个节点同时交易。
+传输为 TCP 上的 JSON Lines（与订单簿推送相同），可以在一台机器上起多个节点测试
+"""
+import itertools
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config.settings import config
+from src.models import ArbitrageOpportunity, OpportunityCandidate, Trade
+from src.order_book_feed import read_messages, send_message
+from src.sharded_scanner import shard_of
+
+logger = logging.getLogger(__name__)
+
+
+def opportunity_key(market_id: str, strategy: str, buy_outcome: int, sell_outcome: int,
+                    buy_price: float, sell_price: float) -> str:
+    """机会的去重键：同一市场、同一组合、同一价格视为同一个机会"""
+    return f"{market_id}|{strategy}|{buy_outcome}|{sell_outcome}|{buy_price:.6f}|{sell_price:.6f}"
+
+
+def assign_shards(node_ids: Iterable[str], num_shards: int) -> Dict[str, List[int]]:
+    """
+    最高随机权重（rendezvous）哈希：每个分片归得分最高的节点
+    节点加入或离开时只有该节点相关的分片会移动
+    """
+    node_ids = sorted(node_ids)
+    assignment: Dict[str, List[int]] = {node_id: [] for node_id in node_ids}
+    if not node_ids:
+        return assignment
+    for shard in range(num_shards):
+        owner = max(node_ids, key=lambda node_id: zlib.crc32(f"{node_id}:{shard}".encode("utf-8")))
+        assignment[owner].append(shard)
+    return assignment
+
+
+class _NodeSession(socketserver.BaseRequestHandler):
+    """协调者一侧的单个节点连接"""
+
+    def setup(self):
+        self.node_id: Optional[str] = None
+        self.last_seen = time.monotonic()
+        self.send_lock = threading.Lock()
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        try:
+            for message in read_messages(self.request):
+                coordinator.handle_message(self, message)
+        except OSError:
+            pass
+
+    def finish(self):
+        self.server.coordinator.node_disconnected(self)
+
+    def send(self, message: Dict) -> bool:
+        try:
+            with self.send_lock:
+                send_message(self.request, message)
+            return True
+        except OSError:
+            return False
+
+    def close(self):
+        try:
+            self.request.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class ClusterCoordinator:
+    """
+    集群协调者
+    - 分片：市场按 ID 哈希到 num_shards 个分片，分片按 rendezvous 哈希分配给在线节点
+    - 存活：heartbeat_timeout 秒内没有心跳的节点被移除，其分片和执行权立即重新分配
+    - 去重：dedup_window 秒内同一机会只计一次（重新平衡期间新旧节点可能同时扫描同一市场）
+    - 执行权：节点执行前申请，同一市场同一时间只授予一个节点，租约 lease_ttl 秒后自动失效；
+      已成交的机会在去重窗口内不再授予
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        num_shards: int = 64,
+        heartbeat_timeout: float = 10.0,
+        lease_ttl: float = 30.0,
+        dedup_window: float = 60.0
+    ):
+        self.num_shards = num_shards
+        self.heartbeat_timeout = heartbeat_timeout
+        self.lease_ttl = lease_ttl
+        self.dedup_window = dedup_window
+        self._lock = threading.RLock()
+        self._nodes: Dict[str, _NodeSession] = {}
+        self._assignment: Dict[str, List[int]] = {}
+        self.epoch = 0
+        # market_id -> (node_id, 机会键, 到期时间)
+        self._leases: Dict[str, Tuple[str, str, float]] = {}
+        # 机会键 -> 到期时间（按插入顺序，便于清理）
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._traded: "OrderedDict[str, float]" = OrderedDict()
+        self.received = 0
+        self.duplicates = 0
+        self.granted = 0
+        self.rejected = 0
+        self._running = False
+        self._monitor: Optional[threading.Thread] = None
+
+        self._server = _ThreadingServer((host, port), _NodeSession)
+        self._server.coordinator = self
+        self._server_thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def start(self) -> "ClusterCoordinator":
+        self._running = True
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name="ClusterCoordinator", daemon=True)
+        self._server_thread.start()
+        self._monitor = threading.Thread(target=self._monitor_loop, name="ClusterMonitor", daemon=True)
+        self._monitor.start()
+        logger.info(f"集群协调者已启动: {self.address[0]}:{self.address[1]} - 分片数: {self.num_shards}")
+        return self
+
+    def stop(self):
+        self._running = False
+        self._server.shutdown()
+        with self._lock:
+            sessions = list(self._nodes.values())
+        for session in sessions:
+            session.close()
+        self._server.server_close()
+        if self._monitor:
+            self._monitor.join(timeout=5)
+
+    def nodes(self) -> List[str]:
+        with self._lock:
+            return sorted(self._nodes)
+
+    def assignment(self) -> Dict[str, List[int]]:
+        with self._lock:
+            return {node_id: list(shards) for node_id, shards in self._assignment.items()}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "nodes": len(self._nodes),
+                "epoch": self.epoch,
+                "received": self.received,
+                "unique": self.received - self.duplicates,
+                "duplicates": self.duplicates,
+                "granted": self.granted,
+                "rejected": self.rejected,
+                "leases": len(self._leases),
+            }
+
+    def handle_message(self, session: _NodeSession, message: Dict):
+        """处理节点发来的一条消息（在该节点的连接线程中调用）"""
+        session.last_seen = time.monotonic()
+        op = message.get("op")
+        if op == "join":
+            self._join(session, str(message.get("node_id")))
+        elif session.node_id is None:
+            session.send({"type": "error", "reason": "未加入集群"})
+        elif op == "heartbeat":
+            pass
+        elif op == "opportunities":
+            self._receive_opportunities(message.get("items") or [])
+        elif op == "claim":
+            granted, reason = self._claim(session.node_id, message.get("market_id"), message.get("key"))
+            session.send({"type": "claim_result", "claim_id": message.get("claim_id"),
+                          "granted": granted, "reason": reason})
+        elif op == "release":
+            self._release(session.node_id, message.get("market_id"), message.get("key"), bool(message.get("traded")))
+
+    def node_disconnected(self, session: _NodeSession):
+        with self._lock:
+            if session.node_id and self._nodes.get(session.node_id) is session:
+                logger.warning(f"节点 {session.node_id} 已断开")
+                self._remove_node(session.node_id)
+
+    def _join(self, session: _NodeSession, node_id: str):
+        with self._lock:
+            previous = self._nodes.get(node_id)
+            if previous is not None and previous is not session:
+                # 同名节点重连：旧连接作废
+                previous.node_id = None
+                previous.close()
+            session.node_id = node_id
+            self._nodes[node_id] = session
+            logger.info(f"节点 {node_id} 加入集群（共 {len(self._nodes)} 个节点）")
+            # 重连的节点可能分到与之前相同的分片，也要重新通知
+            self._assignment.pop(node_id, None)
+            self._rebalance()
+
+    def _remove_node(self, node_id: str):
+        """移除节点，收回其执行权并重新平衡（调用方持锁）"""
+        self._nodes.pop(node_id, None)
+        for market_id in [m for m, (owner, _, _) in self._leases.items() if owner == node_id]:
+            del self._leases[market_id]
+        self._rebalance()
+
+    def _rebalance(self):
+        """重新分配分片并通知分片发生变化的节点（调用方持锁）"""
+        assignment = assign_shards(self._nodes, self.num_shards)
+        self.epoch += 1
+        for node_id, shards in assignment.items():
+            if self._assignment.get(node_id) != shards:
+                self._nodes[node_id].send({
+                    "type": "assignment",
+                    "epoch": self.epoch,
+                    "num_shards": self.num_shards,
+                    "shards": shards,
+                })
+        self._assignment = assignment
+        logger.info(
+            f"分片已重新分配 (epoch {self.epoch}): "
+            + (", ".join(f"{node_id}={len(shards)}" for node_id, shards in assignment.items()) or "无在线节点")
+        )
+
+    def _receive_opportunities(self, items: List[List]):
+        """去重各节点上报的机会流"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            for item in items:
+                key = opportunity_key(*item[:6])
+                self.received += 1
+                if key in self._seen:
+                    self.duplicates += 1
+                    continue
+                self._seen[key] = now + self.dedup_window
+
+    def _claim(self, node_id: str, market_id: Optional[str], key: Optional[str]) -> Tuple[bool, str]:
+        """裁决执行权：市场没有其他节点的有效租约、且该机会尚未成交时授予"""
+        if not market_id or not key:
+            return False, "无效请求"
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            if key in self._traded:
+                self.rejected += 1
+                return False, "该机会已成交"
+            lease = self._leases.get(market_id)
+            if lease and lease[0] != node_id:
+                self.rejected += 1
+                return False, f"市场正由节点 {lease[0]} 执行"
+            self._leases[market_id] = (node_id, key, now + self.lease_ttl)
+            self.granted += 1
+            return True, ""
+
+    def _release(self, node_id: str, market_id: Optional[str], key: Optional[str], traded: bool):
+        with self._lock:
+            lease = self._leases.get(market_id)
+            if lease and lease[0] == node_id:
+                del self._leases[market_id]
+            if traded and key:
+                self._traded[key] = time.monotonic() + self.dedup_window
+
+    def _prune(self, now: float):
+        """清理过期的去重记录和租约（调用方持锁）"""
+        for entries in (self._seen, self._traded):
+            while entries:
+                key, expires = next(iter(entries.items()))
+                if expires > now:
+                    break
+                entries.popitem(last=False)
+        for market_id in [m for m, (_, _, expires) in self._leases.items() if expires <= now]:
+            del self._leases[market_id]
+
+    def _monitor_loop(self):
+        """移除心跳超时的节点"""
+        while self._running:
+            time.sleep(min(1.0, self.heartbeat_timeout / 4))
+            now = time.monotonic()
+            with self._lock:
+                expired = [
+                    node_id for node_id, session in self._nodes.items()
+                    if now - session.last_seen > self.heartbeat_timeout
+                ]
+                for node_id in expired:
+                    logger.warning(f"节点 {node_id} 心跳超时，收回其分片")
+                    session = self._nodes[node_id]
+                    session.node_id = None
+                    session.close()
+                    self._remove_node(node_id)
+                self._prune(now)
+
+
+class ClusterNode:
+    """
+    集群中的扫描节点
+    包装一个节点本地的 ArbitrageBot：只扫描分配给本节点的分片，把检测到的机会上报协调者，
+    执行前通过 acquire() 向协调者申请执行权（作为 bot.execution_gate）
+    """
+
+    def __init__(
+        self,
+        bot,
+        host: str,
+        port: int,
+        node_id: Optional[str] = None,
+        heartbeat_interval: float = 2.0,
+        claim_timeout: float = 2.0
+    ):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.heartbeat_interval = heartbeat_interval
+        self.claim_timeout = claim_timeout
+        self.num_shards = 0
+        self.shards: Set[int] = set()
+        self.epoch = 0
+        self.assigned = threading.Event()
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self._claim_ids = itertools.count(1)
+        self._claims: Dict[int, Tuple[threading.Event, List]] = {}
+        self._claim_keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._connected = False
+        self._running = False
+        self._reader: Optional[threading.Thread] = None
+        self._heartbeat: Optional[threading.Thread] = None
+        bot.execution_gate = self
+
+    @property
+    def connected(self) -> bool:
+        return self._connected
+
+    def connect(self, timeout: float = 10.0) -> bool:
+        """连接（或重新连接）协调者并加入集群，等待第一次分片分配"""
+        self._close_socket()
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=timeout)
+            sock.settimeout(None)
+        except OSError as e:
+            logger.error(f"无法连接集群协调者 {self.host}:{self.port}: {e}")
+            return False
+
+        self.assigned.clear()
+        self._sock = sock
+        self._connected = True
+        self._running = True
+        self._reader = threading.Thread(target=self._read_loop, args=(sock,), name=f"ClusterNode-{self.node_id}", daemon=True)
+        self._reader.start()
+        if self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="ClusterHeartbeat", daemon=True)
+            self._heartbeat.start()
+
+        if not self._send({"op": "join", "node_id": self.node_id}):
+            return False
+        if not self.assigned.wait(timeout):
+            logger.error("等待分片分配超时")
+            self._connected = False
+            return False
+        logger.info(f"节点 {self.node_id} 已加入集群 {self.host}:{self.port}")
+        return True
+
+    def close(self):
+        self._running = False
+        self._close_socket()
+        for thread in (self._reader, self._heartbeat):
+            if thread:
+                thread.join(timeout=5)
+        self._reader = None
+        self._heartbeat = None
+
+    def _close_socket(self):
+        self._connected = False
+        with self._send_lock:
+            sock, self._sock = self._sock, None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def owns(self, market: Dict) -> bool:
+        """市场是否属于本节点当前的分片"""
+        market_id = market.get("id")
+        return bool(market_id) and bool(self.num_shards) and shard_of(market_id, self.num_shards) in self.shards
+
+    def run(self, until=None):
+        """节点主循环：与 ArbitrageBot.start 相同的节奏，只扫描本节点的分片"""
+        bot = self.bot
+        logger.info("=" * 60)
+        logger.info(f"Polymarket套利机器人已启动（集群节点 {self.node_id}）")
+        logger.info(f"交易模式: {'启用' if bot.executor.enable_trading else '模拟'}")
+        logger.info(f"协调者: {self.host}:{self.port} - 检查间隔: {bot.check_interval}秒")
+        logger.info("=" * 60)
+
+        bot._register_metrics()
+        bot.scheduler.start()
+        bot.is_running = True
+        try:
+            while bot.is_running and not (until and until()):
+                if not self._connected:
+                    # 与协调者失联期间不扫描也不交易，等待重连
+                    self.connect()
+                if self._connected:
+                    self.scan_once()
+                bot.clock.sleep(bot.check_interval)
+                if not bot.scheduler.threaded:
+                    bot.scheduler.run_due()
+        except KeyboardInterrupt:
+            logger.info("收到中断信号，正在停止...")
+        except Exception as e:
+            logger.error(f"集群节点遇到错误: {e}")
+        finally:
+            self.close()
+            bot.stop()
+
+    def scan_once(self) -> List[OpportunityCandidate]:
+        """扫描一轮本节点的分片，上报机会并执行获得执行权的机会"""
+        bot = self.bot
+        try:
+            markets = (
+                market for market in bot.api.iter_markets(
+                    page_size=config.MARKET_PAGE_SIZE,
+                    max_markets=config.MAX_MARKETS or None
+                )
+                if self.owns(market)
+            )
+            candidates = list(bot.detector.iter_candidates(markets))
+            bot.total_screened_out += bot.detector.last_screened_out
+            logger.info(
+                f"节点 {self.node_id} 扫描了 {bot.detector.last_scan_count} 个市场（{len(self.shards)} 个分片），"
+                f"检测到 {len(candidates)} 个机会"
+            )
+            if candidates:
+                self._send({"op": "opportunities", "items": [
+                    [c.market_id, c.strategy, c.buy_outcome, c.sell_outcome, c.buy_price, c.sell_price,
+                     c.profit_percentage, c.max_size]
+                    for c in candidates
+                ]})
+            bot._handle_opportunities(candidates)
+            return candidates
+        except Exception as e:
+            logger.error(f"节点扫描时出错: {e}")
+            return []
+
+    def acquire(self, opportunity: ArbitrageOpportunity) -> bool:
+        """向协调者申请执行权；失联或超时视为拒绝"""
+        if not self._connected:
+            return False
+        key = opportunity_key(
+            opportunity.market_id, opportunity.strategy, opportunity.buy_outcome,
+            opportunity.sell_outcome, opportunity.buy_price, opportunity.sell_price
+        )
+        claim_id = next(self._claim_ids)
+        event = threading.Event()
+        result: List = []
+        with self._lock:
+            self._claims[claim_id] = (event, result)
+        try:
+            if not self._send({"op": "claim", "claim_id": claim_id,
+                               "market_id": opportunity.market_id, "key": key}):
+                return False
+            if not event.wait(self.claim_timeout):
+                logger.warning(f"申请市场 {opportunity.market_id} 的执行权超时")
+                return False
+        finally:
+            with self._lock:
+                self._claims.pop(claim_id, None)
+
+        granted, reason = result[0]
+        if granted:
+            with self._lock:
+                self._claim_keys[opportunity.opportunity_id] = key
+        else:
+            logger.info(f"未获得市场 {opportunity.market_id} 的执行权: {reason}")
+        return granted
+
+    def release(self, opportunity: ArbitrageOpportunity, trade: Optional[Trade]):
+        """执行结束，归还执行权并报告是否成交"""
+        with self._lock:
+            key = self._claim_keys.pop(opportunity.opportunity_id, None)
+        if key is not None:
+            self._send({"op": "release", "market_id": opportunity.market_id, "key": key, "traded": trade is not None})
+
+    def _send(self, message: Dict) -> bool:
+        try:
+            with self._send_lock:
+                if not self._sock:
+                    return False
+                send_message(self._sock, message)
+            return True
+        except OSError as e:
+            logger.error(f"发送到集群协调者失败: {e}")
+            self._connected = False
+            return False
+
+    def _read_loop(self, sock: socket.socket):
+        try:
+            for message in read_messages(sock):
+                self._handle_message(message)
+        except OSError as e:
+            if self._running:
+                logger.error(f"与集群协调者的连接中断: {e}")
+        finally:
+            # 已被重连替换的旧连接不影响当前状态
+            if sock is self._sock or self._sock is None:
+                self._connected = False
+                # 失联后不再认为持有任何分片；重连后以协调者新发的分配为准
+                self.shards = set()
+                self.epoch = 0
+
+    def _handle_message(self, message: Dict):
+        msg_type = message.get("type")
+        if msg_type == "assignment":
+            epoch = int(message.get("epoch", 0))
+            if epoch >= self.epoch:
+                self.epoch = epoch
+                self.num_shards = int(message.get("num_shards", 0))
+                self.shards = set(message.get("shards") or [])
+                logger.info(f"节点 {self.node_id} 分到 {len(self.shards)}/{self.num_shards} 个分片 (epoch {epoch})")
+                self.assigned.set()
+        elif msg_type == "claim_result":
+            with self._lock:
+                waiter = self._claims.get(message.get("claim_id"))
+            if waiter:
+                event, result = waiter
+                result.append((bool(message.get("granted")), message.get("reason", "")))
+                event.set()
+        elif msg_type == "error":
+            logger.error(f"集群协调者返回错误: {message.get('reason')}")
+
+    def _heartbeat_loop(self):
+        while self._running:
+            time.sleep(self.heartbeat_interval)
+            if self._connected:
+                self._send({"op": "heartbeat", "node_id": self.node_id})
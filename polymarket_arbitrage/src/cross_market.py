@@ -0,0 +1,361 @@
+"""
+跨市场套利检测：同一互斥事件 (negRisk) 下的各候选市场恰好有一个结算为 YES，
+按 Gamma 元数据把市场分组并增量维护索引，只在组内比较各市场的订单簿，不做 O(M²) 的两两比较。
+YES 最佳卖价之和低于 1（买入全部 YES），或 N 个市场的 NO 之和低于 N - 1（买入全部 NO）时
+产出多腿候选机会，各腿带有自己的市场 ID，由 TradeExecutor 按多腿篮子执行
+"""
+import logging
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from src.clock import SystemClock, system_clock
+from src.metrics import registry as metrics
+from src.models import OpportunityCandidate, OpportunityLeg, OrderBook
+from src.polymarket_api import parse_json_list
+from src.sizing import max_cost_for_profit, walk_executable_size
+
+logger = logging.getLogger(__name__)
+
+CROSS_DETECTION_LATENCY = metrics.histogram("cross_market_detection_seconds", "一轮跨市场组内检测的耗时")
+
+# 各腿买入的结果：YES 篮子到期兑付 1，N 个市场的 NO 篮子兑付 N - 1
+YES, NO = 0, 1
+
+
+class EventGroup:
+    """一个互斥事件下的市场"""
+
+    __slots__ = ("event_id", "members", "augmented", "shrunk")
+
+    def __init__(self, event_id: str):
+        self.event_id = event_id
+        # condition_id -> market_id：同一条件重复上架的市场只保留一个
+        self.members: Dict[str, str] = {}
+        # 事件含占位候选 (negRiskAugmented)，已上架的市场不一定覆盖全部结果
+        self.augmented = False
+        # 曾有成员结算或下架：剩余成员可能全部结算为 NO
+        self.shrunk = False
+
+    @property
+    def complete(self) -> bool:
+        """已上架的成员是否覆盖了事件的全部结果（YES 篮子只在此时成立）"""
+        return not self.augmented and not self.shrunk
+
+
+class EventIndex:
+    """
+    按事件 / 条件分组的市场索引
+    市场出现时加入所属事件组，结算或下架时移出；只收录互斥事件中的二元市场
+    """
+
+    def __init__(self):
+        self._groups: Dict[str, EventGroup] = {}
+        # market_id -> (event_id, condition_id, YES 结果序号, NO 结果序号)
+        self._markets: Dict[str, Tuple[str, str, int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def __contains__(self, market_id: str) -> bool:
+        return market_id in self._markets
+
+    @property
+    def market_count(self) -> int:
+        return len(self._markets)
+
+    def update(self, market: Dict) -> Optional[str]:
+        """
+        加入或刷新一个市场，已结算的市场从索引中移除
+        返回市场当前所属的事件 ID，不属于任何互斥事件时为 None
+        """
+        market_id = market.get("id")
+        if not market_id:
+            return None
+
+        event = _first_event(market)
+        event_id = exclusive_event_id(market, event)
+        outcomes = _binary_outcomes(market)
+        if event_id is None or outcomes is None:
+            self.remove(market_id)
+            return None
+
+        group = self._groups.get(event_id)
+        if group is None:
+            group = self._groups[event_id] = EventGroup(event_id)
+        group.augmented = _flag(market.get("negRiskAugmented")) or _flag(event.get("negRiskAugmented"))
+        if is_resolved(market):
+            # 首次见到时已结算的成员同样说明其余成员不一定覆盖全部结果
+            self.remove(market_id)
+            group.shrunk = True
+            return None
+
+        condition_id = str(market.get("conditionId") or market_id)
+        entry = self._markets.get(market_id)
+        if entry and (entry[0], entry[1]) != (event_id, condition_id):
+            self.remove(market_id)
+            entry = None
+
+        if entry is None:
+            if group.members.setdefault(condition_id, market_id) != market_id:
+                # 同一条件的另一个市场已在组内
+                return None
+        self._markets[market_id] = (event_id, condition_id, outcomes[YES], outcomes[NO])
+        return event_id
+
+    def remove(self, market_id: str) -> Optional[str]:
+        """移出一个市场（结算或下架），返回其原属事件 ID；空的事件组在 retain 时清理"""
+        entry = self._markets.pop(market_id, None)
+        if entry is None:
+            return None
+
+        event_id, condition_id = entry[0], entry[1]
+        group = self._groups[event_id]
+        del group.members[condition_id]
+        group.shrunk = True
+        return event_id
+
+    def retain(self, market_ids: Set[str]) -> List[str]:
+        """只保留给定的市场（一轮完整的市场列表），返回被移除的市场 ID"""
+        removed = [market_id for market_id in self._markets if market_id not in market_ids]
+        for market_id in removed:
+            self.remove(market_id)
+        for event_id in [event_id for event_id, group in self._groups.items() if not group.members]:
+            del self._groups[event_id]
+        return removed
+
+    def group(self, event_id: str) -> Optional[EventGroup]:
+        return self._groups.get(event_id)
+
+    def event_of(self, market_id: str) -> Optional[str]:
+        entry = self._markets.get(market_id)
+        return entry[0] if entry else None
+
+    def outcome(self, market_id: str, side: int) -> int:
+        """市场 YES (side=0) / NO (side=1) 对应的结果序号"""
+        return self._markets[market_id][2 + side]
+
+
+class CrossMarketDetector:
+    """
+    基于 EventIndex 的跨市场检测器
+    订单簿通过 observe_book 送入（与单市场检测共用同一次获取），成员订单簿变化的事件组标记为待检测，
+    detect_candidates 只评估这些组；组内任一成员的订单簿超过 max_book_age 秒未更新时跳过该组
+    """
+
+    def __init__(
+        self,
+        min_profit_pct: float = 0.5,
+        max_book_age: float = 30.0,
+        max_size: float = 1000.0,
+        yes_baskets: bool = True,
+        clock: SystemClock = system_clock
+    ):
+        self.min_profit_pct = min_profit_pct
+        self.max_book_age = max_book_age
+        self.max_size = max_size
+        # 市场列表被截断 (MAX_MARKETS) 时事件成员可能不全，应只检测 NO 篮子
+        self.yes_baskets = yes_baskets
+        self.clock = clock
+        self.index = EventIndex()
+        # market_id -> (最新订单簿, 观察时间)
+        self._books: Dict[str, Tuple[OrderBook, float]] = {}
+        self._dirty: Set[str] = set()
+        self.last_groups_evaluated = 0
+
+    def tracks(self, market: Dict) -> bool:
+        """市场是否属于某个已索引的事件组（预筛选不应剔除这些市场）"""
+        return market.get("id") in self.index
+
+    def track(self, markets: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        边产出市场边更新索引；市场列表完整遍历后，移除本轮未出现的市场
+        中途中断（异常、提前停止）时不做移除
+        """
+        seen = set()
+        for market in markets:
+            self.update_market(market)
+            market_id = market.get("id")
+            if market_id:
+                seen.add(market_id)
+            yield market
+
+        for market_id in self.index.retain(seen):
+            self._books.pop(market_id, None)
+
+    def update_markets(self, markets: Iterable[Dict]):
+        """用一轮完整的市场列表同步索引"""
+        for _ in self.track(markets):
+            pass
+
+    def update_market(self, market: Dict):
+        """加入、刷新或（已结算时）移除单个市场"""
+        market_id = market.get("id")
+        previous = self.index.event_of(market_id)
+        event_id = self.index.update(market)
+        if event_id is None:
+            self._books.pop(market_id, None)
+        if previous != event_id:
+            # 成员变化后组需要重新评估
+            self._dirty.update(key for key in (previous, event_id) if key and self.index.group(key))
+
+    def observe_book(self, market_id: str, order_book: OrderBook):
+        """记录已索引市场的最新订单簿，其所属事件组标记为待检测"""
+        event_id = self.index.event_of(market_id)
+        if event_id is None or not isinstance(order_book, OrderBook):
+            return
+        self._books[market_id] = (order_book, self.clock.time())
+        self._dirty.add(event_id)
+
+    def detect_candidates(self) -> List[OpportunityCandidate]:
+        """评估自上次调用以来有成员订单簿更新的事件组"""
+        started = time.perf_counter_ns()
+        dirty, self._dirty = self._dirty, set()
+        now = self.clock.time()
+        candidates = []
+        evaluated = 0
+        try:
+            for event_id in dirty:
+                group = self.index.group(event_id)
+                if group is None or len(group.members) < 2:
+                    continue
+                books = self._group_books(group, now)
+                if books is None:
+                    continue
+                evaluated += 1
+                candidates.extend(self._detect_group(group, books))
+            return candidates
+        except Exception as e:
+            logger.error("跨市场检测出错: %s", e)
+            return candidates
+        finally:
+            self.last_groups_evaluated = evaluated
+            CROSS_DETECTION_LATENCY.record_since(started)
+
+    def _group_books(self, group: EventGroup, now: float) -> Optional[List[Tuple[str, OrderBook]]]:
+        """组内全部成员的 (market_id, 订单簿)；任一成员缺少订单簿或已过期时为 None"""
+        books = []
+        for market_id in group.members.values():
+            entry = self._books.get(market_id)
+            if entry is None or now - entry[1] > self.max_book_age:
+                return None
+            books.append((market_id, entry[0]))
+        return books
+
+    def _detect_group(self, group: EventGroup, books: List[Tuple[str, OrderBook]]) -> List[OpportunityCandidate]:
+        candidates = []
+        if self.yes_baskets and group.complete:
+            candidate = self._check_basket(group.event_id, books, YES, 1.0)
+            if candidate:
+                candidates.append(candidate)
+        # NO 篮子不依赖成员完整：赢家不在已上架的成员中时兑付只会更多
+        candidate = self._check_basket(group.event_id, books, NO, float(len(books) - 1))
+        if candidate:
+            candidates.append(candidate)
+        return candidates
+
+    def _check_basket(
+        self,
+        event_id: str,
+        books: List[Tuple[str, OrderBook]],
+        side: int,
+        payout: float
+    ) -> Optional[OpportunityCandidate]:
+        """以各成员市场的最佳卖价买入同一侧 (YES / NO)，成本低于到期兑付即存在套利"""
+        legs = []
+        sides = []
+        for market_id, order_book in books:
+            outcome_id = self.index.outcome(market_id, side)
+            book_side = order_book.asks.get(outcome_id)
+            # 任一成员无卖单则无法凑齐篮子
+            if not book_side or not book_side.prices:
+                return None
+            legs.append((market_id, outcome_id))
+            sides.append(book_side)
+
+        cost = sum(min(book_side.prices[0], 1.0) for book_side in sides)
+        if cost <= 0 or cost >= payout or (payout - cost) / cost * 100 < self.min_profit_pct:
+            return None
+
+        # 沿各成员订单簿深度计算可执行大小与成交均价，利润要求按兑付金额缩放
+        max_size, expected_prices = walk_executable_size(
+            sides,
+            payout * max_cost_for_profit(self.min_profit_pct),
+            max_size=self.max_size
+        )
+        if max_size <= 0:
+            return None
+
+        cost = sum(expected_prices)
+        profit_pct = (payout - cost) / cost * 100
+        strategy = "cross_yes" if side == YES else "cross_no"
+        candidate = OpportunityCandidate(
+            market_id=event_id,
+            buy_outcome=-1,
+            sell_outcome=-1,
+            buy_price=cost,
+            sell_price=payout,
+            profit_percentage=profit_pct,
+            max_size=max_size,
+            detected_ns=self.clock.time_ns(),
+            strategy=strategy,
+            legs=[
+                OpportunityLeg(market_id, outcome_id, book_side.price_for_size(max_size))
+                for (market_id, outcome_id), book_side in zip(legs, sides)
+            ],
+            expected_prices=expected_prices,
+            # 以最早到达的订单簿计算 tick-to-trade 延迟
+            book_received_ns=min(order_book.received_ns for _, order_book in books)
+        )
+
+        logger.info(
+            "检测到跨市场套利机会: 事件 %s - %s - 市场数: %d - 利润: %.2f%% - 成本: %.4f - 可执行大小: %.2f",
+            event_id, strategy, len(books), profit_pct, cost, max_size
+        )
+        return candidate
+
+
+def exclusive_event_id(market: Dict, event: Optional[Dict] = None) -> Optional[str]:
+    """
+    市场所属互斥事件的 ID：优先 negRiskMarketID，其次所属事件的 ID
+    非 negRisk 市场（同一事件下的结果不互斥）返回 None
+    """
+    event = _first_event(market) if event is None else event
+    if not (_flag(market.get("negRisk")) or _flag(event.get("negRisk"))):
+        return None
+    event_id = (
+        market.get("negRiskMarketID")
+        or event.get("negRiskMarketID")
+        or event.get("id")
+        or market.get("eventId")
+    )
+    return str(event_id) if event_id else None
+
+
+def is_resolved(market: Dict) -> bool:
+    """市场已结算、归档或停止交易"""
+    return (
+        _flag(market.get("closed"))
+        or _flag(market.get("archived"))
+        or market.get("active") is False
+        or market.get("acceptingOrders") is False
+    )
+
+
+def _first_event(market: Dict) -> Dict:
+    events = market.get("events")
+    if isinstance(events, list) and events and isinstance(events[0], dict):
+        return events[0]
+    return {}
+
+
+def _binary_outcomes(market: Dict) -> Optional[Tuple[int, int]]:
+    """二元市场的 (YES 序号, NO 序号)，非二元市场为 None"""
+    outcomes = parse_json_list(market.get("outcomes"))
+    if len(outcomes) != 2:
+        return None
+    yes = 1 if str(outcomes[1]).strip().lower() == "yes" else 0
+    return yes, 1 - yes
+
+
+def _flag(value) -> bool:
+    return value is True or str(value).lower() == "true"
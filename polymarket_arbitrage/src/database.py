@@ -1,24 +1,72 @@
+import queue
 import sqlite3
+import threading
+import time
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from src.models import Trade
+from src.metrics import registry as metrics
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 一个写入事务（含提交）的耗时；同步模式下每笔交易一个事务
+WRITE_LATENCY = metrics.histogram("db_write_seconds", "交易写入事务（含提交）耗时")
+
 class TradeDatabase:
-    """交易历史数据库"""
-    
-    def __init__(self, db_path: str = "polymarket_trades.db"):
+    """
+    交易历史数据库
+    使用一个长连接（WAL 模式）；启用 write_behind 时，写入进入队列，
+    由后台写线程批量提交，交易主循环不再等待磁盘同步
+    """
+
+    def __init__(
+        self,
+        db_path: str = "polymarket_trades.db",
+        write_behind: bool = False,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        synchronous: str = "NORMAL",
+        flush_on_close: bool = True
+    ):
+        # 兼容 SQLAlchemy 风格的 sqlite:/// 路径
+        if db_path.startswith("sqlite:///"):
+            db_path = db_path[len("sqlite:///"):]
         self.db_path = db_path
+        self.write_behind = write_behind
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.flush_on_close = flush_on_close
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+
+        self._configure_connection(synchronous)
         self._initialize_database()
-    
+
+        if write_behind:
+            self._writer = threading.Thread(target=self._writer_loop, name="TradeDBWriter", daemon=True)
+            self._writer.start()
+
+    def _configure_connection(self, synchronous: str):
+        """WAL 模式 + 可配置的同步级别 (OFF / NORMAL / FULL)"""
+        try:
+            with self._lock:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(f"PRAGMA synchronous={synchronous.upper()}")
+        except Exception as e:
+            logger.error(f"配置数据库连接失败: {e}")
+
     def _initialize_database(self):
         """初始化数据库表"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
+            with self._lock:
+                cursor = self._conn.cursor()
+
                 # 创建交易表
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS trades (
@@ -34,134 +82,496 @@ class TradeDatabase:
                         profit_percentage REAL,
                         status TEXT,
                         executed_at TEXT,
-                        closed_at TEXT
+                        closed_at TEXT,
+                        leg_skew_ms REAL
+                    )
+                ''')
+
+                # 多腿交易（如整篮套利）的各腿订单
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS trade_legs (
+                        trade_id TEXT,
+                        leg_index INTEGER,
+                        order_id TEXT,
+                        market_id TEXT,
+                        token_id INTEGER,
+                        price REAL,
+                        quantity REAL,
+                        is_buy INTEGER,
+                        accepted_at TEXT,
+                        PRIMARY KEY (trade_id, leg_index)
                     )
                 ''')
-                
+
+                # 旧数据库补充新增的列
+                self._ensure_column(cursor, "trades", "leg_skew_ms", "REAL")
+                self._ensure_column(cursor, "trade_legs", "accepted_at", "TEXT")
+
+                # 统计汇总表：scope = all / market / day，随交易写入增量维护
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS trade_stats (
+                        scope TEXT,
+                        key TEXT,
+                        total_trades INTEGER DEFAULT 0,
+                        closed_trades INTEGER DEFAULT 0,
+                        profit_sum REAL DEFAULT 0,
+                        profit_pct_sum REAL DEFAULT 0,
+                        max_profit REAL,
+                        PRIMARY KEY (scope, key)
+                    )
+                ''')
+
                 # 创建索引
                 cursor.execute('''
                     CREATE INDEX IF NOT EXISTS idx_market_id ON trades(market_id)
                 ''')
-                
+
                 cursor.execute('''
                     CREATE INDEX IF NOT EXISTS idx_status ON trades(status)
                 ''')
-                
+
                 cursor.execute('''
                     CREATE INDEX IF NOT EXISTS idx_executed_at ON trades(executed_at)
                 ''')
-                
-                conn.commit()
+
+                self._conn.commit()
+
+                # 旧数据库升级后汇总表为空，需从原始交易表重建一次
+                cursor.execute("SELECT 1 FROM trade_stats LIMIT 1")
+                if cursor.fetchone() is None:
+                    cursor.execute("SELECT 1 FROM trades LIMIT 1")
+                    if cursor.fetchone() is not None:
+                        self.rebuild_statistics()
+
                 logger.info("数据库初始化成功")
-        
+
         except Exception as e:
             logger.error(f"初始化数据库失败: {e}")
-    
+
+    @staticmethod
+    def _ensure_column(cursor: sqlite3.Cursor, table: str, column: str, column_type: str):
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
     def save_trade(self, trade: Trade) -> bool:
-        """保存交易到数据库"""
+        """
+        保存交易到数据库
+        write_behind 模式下只做快照入队，立即返回
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
+            # 交易对象后续会被修改（如平仓），入队前先取快照
+            record = self._trade_to_record(trade)
+
+            if self.write_behind and not self._closed:
+                self._queue.put(record)
+                return True
+
+            self._commit_records([record])
+            return True
+
+        except Exception as e:
+            logger.error(f"保存交易失败: {e}")
+            return False
+
+    def _trade_to_record(self, trade: Trade) -> Tuple[tuple, list]:
+        """将交易转换为 (trades 行, trade_legs 行列表)"""
+        row = (
+            trade.trade_id,
+            trade.opportunity_id,
+            trade.market_id,
+            trade.buy_order.order_id,
+            trade.sell_order.order_id,
+            trade.buy_order.price,
+            trade.sell_order.price,
+            trade.buy_order.quantity,
+            trade.profit_amount,
+            trade.profit_percentage,
+            trade.status,
+            trade.executed_at.isoformat() if trade.executed_at else None,
+            trade.closed_at.isoformat() if trade.closed_at else None,
+            trade.leg_skew_ms
+        )
+        legs = [
+            (
+                trade.trade_id, index, order.order_id, order.market_id,
+                order.token_id, order.price, order.quantity, int(order.is_buy),
+                order.accepted_at.isoformat() if order.accepted_at else None
+            )
+            for index, order in enumerate(trade.leg_orders)
+        ]
+        return row, legs
+
+    def _commit_records(self, records: List[Tuple[tuple, list]]):
+        """在一个事务中写入并提交一批记录"""
+        with self._lock:
+            started = time.perf_counter_ns()
+            self._write_records(records)
+            self._conn.commit()
+            WRITE_LATENCY.record_since(started)
+
+    def _write_records(self, records: List[Tuple[tuple, list]]):
+        """在当前事务中写入一批记录（调用方持有锁并负责提交）"""
+        cursor = self._conn.cursor()
+
+        for row, legs in records:
+            # 先取出旧记录，用于从汇总统计中扣除其贡献
+            cursor.execute(
+                'SELECT market_id, status, profit_amount, profit_percentage, executed_at '
+                'FROM trades WHERE trade_id = ?',
+                (row[0],)
+            )
+            old = cursor.fetchone()
+
+            cursor.execute('''
+                INSERT OR REPLACE INTO trades (
+                    trade_id, opportunity_id, market_id,
+                    buy_order_id, sell_order_id, buy_price, sell_price,
+                    quantity, profit_amount, profit_percentage,
+                    status, executed_at, closed_at, leg_skew_ms
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', row)
+
+            if legs:
+                cursor.execute('DELETE FROM trade_legs WHERE trade_id = ?', (row[0],))
+                cursor.executemany('''
+                    INSERT INTO trade_legs (
+                        trade_id, leg_index, order_id, market_id,
+                        token_id, price, quantity, is_buy, accepted_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', legs)
+
+            new = (row[2], row[10], row[8], row[9], row[11])
+            self._update_statistics(cursor, old, new)
+
+    @staticmethod
+    def _stats_keys(market_id: Optional[str], executed_at: Optional[str]) -> List[Tuple[str, str]]:
+        """一笔交易计入的汇总行"""
+        day = executed_at[:10] if executed_at else ""
+        return [("all", ""), ("market", market_id or ""), ("day", day)]
+
+    def _update_statistics(self, cursor: sqlite3.Cursor, old: Optional[tuple], new: tuple):
+        """
+        按差量更新汇总表：扣除旧记录贡献，加上新记录贡献
+        最大利润只能增量提高；当前最大值被移除时才对该范围重新求最大值
+        """
+        stale = set()
+
+        if old is not None:
+            market_id, status, profit, profit_pct, executed_at = old
+            closed = status == "closed"
+            for scope, key in self._stats_keys(market_id, executed_at):
                 cursor.execute('''
-                    INSERT OR REPLACE INTO trades (
-                        trade_id, opportunity_id, market_id, 
-                        buy_order_id, sell_order_id, buy_price, sell_price,
-                        quantity, profit_amount, profit_percentage,
-                        status, executed_at, closed_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    UPDATE trade_stats SET
+                        total_trades = total_trades - 1,
+                        closed_trades = closed_trades - ?,
+                        profit_sum = profit_sum - ?,
+                        profit_pct_sum = profit_pct_sum - ?
+                    WHERE scope = ? AND key = ?
                 ''', (
-                    trade.trade_id,
-                    trade.opportunity_id,
-                    trade.market_id,
-                    trade.buy_order.order_id,
-                    trade.sell_order.order_id,
-                    trade.buy_order.price,
-                    trade.sell_order.price,
-                    trade.buy_order.quantity,
-                    trade.profit_amount,
-                    trade.profit_percentage,
-                    trade.status,
-                    trade.executed_at.isoformat() if trade.executed_at else None,
-                    trade.closed_at.isoformat() if trade.closed_at else None
+                    int(closed),
+                    (profit or 0) if closed else 0,
+                    (profit_pct or 0) if closed else 0,
+                    scope, key
                 ))
-                
-                conn.commit()
+                if closed:
+                    cursor.execute(
+                        'SELECT max_profit FROM trade_stats WHERE scope = ? AND key = ?',
+                        (scope, key)
+                    )
+                    current = cursor.fetchone()
+                    if current and current[0] is not None and (profit or 0) >= current[0]:
+                        stale.add((scope, key))
+
+        market_id, status, profit, profit_pct, executed_at = new
+        closed = status == "closed"
+        for scope, key in self._stats_keys(market_id, executed_at):
+            cursor.execute('''
+                INSERT INTO trade_stats (scope, key, total_trades, closed_trades, profit_sum, profit_pct_sum, max_profit)
+                VALUES (?, ?, 1, ?, ?, ?, ?)
+                ON CONFLICT(scope, key) DO UPDATE SET
+                    total_trades = total_trades + 1,
+                    closed_trades = closed_trades + excluded.closed_trades,
+                    profit_sum = profit_sum + excluded.profit_sum,
+                    profit_pct_sum = profit_pct_sum + excluded.profit_pct_sum,
+                    max_profit = CASE
+                        WHEN excluded.max_profit IS NULL THEN max_profit
+                        WHEN max_profit IS NULL OR excluded.max_profit > max_profit THEN excluded.max_profit
+                        ELSE max_profit
+                    END
+            ''', (
+                scope, key,
+                int(closed),
+                (profit or 0) if closed else 0,
+                (profit_pct or 0) if closed else 0,
+                (profit or 0) if closed else None
+            ))
+
+        for scope, key in stale:
+            self._recompute_max_profit(cursor, scope, key)
+
+    def _recompute_max_profit(self, cursor: sqlite3.Cursor, scope: str, key: str):
+        """对单个汇总行重新计算最大利润（走索引，仅在当前最大值被移除时调用）"""
+        query = "SELECT MAX(profit_amount) FROM trades WHERE status = 'closed'"
+        params: tuple = ()
+        if scope == "market":
+            query += " AND market_id = ?"
+            params = (key,)
+        elif scope == "day":
+            if key:
+                query += " AND executed_at >= ? AND executed_at < ?"
+                params = (key, key + "~")
+            else:
+                query += " AND executed_at IS NULL"
+
+        cursor.execute(query, params)
+        max_profit = cursor.fetchone()[0]
+        cursor.execute(
+            'UPDATE trade_stats SET max_profit = ? WHERE scope = ? AND key = ?',
+            (max_profit, scope, key)
+        )
+
+    def rebuild_statistics(self) -> bool:
+        """从原始交易表重新计算全部汇总统计"""
+        try:
+            self.flush()
+            with self._lock:
+                cursor = self._conn.cursor()
+                cursor.execute('DELETE FROM trade_stats')
+
+                for scope, key_expr in (
+                    ("all", "''"),
+                    ("market", "COALESCE(market_id, '')"),
+                    ("day", "COALESCE(substr(executed_at, 1, 10), '')"),
+                ):
+                    cursor.execute(f'''
+                        INSERT INTO trade_stats (scope, key, total_trades, closed_trades, profit_sum, profit_pct_sum, max_profit)
+                        SELECT
+                            ?,
+                            {key_expr},
+                            COUNT(*),
+                            SUM(CASE WHEN status = 'closed' THEN 1 ELSE 0 END),
+                            COALESCE(SUM(CASE WHEN status = 'closed' THEN profit_amount END), 0),
+                            COALESCE(SUM(CASE WHEN status = 'closed' THEN profit_percentage END), 0),
+                            MAX(CASE WHEN status = 'closed' THEN profit_amount END)
+                        FROM trades
+                        GROUP BY {key_expr}
+                    ''', (scope,))
+
+                self._conn.commit()
+                logger.info("交易统计已重建")
                 return True
-        
+
         except Exception as e:
-            logger.error(f"保存交易失败: {e}")
+            logger.error(f"重建统计信息失败: {e}")
             return False
-    
-    def get_trade(self, trade_id: str) -> Optional[dict]:
+
+    def _writer_loop(self):
+        """后台写线程：取出队列中的记录，攒批后在一个事务中提交"""
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._closed:
+                    return
+                continue
+
+            if first is None:
+                self._queue.task_done()
+                return
+
+            batch = [first]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    self._queue.task_done()
+                    break
+                batch.append(record)
+
+            try:
+                self._commit_records(batch)
+            except Exception as e:
+                logger.error(f"批量写入交易失败 ({len(batch)} 条): {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if stop:
+                return
+
+    def flush(self):
+        """
+        等待队列中所有待写记录提交
+        读取默认只看已提交的数据，不调用 flush；需要读到自己刚写入的交易时传 consistent=True
+        """
+        if self.write_behind and self._writer and self._writer.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """关闭数据库；按配置决定是否先刷新未提交的写入"""
+        if self._closed:
+            return
+
+        self._closed = True
+        if self._writer and self._writer.is_alive():
+            if not self.flush_on_close:
+                dropped = self._discard_pending()
+                if dropped:
+                    logger.warning(f"关闭数据库时丢弃 {dropped} 条未写入的交易")
+            # 结束标记排在剩余记录之后：flush_on_close 时写线程先提交完全部记录再退出
+            self._queue.put(None)
+            self._writer.join(timeout=30)
+            if self._writer.is_alive():
+                # 写线程仍在提交，关闭连接会中断它；保留连接由写线程完成后随进程退出释放
+                logger.error("数据库写线程未能在 30 秒内结束，未关闭数据库连接")
+                return
+
+        with self._lock:
+            self._conn.close()
+
+    def _discard_pending(self) -> int:
+        """取出并丢弃队列中尚未被写线程取走的记录，返回丢弃数量"""
+        dropped = 0
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return dropped
+            self._queue.task_done()
+            dropped += 1
+
+    def get_trade(self, trade_id: str, consistent: bool = False) -> Optional[dict]:
         """获取单个交易"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
+            if consistent:
+                self.flush()
+            with self._lock:
+                cursor = self._conn.cursor()
+
                 cursor.execute('SELECT * FROM trades WHERE trade_id = ?', (trade_id,))
                 row = cursor.fetchone()
-                
+
                 return dict(row) if row else None
-        
+
         except Exception as e:
             logger.error(f"获取交易失败: {e}")
             return None
-    
-    def get_trades_by_status(self, status: str, limit: int = 100) -> List[dict]:
+
+    def get_trade_legs(self, trade_id: str, consistent: bool = False) -> List[dict]:
+        """获取多腿交易的各腿订单"""
+        try:
+            if consistent:
+                self.flush()
+            with self._lock:
+                cursor = self._conn.cursor()
+
+                cursor.execute(
+                    'SELECT * FROM trade_legs WHERE trade_id = ? ORDER BY leg_index',
+                    (trade_id,)
+                )
+                return [dict(row) for row in cursor.fetchall()]
+
+        except Exception as e:
+            logger.error(f"获取交易腿失败: {e}")
+            return []
+
+    def get_trades_by_status(self, status: str, limit: int = 100, consistent: bool = False) -> List[dict]:
         """获取特定状态的交易"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
+            if consistent:
+                self.flush()
+            with self._lock:
+                cursor = self._conn.cursor()
+
                 cursor.execute(
                     'SELECT * FROM trades WHERE status = ? ORDER BY executed_at DESC LIMIT ?',
                     (status, limit)
                 )
                 rows = cursor.fetchall()
-                
+
                 return [dict(row) for row in rows]
-        
+
         except Exception as e:
             logger.error(f"获取交易失败: {e}")
             return []
-    
-    def get_statistics(self) -> dict:
-        """获取交易统计"""
+
+    def get_statistics(self, consistent: bool = False) -> dict:
+        """获取交易统计（读取汇总表，O(1)）"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # 总交易数
-                cursor.execute('SELECT COUNT(*) FROM trades')
-                total_trades = cursor.fetchone()[0]
-                
-                # 成功交易数
-                cursor.execute("SELECT COUNT(*) FROM trades WHERE status = 'closed'")
-                closed_trades = cursor.fetchone()[0]
-                
-                # 总利润
-                cursor.execute('SELECT SUM(profit_amount) FROM trades WHERE status = ?', ('closed',))
-                total_profit = cursor.fetchone()[0] or 0
-                
-                # 平均利润率
-                cursor.execute('SELECT AVG(profit_percentage) FROM trades WHERE status = ?', ('closed',))
-                avg_profit_pct = cursor.fetchone()[0] or 0
-                
-                # 最大单笔利润
-                cursor.execute('SELECT MAX(profit_amount) FROM trades WHERE status = ?', ('closed',))
-                max_profit = cursor.fetchone()[0] or 0
-                
-                return {
-                    "total_trades": total_trades,
-                    "closed_trades": closed_trades,
-                    "total_profit": round(total_profit, 2),
-                    "average_profit_pct": round(avg_profit_pct, 2),
-                    "max_profit": round(max_profit, 2)
-                }
-        
+            stats = self._read_statistics("all", "", consistent)
+            return stats if stats is not None else self._format_statistics(None)
+
         except Exception as e:
             logger.error(f"获取统计信息失败: {e}")
             return {}
+
+    def get_market_statistics(self, market_id: str, consistent: bool = False) -> dict:
+        """获取单个市场的交易统计"""
+        try:
+            stats = self._read_statistics("market", market_id, consistent)
+            return stats if stats is not None else self._format_statistics(None)
+
+        except Exception as e:
+            logger.error(f"获取市场统计信息失败: {e}")
+            return {}
+
+    def get_daily_statistics(self, limit: int = 30, consistent: bool = False) -> List[dict]:
+        """获取按日汇总的交易统计，最近的日期在前"""
+        try:
+            if consistent:
+                self.flush()
+            with self._lock:
+                cursor = self._conn.cursor()
+
+                cursor.execute(
+                    "SELECT * FROM trade_stats WHERE scope = 'day' ORDER BY key DESC LIMIT ?",
+                    (limit,)
+                )
+                return [
+                    {"date": row["key"], **self._format_statistics(row)}
+                    for row in cursor.fetchall()
+                ]
+
+        except Exception as e:
+            logger.error(f"获取每日统计信息失败: {e}")
+            return []
+
+    def _read_statistics(self, scope: str, key: str, consistent: bool) -> Optional[dict]:
+        if consistent:
+            self.flush()
+        with self._lock:
+            cursor = self._conn.cursor()
+
+            cursor.execute(
+                'SELECT * FROM trade_stats WHERE scope = ? AND key = ?',
+                (scope, key)
+            )
+            row = cursor.fetchone()
+            return self._format_statistics(row) if row else None
+
+    @staticmethod
+    def _format_statistics(row: Optional[sqlite3.Row]) -> dict:
+        if row is None:
+            total_trades = closed_trades = 0
+            total_profit = profit_pct_sum = max_profit = 0
+        else:
+            total_trades = row["total_trades"]
+            closed_trades = row["closed_trades"]
+            total_profit = row["profit_sum"] or 0
+            profit_pct_sum = row["profit_pct_sum"] or 0
+            max_profit = row["max_profit"] or 0
+
+        avg_profit_pct = profit_pct_sum / closed_trades if closed_trades else 0
+
+        return {
+            "total_trades": total_trades,
+            "closed_trades": closed_trades,
+            "total_profit": round(total_profit, 2),
+            "average_profit_pct": round(avg_profit_pct, 2),
+            "max_profit": round(max_profit, 2)
+        }
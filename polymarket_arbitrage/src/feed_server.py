@@ -0,0 +1,181 @@
+"""本地订单簿推送服务（替身），用于在无网络环境下测试订阅模式"""
+import logging
+import random
+import socketserver
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from src.order_book_feed import read_messages, send_message
+from src.synthetic import SyntheticMarketGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class _FeedHandler(socketserver.BaseRequestHandler):
+    """处理单个订阅客户端的请求"""
+
+    def setup(self):
+        self.subscriptions: Set[str] = set()
+        self.send_lock = threading.Lock()
+        self.server.feed.register(self)
+
+    def handle(self):
+        try:
+            for message in read_messages(self.request):
+                op = message.get("op")
+                if op == "subscribe":
+                    markets = message.get("markets") or []
+                    self.subscriptions.update(markets)
+                    for market_id in markets:
+                        self.server.feed.send_snapshot(self, market_id)
+                elif op == "resync":
+                    self.server.feed.send_snapshot(self, message.get("market_id"))
+        except OSError:
+            pass
+
+    def finish(self):
+        self.server.feed.unregister(self)
+
+    def send(self, message: Dict) -> bool:
+        try:
+            with self.send_lock:
+                send_message(self.request, message)
+            return True
+        except OSError:
+            return False
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class FeedServer:
+    """
+    订单簿推送服务替身
+    基于合成数据生成器发布快照和按序号递增的增量，
+    drop_rate 可随机丢弃增量以模拟序号缺口
+    """
+
+    def __init__(
+        self,
+        generator: SyntheticMarketGenerator,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        interval: float = 0.05,
+        drop_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.generator = generator
+        self.interval = interval
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+        self.seqs: Dict[str, int] = {market["id"]: 0 for market in generator.markets}
+        self.clients: Set[_FeedHandler] = set()
+        self._lock = threading.Lock()
+        self._running = False
+        self._publisher: Optional[threading.Thread] = None
+
+        self._server = _ThreadingServer((host, port), _FeedHandler)
+        self._server.feed = self
+        self._server_thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def start(self) -> "FeedServer":
+        """在后台线程中启动服务和增量发布"""
+        self._running = True
+        self._server_thread = threading.Thread(
+            target=self._server.serve_forever, name="FeedServer", daemon=True
+        )
+        self._server_thread.start()
+        self._publisher = threading.Thread(target=self._publish_loop, name="FeedPublisher", daemon=True)
+        self._publisher.start()
+        logger.info(f"本地订单簿推送服务已启动: {self.address[0]}:{self.address[1]}")
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self._running = False
+        self._server.shutdown()
+        self._server.server_close()
+        if self._publisher:
+            self._publisher.join(timeout=5)
+
+    def register(self, client: _FeedHandler):
+        with self._lock:
+            self.clients.add(client)
+
+    def unregister(self, client: _FeedHandler):
+        with self._lock:
+            self.clients.discard(client)
+
+    def send_snapshot(self, client: _FeedHandler, market_id: str):
+        """向客户端发送某个市场的完整快照"""
+        with self._lock:
+            if market_id not in self.seqs:
+                return
+            book = self.generator.order_book(market_id)
+            message = {
+                "type": "snapshot",
+                "market_id": market_id,
+                "seq": self.seqs[market_id],
+                "bids": book.get("bids", []),
+                "asks": book.get("asks", []),
+            }
+            # 持锁发送，保证快照先于其后的增量到达
+            client.send(message)
+
+    def publish_step(self) -> Optional[str]:
+        """随机变动一个市场并向订阅者推送增量，返回变动的市场ID"""
+        with self._lock:
+            market_id = self.rng.choice(list(self.seqs))
+            changes = self.generator.step(market_id)
+            self.seqs[market_id] += 1
+            message = {
+                "type": "delta",
+                "market_id": market_id,
+                "seq": self.seqs[market_id],
+                "changes": changes,
+            }
+            clients = [c for c in self.clients if market_id in c.subscriptions]
+
+        for client in clients:
+            if self.drop_rate and self.rng.random() < self.drop_rate:
+                continue
+            client.send(message)
+        return market_id
+
+    def _publish_loop(self):
+        while self._running:
+            self.publish_step()
+            time.sleep(self.interval)
+
+
+def main():
+    """独立运行本地推送服务"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地订单簿推送服务（测试用）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--markets", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    generator = SyntheticMarketGenerator(num_markets=args.markets)
+    server = FeedServer(generator, args.host, args.port, args.interval, args.drop_rate).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
-from dataclasses import dataclass
-from typing import List, Optional
+import sys
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Optional, Sequence
 from datetime import datetime
 
-@dataclass
+# Python 3.10+ 使用 __slots__：实例不再携带 __dict__，占用更少内存，属性访问更快
+SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(frozen=True, **SLOTS)
 class Market:
     """市场数据模型"""
     market_id: str
@@ -16,7 +21,7 @@ class Market:
     created_at: datetime
     expires_at: Optional[datetime] = None
 
-@dataclass
+@dataclass(frozen=True, **SLOTS)
 class Order:
     """订单模型"""
     order_id: str
@@ -28,21 +33,69 @@ class Order:
     total_cost: float
     created_at: datetime
     status: str = "pending"
+    accepted_at: Optional[datetime] = None  # 交易所确认接收的时间
+
+@dataclass(frozen=True, **SLOTS)
+class OpportunityLeg:
+    """多腿套利中的一条腿（买入某市场的某个结果）"""
+    market_id: str
+    outcome: int
+    price: float  # 限价：吃到可执行大小时触及的最差价格
 
-@dataclass
+@dataclass(frozen=True, **SLOTS)
 class ArbitrageOpportunity:
     """套利机会"""
     opportunity_id: str
+    market_id: str  # 跨市场篮子为事件 ID，各腿的市场见 legs
+    buy_outcome: int  # 买入的结果索引（篮子套利为 -1，各结果见 legs）
+    sell_outcome: int  # 卖出的结果索引（篮子套利为 -1）
+    buy_price: float  # 篮子套利时为整篮成本
+    sell_price: float  # 篮子套利时为到期兑付 1.0
+    profit_percentage: float
+    max_size: float  # 最大交易大小
+    detected_at: datetime
+    strategy: str = "pair"  # pair=互补对, basket=整篮, cross_yes / cross_no=同一事件跨市场的 YES / NO 篮子
+    legs: List[OpportunityLeg] = field(default_factory=list)
+    expected_prices: List[float] = field(default_factory=list)  # 按 max_size 吃单时各腿的预期成交均价
+    book_received_ns: int = 0  # 所依据订单簿的到达时间 (time.perf_counter_ns)，用于统计 tick-to-trade 延迟
+
+class OpportunityCandidate(NamedTuple):
+    """
+    检测阶段产出的轻量候选机会
+    普通元组，不分配 ID、不创建 datetime；字段与 ArbitrageOpportunity 同名，可直接排序筛选，
+    决定执行时再由 to_opportunity 构建完整对象
+    """
     market_id: str
-    buy_outcome: int  # 买入的结果索引
-    sell_outcome: int  # 卖出的结果索引
+    buy_outcome: int
+    sell_outcome: int
     buy_price: float
     sell_price: float
     profit_percentage: float
-    max_size: float  # 最大交易大小
-    detected_at: datetime
+    max_size: float
+    detected_ns: int  # 检测时间 (时钟的 time_ns)
+    strategy: str = "pair"
+    legs: Sequence[OpportunityLeg] = ()
+    expected_prices: Sequence[float] = ()
+    book_received_ns: int = 0
+    
+    def to_opportunity(self, opportunity_id: str) -> "ArbitrageOpportunity":
+        return ArbitrageOpportunity(
+            opportunity_id=opportunity_id,
+            market_id=self.market_id,
+            buy_outcome=self.buy_outcome,
+            sell_outcome=self.sell_outcome,
+            buy_price=self.buy_price,
+            sell_price=self.sell_price,
+            profit_percentage=self.profit_percentage,
+            max_size=self.max_size,
+            detected_at=datetime.fromtimestamp(self.detected_ns / 1e9),
+            strategy=self.strategy,
+            legs=list(self.legs),
+            expected_prices=list(self.expected_prices),
+            book_received_ns=self.book_received_ns
+        )
 
-@dataclass
+@dataclass(**SLOTS)
 class Trade:
     """交易记录"""
     trade_id: str
@@ -55,3 +108,119 @@ class Trade:
     status: str
     executed_at: Optional[datetime] = None
     closed_at: Optional[datetime] = None
+    leg_orders: List[Order] = field(default_factory=list)  # 多腿交易的全部订单
+    leg_skew_ms: Optional[float] = None  # 各腿被接收的最大时间差 (毫秒)
+
+@dataclass(**SLOTS)
+class BookSide:
+    """
+    订单簿中单个结果的一侧
+    档位按优先级排序（买单价格降序、卖单价格升序），并预先计算累计数量
+    """
+    is_bid: bool
+    prices: List[float] = field(default_factory=list)
+    sizes: List[float] = field(default_factory=list)
+    cumulative: List[float] = field(default_factory=list)
+    # 升序排序键（买单取负价格），用于二分查找
+    keys: List[float] = field(default_factory=list, repr=False)
+    
+    @classmethod
+    def from_levels(cls, is_bid: bool, levels: List[tuple]) -> "BookSide":
+        """由 (价格, 数量) 列表构建"""
+        levels = sorted(levels, key=lambda level: level[0], reverse=is_bid)
+        side = cls(is_bid=is_bid)
+        total = 0.0
+        for price, size in levels:
+            total += size
+            side.prices.append(price)
+            side.sizes.append(size)
+            side.cumulative.append(total)
+            side.keys.append(-price if is_bid else price)
+        return side
+    
+    @property
+    def best(self) -> Optional[float]:
+        """最优价格"""
+        return self.prices[0] if self.prices else None
+    
+    @property
+    def total_size(self) -> float:
+        """该侧的总数量"""
+        return self.cumulative[-1] if self.cumulative else 0.0
+    
+    def price_for_size(self, size: float) -> Optional[float]:
+        """吃到 size 数量时触及的最差价格（可作为限价），深度不足时返回 None"""
+        index = bisect_left(self.cumulative, size - 1e-9)
+        return self.prices[index] if index < len(self.prices) else None
+    
+    def depth_at(self, limit_price: float) -> float:
+        """价格不差于 limit_price 的累计数量"""
+        count = bisect_right(self.keys, -limit_price if self.is_bid else limit_price)
+        return self.cumulative[count - 1] if count else 0.0
+
+@dataclass(**SLOTS)
+class OrderBook:
+    """
+    解析后的订单簿
+    原始 JSON 只解析一次，按结果索引保存有序价格档位
+    """
+    market_id: str
+    bids: Dict[int, BookSide] = field(default_factory=dict)
+    asks: Dict[int, BookSide] = field(default_factory=dict)
+    received_ns: int = 0  # 数据到达的时间 (time.perf_counter_ns)，0 表示未知
+    
+    @classmethod
+    def from_dict(cls, raw: Dict, market_id: str = "") -> "OrderBook":
+        """解析 CLOB 原始订单簿 JSON"""
+        grouped = {"bids": {}, "asks": {}}
+        for side in ("bids", "asks"):
+            for level in raw.get(side) or []:
+                outcome_id = level.get("outcome_id")
+                if outcome_id is None:
+                    continue
+                grouped[side].setdefault(int(outcome_id), []).append(
+                    (float(level.get("price", 0)), float(level.get("size", 0)))
+                )
+        return cls.from_levels(market_id, grouped["bids"], grouped["asks"])
+    
+    @classmethod
+    def from_levels(
+        cls,
+        market_id: str,
+        bids: Dict[int, List[tuple]],
+        asks: Dict[int, List[tuple]]
+    ) -> "OrderBook":
+        """由按结果分组的 (价格, 数量) 列表构建"""
+        return cls(
+            market_id=market_id,
+            bids={o: BookSide.from_levels(True, levels) for o, levels in bids.items()},
+            asks={o: BookSide.from_levels(False, levels) for o, levels in asks.items()},
+        )
+    
+    def best_bid(self, outcome_id: int) -> float:
+        """最佳买价，无买单时为 0"""
+        side = self.bids.get(outcome_id)
+        return max(side.prices[0], 0.0) if side and side.prices else 0.0
+    
+    def best_ask(self, outcome_id: int) -> float:
+        """最佳卖价，无卖单时为 1"""
+        side = self.asks.get(outcome_id)
+        return min(side.prices[0], 1.0) if side and side.prices else 1.0
+    
+    def mid_price(self, outcome_id: int) -> float:
+        """中间价，无买单时使用最佳卖价"""
+        best_bid = self.best_bid(outcome_id)
+        best_ask = self.best_ask(outcome_id)
+        return (best_bid + best_ask) / 2 if best_bid > 0 else best_ask
+    
+    def depth(self, outcome_id: int, is_bid: bool, limit_price: Optional[float] = None) -> float:
+        """
+        累计深度
+        limit_price 为空时返回该侧全部数量，否则返回价格不差于 limit_price 的数量
+        """
+        side = (self.bids if is_bid else self.asks).get(outcome_id)
+        if not side:
+            return 0.0
+        if limit_price is None:
+            return side.total_size
+        return side.depth_at(limit_price)
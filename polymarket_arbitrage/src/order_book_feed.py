@@ -0,0 +1,231 @@
+"""推送式订单簿订阅：本地镜像 + 增量更新"""
+import json
+import logging
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from src.models import OrderBook
+
+logger = logging.getLogger(__name__)
+
+
+def send_message(sock: socket.socket, message: Dict):
+    """以 JSON Lines 格式发送一条消息"""
+    sock.sendall((json.dumps(message, separators=(",", ":")) + "\n").encode())
+
+
+def read_messages(sock: socket.socket):
+    """逐条读取 JSON Lines 消息的生成器，连接关闭时结束"""
+    reader = sock.makefile("r", encoding="utf-8")
+    for line in reader:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            logger.error(f"无法解析推送消息: {e}")
+
+
+class LocalOrderBook:
+    """
+    单个市场订单簿的本地镜像
+    由快照初始化，按序号应用增量；序号不连续时标记为失效，等待重新同步
+    """
+
+    def __init__(self, market_id: str):
+        self.market_id = market_id
+        self.seq: Optional[int] = None
+        self.levels: Dict[str, Dict[int, Dict[float, float]]] = {"bids": {}, "asks": {}}
+        # 最近一次快照 / 增量到达的时间 (time.perf_counter_ns)
+        self.received_ns = 0
+
+    @property
+    def is_synced(self) -> bool:
+        return self.seq is not None
+
+    def apply_snapshot(self, seq: int, bids: List[Dict], asks: List[Dict]):
+        """用完整快照替换镜像"""
+        self.levels = {"bids": {}, "asks": {}}
+        for side, entries in (("bids", bids), ("asks", asks)):
+            for entry in entries:
+                # 与 OrderBook.from_dict 一致，缺少 outcome_id 的档位无法归属，直接跳过
+                if entry.get("outcome_id") is None:
+                    continue
+                self._set_level(side, int(entry["outcome_id"]),
+                                float(entry.get("price", 0)), float(entry.get("size", 0)))
+        self.seq = seq
+
+    def apply_delta(self, seq: int, changes: List[Dict]) -> bool:
+        """
+        应用增量更新
+        返回 False 表示检测到序号缺口，镜像已失效需要重新同步
+        """
+        if self.seq is None:
+            return False
+
+        # 重复或过期的增量直接忽略
+        if seq <= self.seq:
+            return True
+
+        if seq != self.seq + 1:
+            logger.warning(f"订单簿 {self.market_id} 序号缺口: 期望 {self.seq + 1}，收到 {seq}")
+            self.seq = None
+            return False
+
+        for change in changes:
+            if change.get("outcome_id") is None:
+                continue
+            self._set_level(change["side"], int(change["outcome_id"]),
+                            float(change["price"]), float(change.get("size", 0)))
+        self.seq = seq
+        return True
+
+    def _set_level(self, side: str, outcome_id: int, price: float, size: float):
+        levels = self.levels[side].setdefault(outcome_id, {})
+        if size > 0:
+            levels[price] = size
+        else:
+            levels.pop(price, None)
+
+    def to_order_book(self) -> OrderBook:
+        """直接由镜像档位构建 OrderBook，无需经过 JSON"""
+        order_book = OrderBook.from_levels(
+            self.market_id,
+            {o: list(levels.items()) for o, levels in self.levels["bids"].items()},
+            {o: list(levels.items()) for o, levels in self.levels["asks"].items()},
+        )
+        order_book.received_ns = self.received_ns
+        return order_book
+
+    def to_dict(self) -> Dict:
+        """以 CLOB 原始 JSON 格式导出当前镜像"""
+        return {
+            side: [
+                {"outcome_id": outcome_id, "price": price, "size": size}
+                for outcome_id, levels in self.levels[side].items()
+                for price, size in levels.items()
+            ]
+            for side in ("bids", "asks")
+        }
+
+
+class OrderBookFeed:
+    """
+    订单簿推送订阅客户端
+    维护每个市场的本地镜像，检测序号缺口并自动请求快照重新同步，
+    每当某个市场的镜像发生变化时调用 on_update(market_id)
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        on_update: Optional[Callable[[str], None]] = None
+    ):
+        self.host = host
+        self.port = port
+        self.on_update = on_update
+        self.books: Dict[str, LocalOrderBook] = {}
+        self.resync_count = 0
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    @property
+    def connected(self) -> bool:
+        """读取线程仍在接收推送；连接断开后为 False，需要重新 connect"""
+        return self._running
+
+    def connect(self, market_ids: Iterable[str]):
+        """连接推送服务并订阅指定市场（断线后再次调用即重新订阅，镜像由新快照重建）"""
+        market_ids = list(market_ids)
+        if self._sock:
+            self.close()
+        for market_id in market_ids:
+            self.books.setdefault(market_id, LocalOrderBook(market_id))
+
+        self._sock = socket.create_connection((self.host, self.port), timeout=10)
+        self._sock.settimeout(None)
+        self._running = True
+        self._send({"op": "subscribe", "markets": market_ids})
+
+        self._thread = threading.Thread(target=self._read_loop, name="OrderBookFeed", daemon=True)
+        self._thread.start()
+        logger.info(f"已订阅 {len(market_ids)} 个市场的订单簿推送: {self.host}:{self.port}")
+
+    def close(self):
+        """断开推送连接"""
+        self._running = False
+        if self._sock:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+            self._sock = None
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def get_order_book(self, market_id: str) -> Optional[OrderBook]:
+        """返回已同步市场的订单簿镜像"""
+        with self._lock:
+            book = self.books.get(market_id)
+            if not book or not book.is_synced:
+                return None
+            return book.to_order_book()
+
+    def _send(self, message: Dict):
+        with self._send_lock:
+            if self._sock:
+                send_message(self._sock, message)
+
+    def _read_loop(self):
+        try:
+            for message in read_messages(self._sock):
+                self._handle_message(message)
+        except OSError as e:
+            if self._running:
+                logger.error(f"订单簿推送连接中断: {e}")
+        finally:
+            if self._running:
+                logger.warning(f"订单簿推送连接已断开: {self.host}:{self.port}")
+            self._running = False
+            # 断线期间错过的增量无法补齐，镜像全部失效，等待重新订阅后的快照
+            with self._lock:
+                for book in self.books.values():
+                    book.seq = None
+
+    def _handle_message(self, message: Dict):
+        """处理一条推送消息"""
+        market_id = message.get("market_id")
+        book = self.books.get(market_id)
+        if book is None:
+            return
+
+        msg_type = message.get("type")
+        received_ns = time.perf_counter_ns()
+        with self._lock:
+            if msg_type == "snapshot":
+                book.apply_snapshot(int(message["seq"]), message.get("bids", []), message.get("asks", []))
+                changed = True
+            elif msg_type == "delta":
+                was_synced = book.is_synced
+                changed = book.apply_delta(int(message["seq"]), message.get("changes", []))
+                if not changed and was_synced:
+                    self.resync_count += 1
+                    self._send({"op": "resync", "market_id": market_id})
+            else:
+                return
+            if changed:
+                book.received_ns = received_ns
+
+        if changed and self.on_update:
+            try:
+                self.on_update(market_id)
+            except Exception as e:
+                logger.error(f"处理订单簿更新 {market_id} 时出错: {e}")
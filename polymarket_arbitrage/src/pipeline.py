@@ -0,0 +1,227 @@
+"""分阶段流水线：各阶段由有界队列连接，独立的工作线程数，支持背压与丢弃过载"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 队列满时的处理策略
+BLOCK = "block"              # 阻塞上游（背压）
+DROP_OLDEST = "drop_oldest"  # 丢弃最旧的条目，保留最新的（适合很快过期的数据）
+DROP_NEWEST = "drop_newest"  # 丢弃新到的条目
+
+_STOP = object()
+
+
+class Stage:
+    """
+    流水线中的一个阶段
+    fn 接收一个条目（batch_size > 1 时为一批条目），返回 None、单个结果、
+    结果列表或生成器，结果逐个送入下游阶段
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        workers: int = 1,
+        queue_size: int = 1000,
+        overflow: str = BLOCK,
+        batch_size: int = 1,
+        linger: float = 0.0,
+        critical: bool = False
+    ):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.overflow = overflow
+        self.batch_size = max(1, batch_size)
+        self.linger = linger
+        # 关键阶段（如持久化）停止时总是处理完积压，不丢弃
+        self.critical = critical
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self.downstream: Optional["Stage"] = None
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.received = 0
+        self.processed = 0
+        self.emitted = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+
+    def put(self, item: Any) -> bool:
+        """送入一个条目；按溢出策略处理队列已满的情况，返回是否入队"""
+        if self.overflow == BLOCK:
+            self.queue.put(item)
+        else:
+            while True:
+                try:
+                    self.queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    if self.overflow == DROP_NEWEST:
+                        self._count("dropped")
+                        return False
+                    try:
+                        self.queue.get_nowait()
+                        self.queue.task_done()
+                        self._count("dropped")
+                    except queue.Empty:
+                        pass
+        self._count("received")
+        return True
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"Pipeline-{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, drain: bool = True):
+        """停止工作线程；drain 为 True 时先处理完队列中的条目，否则丢弃积压"""
+        if drain or self.critical:
+            self.queue.join()
+        else:
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.queue.task_done()
+                self._count("dropped")
+        for _ in self._threads:
+            # 停止信号必须送达，不受溢出策略影响
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def _count(self, field: str, amount: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def _next_batch(self) -> Optional[List[Any]]:
+        """取出一个条目或一批条目；收到停止信号时返回 None"""
+        item = self.queue.get()
+        if item is _STOP:
+            self.queue.task_done()
+            return None
+
+        batch = [item]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                timeout = deadline - time.monotonic()
+                item = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # 放回停止信号，处理完本批后再退出
+                self.queue.task_done()
+                self.queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            started = time.perf_counter()
+            try:
+                result = self.fn(batch if self.batch_size > 1 else batch[0])
+                self._emit(result)
+            except Exception as e:
+                self._count("errors")
+                logger.error(f"流水线阶段 {self.name} 处理出错: {e}")
+            finally:
+                with self._lock:
+                    self.processed += len(batch)
+                    self.busy_seconds += time.perf_counter() - started
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _emit(self, result: Any):
+        if result is None:
+            return
+        outputs = result if isinstance(result, list) or hasattr(result, "__next__") else [result]
+        for output in outputs:
+            self._count("emitted")
+            if self.downstream:
+                self.downstream.put(output)
+
+
+class Pipeline:
+    """按顺序连接的多个阶段"""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        for upstream, downstream in zip(stages, stages[1:]):
+            upstream.downstream = downstream
+        self._last_snapshot: Dict[str, Dict[str, float]] = {}
+        self._last_snapshot_at = time.monotonic()
+        self._started_at = self._last_snapshot_at
+
+    def __getitem__(self, name: str) -> Stage:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    def start(self) -> "Pipeline":
+        for stage in self.stages:
+            stage.start()
+        self._started_at = self._last_snapshot_at = time.monotonic()
+        return self
+
+    def submit(self, item: Any) -> bool:
+        """向第一个阶段送入条目"""
+        return self.stages[0].put(item)
+
+    def stop(self, drain: bool = True):
+        """
+        从上游到下游依次停止
+        drain 时每个阶段处理完积压后再停止；否则丢弃积压（关键阶段除外）
+        """
+        for stage in self.stages:
+            stage.stop(drain)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """各阶段的队列深度与吞吐量（吞吐量为距上次快照的平均值）"""
+        now = time.monotonic()
+        elapsed = max(now - self._last_snapshot_at, 1e-9)
+        result = {}
+        for stage in self.stages:
+            with stage._lock:
+                processed = stage.processed
+                stats = {
+                    "queue_depth": stage.queue.qsize(),
+                    "queue_size": stage.queue.maxsize,
+                    "workers": stage.workers,
+                    "received": stage.received,
+                    "processed": processed,
+                    "emitted": stage.emitted,
+                    "dropped": stage.dropped,
+                    "errors": stage.errors,
+                    "busy_seconds": round(stage.busy_seconds, 3),
+                }
+            previous = self._last_snapshot.get(stage.name, {}).get("processed", 0)
+            stats["throughput"] = round((processed - previous) / elapsed, 2)
+            # 工作线程忙碌占比，接近 1 说明该阶段是瓶颈
+            stats["utilization"] = round(
+                min(stats["busy_seconds"] / max(now - self._started_at, 1e-9) / stage.workers, 1.0), 3
+            )
+            result[stage.name] = stats
+
+        self._last_snapshot = result
+        self._last_snapshot_at = now
+        return result
+
+    def idle(self) -> bool:
+        """所有队列为空且没有条目正在处理"""
+        return all(stage.queue.unfinished_tasks == 0 for stage in self.stages)
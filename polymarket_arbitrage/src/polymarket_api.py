@@ -1,42 +1,197 @@
 import requests
+import hashlib
 import json
-from typing import Dict, List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
 from datetime import datetime
 import logging
+from src.response_cache import CacheEntry, ResponseCache
+from src.metrics import registry as metrics
 
 logger = logging.getLogger(__name__)
 
+# 各端点的请求耗时直方图（只统计真正发出的 HTTP 请求，不含缓存命中）
+REQUEST_LATENCY = {
+    endpoint: metrics.histogram("api_request_seconds", "Polymarket API 请求耗时", endpoint=endpoint)
+    for endpoint in (
+        "markets", "market", "order_book", "prices",
+        "user_orders", "user_positions", "create_order", "cancel_order"
+    )
+}
+
+def parse_json_list(value) -> List:
+    """
+    解析 Gamma 市场数据中的列表字段
+    outcomes / outcomePrices 等字段可能是列表，也可能是 JSON 编码的字符串
+    """
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            parsed = json.loads(value)
+            return parsed if isinstance(parsed, list) else []
+        except ValueError:
+            return []
+    return []
+
 class PolymarketAPI:
     """Polymarket API客户端"""
     
-    def __init__(self, base_url: str = "https://clob.polymarket.com"):
+    def __init__(
+        self,
+        base_url: str = "https://clob.polymarket.com",
+        cache: Optional[ResponseCache] = None
+    ):
         self.base_url = base_url
         self.gamma_api_url = "https://gamma-api.polymarket.com"
         self.session = requests.Session()
+        # 响应缓存（为空时每次都直接请求）
+        self.cache = cache
     
-    def get_markets(self, limit: int = 100, offset: int = 0) -> List[Dict]:
-        """获取活跃市场列表"""
-        try:
-            url = f"{self.gamma_api_url}/markets"
-            params = {
-                "limit": limit,
-                "offset": offset,
-                "active": True
-            }
+    def _get_json(self, endpoint: str, url: str, params: Optional[Dict] = None) -> Any:
+        """
+        带缓存的 GET 请求
+        TTL 内直接返回缓存；过期后携带 If-None-Match / If-Modified-Since 重新验证，
+        响应体哈希未变时复用已解析的数据，跳过 JSON 解析
+        """
+        if self.cache is None:
+            started = time.perf_counter_ns()
             response = self.session.get(url, params=params, timeout=10)
+            REQUEST_LATENCY[endpoint].record_since(started)
             response.raise_for_status()
             return response.json()
+        
+        key = self._cache_key(url, params)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record(endpoint, "hit")
+            return entry.data
+        
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        
+        started = time.perf_counter_ns()
+        response = self.session.get(url, params=params, headers=headers, timeout=10)
+        REQUEST_LATENCY[endpoint].record_since(started)
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(key)
+            self.cache.record(endpoint, "revalidated")
+            return entry.data
+        
+        response.raise_for_status()
+        body = response.content
+        content_hash = hashlib.blake2b(body, digest_size=16).hexdigest()
+        
+        if entry is not None and entry.content_hash == content_hash:
+            # 服务器不支持条件请求但内容未变
+            data = entry.data
+            self.cache.record(endpoint, "revalidated")
+        else:
+            data = response.json()
+            self.cache.record(endpoint, "miss")
+        
+        self.cache.put(key, CacheEntry(
+            data=data,
+            content_hash=content_hash,
+            size=len(body),
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified")
+        ))
+        return data
+    
+    def _cache_key(self, url: str, params: Optional[Dict] = None) -> str:
+        if not params:
+            return url
+        return url + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+    
+    def get_order_book_hash(self, market_id: str) -> Optional[str]:
+        """最近一次获取的订单簿响应体哈希，未启用缓存时为 None"""
+        if self.cache is None:
+            return None
+        return self.cache.content_hash(self._cache_key(f"{self.base_url}/order-book/{market_id}"))
+    
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """各端点的缓存命中统计"""
+        return self.cache.stats() if self.cache else {}
+    
+    def get_markets(self, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """获取活跃市场列表"""
+        try:
+            return self._fetch_markets_page(limit, offset)
         except requests.RequestException as e:
             logger.error(f"获取市场列表失败: {e}")
             return []
     
+    def _fetch_markets_page(self, limit: int, offset: int) -> List[Dict]:
+        """获取一页市场，请求失败时抛出异常（与列表结束区分）"""
+        url = f"{self.gamma_api_url}/markets"
+        params = {
+            "limit": limit,
+            "offset": offset,
+            "active": True
+        }
+        started = time.perf_counter_ns()
+        response = self.session.get(url, params=params, timeout=10)
+        REQUEST_LATENCY["markets"].record_since(started)
+        response.raise_for_status()
+        return response.json()
+    
+    def iter_markets(
+        self,
+        page_size: int = 100,
+        max_markets: Optional[int] = None,
+        prefetch: bool = True
+    ) -> Iterator[Dict]:
+        """
+        逐页遍历所有活跃市场的生成器
+        处理当前页时在后台预取下一页，内存中最多保留两页数据；
+        某一页获取失败时抛出 requests.RequestException，调用方据此区分列表不完整与列表结束
+        """
+        pool = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        offset = 0
+        yielded = 0
+        
+        try:
+            pending = pool.submit(self._fetch_markets_page, page_size, offset) if pool else None
+            while True:
+                try:
+                    page = pending.result() if pending else self._fetch_markets_page(page_size, offset)
+                except requests.RequestException as e:
+                    logger.error(f"获取市场列表失败 (offset={offset}): {e}")
+                    raise
+                if not page:
+                    return
+                
+                offset += page_size
+                is_last_page = len(page) < page_size
+                
+                # 预取下一页
+                pending = None
+                if pool and not is_last_page:
+                    pending = pool.submit(self._fetch_markets_page, page_size, offset)
+                
+                for market in page:
+                    if max_markets is not None and yielded >= max_markets:
+                        return
+                    yielded += 1
+                    yield market
+                
+                if is_last_page:
+                    return
+        finally:
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+    
     def get_market(self, market_id: str) -> Optional[Dict]:
         """获取特定市场详情"""
         try:
             url = f"{self.gamma_api_url}/markets/{market_id}"
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json("market", url)
         except requests.RequestException as e:
             logger.error(f"获取市场 {market_id} 失败: {e}")
             return None
@@ -45,9 +200,7 @@ class PolymarketAPI:
         """获取订单簿"""
         try:
             url = f"{self.base_url}/order-book/{market_id}"
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json("order_book", url)
         except requests.RequestException as e:
             logger.error(f"获取订单簿 {market_id} 失败: {e}")
             return None
@@ -57,9 +210,7 @@ class PolymarketAPI:
         try:
             url = f"{self.gamma_api_url}/prices"
             params = {"market_id": market_id}
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json("prices", url, params)
         except requests.RequestException as e:
             logger.error(f"获取价格失败: {e}")
             return None
@@ -68,7 +219,9 @@ class PolymarketAPI:
         """获取用户订单"""
         try:
             url = f"{self.base_url}/user/{user_address}/orders"
+            started = time.perf_counter_ns()
             response = self.session.get(url, timeout=10)
+            REQUEST_LATENCY["user_orders"].record_since(started)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
@@ -79,7 +232,9 @@ class PolymarketAPI:
         """获取用户头寸"""
         try:
             url = f"{self.gamma_api_url}/user/{user_address}/positions"
+            started = time.perf_counter_ns()
             response = self.session.get(url, timeout=10)
+            REQUEST_LATENCY["user_positions"].record_since(started)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
@@ -90,7 +245,9 @@ class PolymarketAPI:
         """创建订单 (需要签名)"""
         try:
             url = f"{self.base_url}/create-order"
+            started = time.perf_counter_ns()
             response = self.session.post(url, json=order_data, timeout=10)
+            REQUEST_LATENCY["create_order"].record_since(started)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
@@ -102,7 +259,9 @@ class PolymarketAPI:
         try:
             url = f"{self.base_url}/cancel-order"
             payload = {"id": order_id}
+            started = time.perf_counter_ns()
             response = self.session.post(url, json=payload, timeout=10)
+            REQUEST_LATENCY["cancel_order"].record_since(started)
             response.raise_for_status()
             return True
         except requests.RequestException as e:
@@ -0,0 +1,223 @@
+"""
+慢周期分析：扫描周期运行期间由后台线程低频采样所有线程的调用栈，
+周期耗时超过阈值时把该周期的采样写成折叠栈文件（可直接交给 flamegraph.pl / speedscope）
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from types import CodeType
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (线程 ID, 从叶到根的代码对象)
+StackKey = Tuple[int, Tuple[CodeType, ...]]
+
+# 处于这些叶子帧的线程在等待（锁、队列、线程池任务），不计入热点摘要
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("selectors.py", "select"),
+}
+
+
+class SlowCycleProfiler:
+    """
+    采样式慢周期分析器
+    只在周期进行中采样，每次采样只收集代码对象元组，格式化推迟到写文件时；
+    周期已超过阈值时切换到更高的采样频率，让慢周期的后半段有更细的分辨率
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        output_dir: str = "profiles",
+        interval: float = 0.01,
+        detail_interval: float = 0.001,
+        max_files: int = 50
+    ):
+        self.threshold = threshold
+        self.output_dir = output_dir
+        self.interval = interval
+        self.detail_interval = min(detail_interval, interval)
+        self.max_files = max_files
+        self._samples: Counter = Counter()
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._stopped = threading.Event()
+        self._cycle_started: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ident: Optional[int] = None
+        # 线程名在采样时解析：线程池线程在周期结束时可能已退出
+        self._thread_names: Dict[int, str] = {}
+        self._pending: List[Tuple[str, float, Counter]] = []
+        self.slow_cycles = 0
+        self.dumped: List[str] = []
+
+    def start(self) -> "SlowCycleProfiler":
+        """启动采样线程"""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="SlowCycleProfiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """停止采样，写出尚未写出的分析文件"""
+        self._stopped.set()
+        self._active.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._write_pending()
+
+    @contextmanager
+    def cycle(self, name: str = "scan") -> Iterator[None]:
+        """包裹一个周期；耗时超过阈值时写出该周期的分析文件"""
+        self.begin()
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def begin(self):
+        with self._lock:
+            self._samples = Counter()
+            self._cycle_started = time.perf_counter()
+        self._active.set()
+
+    def end(self, name: str = "scan") -> float:
+        """结束当前周期，返回耗时 (秒)"""
+        self._active.clear()
+        with self._lock:
+            started = self._cycle_started
+            samples = self._samples
+            self._cycle_started = None
+            self._samples = Counter()
+        if started is None:
+            return 0.0
+
+        elapsed = time.perf_counter() - started
+        if elapsed >= self.threshold:
+            self.slow_cycles += 1
+            # 格式化和写文件交给采样线程，不占用下一个周期的时间
+            with self._lock:
+                self._pending.append((name, elapsed, samples))
+            if self._thread is None:
+                self._write_pending()
+        return elapsed
+
+    def _run(self):
+        self._ident = threading.get_ident()
+        while not self._stopped.is_set():
+            self._write_pending()
+            if not self._active.wait(timeout=1.0):
+                continue
+
+            with self._lock:
+                started = self._cycle_started
+            if started is None:
+                continue
+
+            self._sample()
+            slow = time.perf_counter() - started >= self.threshold
+            time.sleep(self.detail_interval if slow else self.interval)
+
+    def _sample(self):
+        """记录所有线程（采样线程自身除外）当前的调用栈"""
+        stacks: List[StackKey] = []
+        for ident, frame in sys._current_frames().items():
+            if ident == self._ident:
+                continue
+            if ident not in self._thread_names:
+                self._thread_names.update((thread.ident, thread.name) for thread in threading.enumerate())
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            stacks.append((ident, tuple(codes)))
+
+        with self._lock:
+            if self._cycle_started is not None:
+                self._samples.update(stacks)
+
+    def _write_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for name, elapsed, samples in pending:
+            try:
+                path = self._dump(name, elapsed, samples)
+                self.dumped.append(path)
+                logger.warning(
+                    f"{name} 周期耗时 {elapsed:.2f} 秒，超过阈值 {self.threshold:.2f} 秒，"
+                    f"已写出分析文件: {path} (热点: {self._hotspots(samples)})"
+                )
+            except Exception as e:
+                logger.error(f"写出慢周期分析文件失败: {e}")
+
+    def _dump(self, name: str, elapsed: float, samples: Counter) -> str:
+        """以折叠栈格式写出：每行 "线程;根帧;...;叶帧 采样数" """
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        path = os.path.join(self.output_dir, f"{name}_{stamp}_{int(elapsed * 1000)}ms.folded")
+
+        collapsed = self.collapse(samples, self._thread_names)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(collapsed.items()):
+                f.write(f"{stack} {count}\n")
+
+        self._prune()
+        return path
+
+    @staticmethod
+    def collapse(samples: Counter, thread_names: Optional[Dict[int, str]] = None) -> Dict[str, int]:
+        """将 (线程, 代码对象) 采样合并为折叠栈字符串；线程池的各个工作线程合并为一个根"""
+        names = dict(thread_names or {})
+        names.update((thread.ident, thread.name) for thread in threading.enumerate())
+        labels: Dict[CodeType, str] = {}
+        collapsed: Counter = Counter()
+        for (ident, codes), count in samples.items():
+            thread = re.sub(r"_\d+$", "", names.get(ident, f"thread-{ident}"))
+            frames = [thread]
+            for code in reversed(codes):
+                label = labels.get(code)
+                if label is None:
+                    qualname = getattr(code, "co_qualname", code.co_name)
+                    label = f"{os.path.basename(code.co_filename)}:{qualname}".replace(";", ":").replace(" ", "_")
+                    labels[code] = label
+                frames.append(label)
+            collapsed[";".join(frames)] += count
+        return dict(collapsed)
+
+    @staticmethod
+    def _hotspots(samples: Counter, top: int = 3) -> str:
+        """采样最多的叶子函数（忽略处于等待状态的采样）"""
+        leaves: Counter = Counter()
+        for (_, codes), count in samples.items():
+            if not codes:
+                continue
+            leaf = (os.path.basename(codes[0].co_filename), codes[0].co_name)
+            if leaf not in IDLE_FRAMES:
+                leaves[f"{leaf[0]}:{leaf[1]}"] += count
+        return ", ".join(f"{leaf} ({count})" for leaf, count in leaves.most_common(top)) or "无采样"
+
+    def _prune(self):
+        """只保留最新的 max_files 个分析文件"""
+        if not self.max_files:
+            return
+        files = sorted(
+            (os.path.join(self.output_dir, name) for name in os.listdir(self.output_dir) if name.endswith(".folded")),
+            key=os.path.getmtime
+        )
+        for path in files[:-self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
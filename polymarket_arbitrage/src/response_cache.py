@@ -0,0 +1,100 @@
+"""HTTP 响应缓存：条件请求重新验证 + TTL + LRU 淘汰"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class CacheEntry:
+    """缓存条目"""
+    data: Any  # 解析后的 JSON
+    content_hash: str  # 响应体哈希，用于变更检测
+    size: int  # 响应体字节数
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    stored_at: float = 0.0  # 最近一次从服务器确认的时间 (monotonic)
+
+
+class ResponseCache:
+    """
+    线程安全的响应缓存
+    TTL 内直接命中；过期后由调用方携带 ETag / Last-Modified 发起条件请求重新验证。
+    按条目数和总字节数双重限制，超出时淘汰最久未使用的条目
+    """
+
+    def __init__(self, ttl: float = 1.0, max_entries: int = 5000, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """查找条目并标记为最近使用"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """条目是否仍在 TTL 内"""
+        return time.monotonic() - entry.stored_at < self.ttl
+
+    def put(self, key: str, entry: CacheEntry):
+        """写入条目并按容量淘汰"""
+        entry.stored_at = time.monotonic()
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.size
+            self._entries[key] = entry
+            self.total_bytes += entry.size
+            self._evict()
+
+    def touch(self, key: str):
+        """服务器确认未变更 (304) 后刷新条目时间"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.stored_at = time.monotonic()
+
+    def content_hash(self, key: str) -> Optional[str]:
+        """返回条目当前的内容哈希，不影响 LRU 顺序"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.content_hash if entry else None
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry.size
+
+    def record(self, endpoint: str, outcome: str):
+        """记录一次请求结果: hit / revalidated / miss"""
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {"hit": 0, "revalidated": 0, "miss": 0})
+            stats[outcome] += 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """按端点汇总命中率（304 重新验证也计为命中，但仍产生一次请求）"""
+        with self._lock:
+            result = {}
+            for endpoint, stats in self._stats.items():
+                total = stats["hit"] + stats["revalidated"] + stats["miss"]
+                result[endpoint] = {
+                    "hits": stats["hit"],
+                    "revalidated": stats["revalidated"],
+                    "misses": stats["miss"],
+                    "hit_rate": round((stats["hit"] + stats["revalidated"]) / total, 4) if total else 0.0,
+                }
+            return result
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,293 @@
+"""
+自适应扫描调度：按近期价格波动、机会频率、流动性和到期时间为每个市场单独设定轮询间隔，
+热门市场亚秒级刷新、冷门市场数分钟一次，全部订单簿请求共享一个全局预算
+"""
+import heapq
+import itertools
+import logging
+import math
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.clock import SystemClock, system_clock
+from src.models import OrderBook
+
+logger = logging.getLogger(__name__)
+
+# 热度各项权重（合计为 1）
+OPPORTUNITY_WEIGHT = 0.4
+VOLATILITY_WEIGHT = 0.3
+EXPIRY_WEIGHT = 0.15
+LIQUIDITY_WEIGHT = 0.15
+
+# 波动率 (中间价每次扫描的平均变动) 达到此值时波动得分为 1
+VOLATILITY_REFERENCE = 0.01
+# 流动性达到此值 (USDC) 时流动性得分为 1，按对数计分
+LIQUIDITY_REFERENCE = 100_000.0
+# 距到期天数为此值时到期得分为 0.5
+EXPIRY_HALF_DAYS = 7.0
+# 波动率的指数平滑系数
+VOLATILITY_ALPHA = 0.3
+
+# 统计分层：间隔不超过 HOT_INTERVAL 为热门，不小于 COLD_INTERVAL 为冷门
+HOT_INTERVAL = 1.0
+COLD_INTERVAL = 60.0
+
+
+class MarketScanState:
+    """单个市场的调度状态"""
+
+    __slots__ = (
+        "market", "liquidity", "expiry", "volatility", "last_mids", "opportunity_score",
+        "opportunity_updated", "interval", "due", "in_flight", "scans"
+    )
+
+    def __init__(self, market: Dict):
+        self.market = market
+        self.liquidity: Optional[float] = None
+        self.expiry: Optional[float] = None
+        self.volatility = 0.0
+        self.last_mids: Dict[int, float] = {}
+        self.opportunity_score = 0.0
+        self.opportunity_updated = 0.0
+        self.interval = 0.0
+        self.due = 0.0
+        self.in_flight = False
+        self.scans = 0
+
+
+class AdaptiveScanScheduler:
+    """
+    按热度为每个市场设定轮询间隔的调度器
+    热度 h ∈ [0, 1] 映射为 max_interval * (min_interval / max_interval) ** h（几何插值）；
+    所有市场的需求速率 Σ 1/间隔 超过请求预算时整体按比例放大间隔，
+    另有令牌桶保证实际发出的请求不超过预算。
+    只由扫描主循环调用，不是线程安全的
+    """
+
+    def __init__(
+        self,
+        request_budget: float = 20.0,
+        min_interval: float = 0.5,
+        max_interval: float = 300.0,
+        opportunity_half_life: float = 600.0,
+        clock: SystemClock = system_clock
+    ):
+        self.request_budget = max(request_budget, 1e-3)
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.opportunity_half_life = opportunity_half_life
+        self.clock = clock
+        self._states: Dict[str, MarketScanState] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        # 各市场需求速率之和 (次/秒)，增量维护
+        self._demand = 0.0
+        # 令牌桶：每秒补充 request_budget 个，最多积累 1 秒的量
+        self._tokens = max(1.0, self.request_budget)
+        self._tokens_updated = clock.time()
+        self.scheduled = 0
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    @property
+    def scale(self) -> float:
+        """需求超过预算时所有间隔的放大倍数"""
+        return max(1.0, self._demand / self.request_budget)
+
+    def update_markets(self, markets: Iterable[Dict]) -> Tuple[int, int]:
+        """
+        同步市场列表：新市场立即到期（首次扫描受令牌桶限速），已下架的市场移除
+        返回 (新增数, 移除数)
+        """
+        now = self.clock.time()
+        seen = set()
+        added = 0
+        for market in markets:
+            market_id = market.get("id")
+            if not market_id:
+                continue
+            seen.add(market_id)
+            state = self._states.get(market_id)
+            if state is None:
+                state = self._states[market_id] = MarketScanState(market)
+                state.opportunity_updated = now
+                state.due = now
+                added += 1
+                heapq.heappush(self._heap, (now, next(self._seq), market_id))
+            state.market = market
+            state.liquidity = _parse_float(market.get("liquidityNum", market.get("liquidity")))
+            state.expiry = _parse_expiry(market.get("endDate"))
+            if not state.interval:
+                self._set_interval(state, self._interval_for(state, now))
+
+        removed = [market_id for market_id in self._states if market_id not in seen]
+        for market_id in removed:
+            # 堆中的条目在弹出时惰性跳过
+            self._demand -= 1.0 / self._states.pop(market_id).interval
+        return added, len(removed)
+
+    def due(self, limit: Optional[int] = None) -> List[Dict]:
+        """取出已到期且有令牌可用的市场（最早到期的优先），标记为扫描中"""
+        now = self.clock.time()
+        self._refill(now)
+        count = int(self._tokens)
+        if limit is not None:
+            count = min(count, limit)
+
+        markets = []
+        while self._heap and len(markets) < count and self._heap[0][0] <= now:
+            due, _, market_id = heapq.heappop(self._heap)
+            state = self._states.get(market_id)
+            if state is None or state.in_flight or state.due != due:
+                continue
+            state.in_flight = True
+            markets.append(state.market)
+
+        self._tokens -= len(markets)
+        self.scheduled += len(markets)
+        return markets
+
+    def observe_book(self, market_id: str, order_book: OrderBook):
+        """记录本次扫描获取的订单簿，更新中间价波动率"""
+        state = self._states.get(market_id)
+        if state is None or not isinstance(order_book, OrderBook):
+            return
+
+        move = 0.0
+        mids = {}
+        for outcome_id, asks in order_book.asks.items():
+            bids = order_book.bids.get(outcome_id)
+            if not asks.prices or not bids or not bids.prices:
+                continue
+            mid = (asks.prices[0] + bids.prices[0]) / 2
+            mids[outcome_id] = mid
+            previous = state.last_mids.get(outcome_id)
+            if previous is not None:
+                move = max(move, abs(mid - previous))
+
+        if state.last_mids:
+            state.volatility += VOLATILITY_ALPHA * (move - state.volatility)
+        state.last_mids = mids
+
+    def complete(self, markets: Iterable[Dict], opportunities: Dict[str, int]):
+        """
+        本轮扫描结束：按各市场的机会数和最新波动率重新计算间隔并重新排队
+        opportunities: market_id -> 本轮检测到的机会数
+        """
+        markets = list(markets)
+        now = self.clock.time()
+        decay_base = 0.5 ** (1.0 / self.opportunity_half_life) if self.opportunity_half_life > 0 else 0.0
+        for market in markets:
+            state = self._states.get(market.get("id"))
+            if state is None:
+                continue
+            state.in_flight = False
+            state.scans += 1
+            state.opportunity_score = (
+                state.opportunity_score * decay_base ** (now - state.opportunity_updated)
+                + opportunities.get(market.get("id"), 0)
+            )
+            state.opportunity_updated = now
+            self._set_interval(state, self._interval_for(state, now))
+
+        # 放大倍数取所有市场更新后的值，同一轮的市场使用相同的倍数
+        scale = self.scale
+        for market in markets:
+            state = self._states.get(market.get("id"))
+            if state is None:
+                continue
+            state.due = now + state.interval * scale
+            heapq.heappush(self._heap, (state.due, next(self._seq), market.get("id")))
+
+    def next_due_in(self) -> float:
+        """距下一个市场到期的秒数（同时考虑令牌桶），没有市场时为 max_interval"""
+        now = self.clock.time()
+        while self._heap and self._heap[0][2] not in self._states:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return self.max_interval
+        wait = max(0.0, self._heap[0][0] - now)
+        self._refill(now)
+        if self._tokens < 1.0:
+            wait = max(wait, (1.0 - self._tokens) / self.request_budget)
+        return wait
+
+    def heat(self, market_id: str) -> float:
+        """市场当前的热度 (0~1)"""
+        state = self._states.get(market_id)
+        return self._heat(state, self.clock.time()) if state else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """各层市场数、需求速率与放大倍数"""
+        hot = sum(1 for state in self._states.values() if state.interval * self.scale <= HOT_INTERVAL)
+        cold = sum(1 for state in self._states.values() if state.interval * self.scale >= COLD_INTERVAL)
+        return {
+            "markets": len(self._states),
+            "hot": hot,
+            "warm": len(self._states) - hot - cold,
+            "cold": cold,
+            "demand_rate": round(self._demand, 3),
+            "budget": self.request_budget,
+            "scale": round(self.scale, 3),
+            "scheduled": self.scheduled,
+        }
+
+    def _refill(self, now: float):
+        elapsed = now - self._tokens_updated
+        if elapsed > 0:
+            self._tokens = min(max(1.0, self.request_budget), self._tokens + elapsed * self.request_budget)
+            self._tokens_updated = now
+
+    def _set_interval(self, state: MarketScanState, interval: float):
+        if state.interval:
+            self._demand -= 1.0 / state.interval
+        state.interval = interval
+        self._demand += 1.0 / interval
+
+    def _interval_for(self, state: MarketScanState, now: float) -> float:
+        return self.max_interval * (self.min_interval / self.max_interval) ** self._heat(state, now)
+
+    def _heat(self, state: MarketScanState, now: float) -> float:
+        """各项得分 (0~1) 的加权和"""
+        opportunity = min(1.0, state.opportunity_score)
+        volatility = min(1.0, state.volatility / VOLATILITY_REFERENCE)
+
+        if state.liquidity is None:
+            liquidity = 0.5
+        else:
+            liquidity = min(1.0, math.log10(1 + max(state.liquidity, 0.0)) / math.log10(1 + LIQUIDITY_REFERENCE))
+
+        if state.expiry is None:
+            expiry = 0.0
+        else:
+            days_left = max(0.0, (state.expiry - now) / 86400)
+            expiry = EXPIRY_HALF_DAYS / (EXPIRY_HALF_DAYS + days_left)
+
+        return (
+            OPPORTUNITY_WEIGHT * opportunity
+            + VOLATILITY_WEIGHT * volatility
+            + LIQUIDITY_WEIGHT * liquidity
+            + EXPIRY_WEIGHT * expiry
+        )
+
+
+def _parse_float(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_expiry(value) -> Optional[float]:
+    """解析 ISO 8601 到期时间 (如 "2024-11-05T12:00:00Z")，返回 Unix 时间戳"""
+    if not value:
+        return None
+    try:
+        expiry = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if expiry.tzinfo is None:
+        expiry = expiry.replace(tzinfo=timezone.utc)
+    return expiry.timestamp()
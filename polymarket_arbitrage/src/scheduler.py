@@ -0,0 +1,129 @@
+"""延时动作调度：平仓、撤单等动作按到期时间排队，不阻塞检测主循环"""
+import heapq
+import itertools
+import logging
+import threading
+from typing import Callable, List, Optional
+
+from src.clock import SystemClock, system_clock
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledAction:
+    """一个已排队的动作，可在到期前取消"""
+
+    __slots__ = ("due", "seq", "fn", "args", "name", "cancelled")
+
+    def __init__(self, due: float, seq: int, fn: Callable, args: tuple, name: str):
+        self.due = due
+        self.seq = seq
+        self.fn = fn
+        self.args = args
+        self.name = name
+        self.cancelled = False
+
+    def __lt__(self, other: "ScheduledAction") -> bool:
+        return (self.due, self.seq) < (other.due, other.seq)
+
+
+class ActionScheduler:
+    """
+    基于最小堆的动作调度器
+    threaded=True 时由后台线程在到期时执行；
+    使用模拟时钟时不启动线程，由调用方在推进时钟后调用 run_due()
+    """
+
+    def __init__(self, clock: SystemClock = system_clock, threaded: Optional[bool] = None):
+        self.clock = clock
+        self.threaded = clock.realtime if threaded is None else threaded
+        self._heap: List[ScheduledAction] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.executed = 0
+
+    def start(self) -> "ActionScheduler":
+        """启动后台执行线程（仅 threaded 模式）"""
+        if self.threaded and not self._running:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="ActionScheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def schedule(self, delay: float, fn: Callable, *args, name: str = "") -> ScheduledAction:
+        """在 delay 秒后执行 fn(*args)"""
+        action = ScheduledAction(self.clock.time() + delay, next(self._seq), fn, args, name or fn.__name__)
+        with self._cond:
+            heapq.heappush(self._heap, action)
+            # 新动作可能比当前等待的更早到期
+            self._cond.notify()
+        return action
+
+    def cancel(self, action: ScheduledAction):
+        """取消尚未执行的动作（惰性删除）"""
+        action.cancelled = True
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(1 for action in self._heap if not action.cancelled)
+
+    def run_due(self) -> int:
+        """执行所有已到期的动作，返回执行数"""
+        count = 0
+        while True:
+            action = self._pop_due(self.clock.time())
+            if action is None:
+                return count
+            self._execute(action)
+            count += 1
+
+    def shutdown(self, run_pending: bool = True):
+        """停止调度；run_pending 为 True 时立即执行所有未到期的动作"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+        if run_pending:
+            while True:
+                action = self._pop_due(float("inf"))
+                if action is None:
+                    break
+                self._execute(action)
+
+    def _pop_due(self, now: float) -> Optional[ScheduledAction]:
+        with self._cond:
+            while self._heap and self._heap[0].cancelled:
+                heapq.heappop(self._heap)
+            if self._heap and self._heap[0].due <= now:
+                return heapq.heappop(self._heap)
+            return None
+
+    def _execute(self, action: ScheduledAction):
+        try:
+            action.fn(*action.args)
+            self.executed += 1
+        except Exception as e:
+            logger.error(f"执行计划动作 {action.name} 失败: {e}")
+
+    def _run(self):
+        """后台线程：等待最早的动作到期并执行"""
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                while self._heap and self._heap[0].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                wait = self._heap[0].due - self.clock.time()
+                if wait > 0:
+                    self._cond.wait(timeout=wait)
+                    continue
+                action = heapq.heappop(self._heap)
+            self._execute(action)
@@ -0,0 +1,391 @@
+"""
+多进程分片扫描：市场按 ID 哈希分配到多个工作进程，各进程获取、解析、检测自己的分片，
+把最优报价和候选机会写入共享内存；协调进程只负责排序并持有唯一的 TradeExecutor，避免重复执行
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import zlib
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config.logger import PACKAGE_LOGGER
+from src.arbitrage_detector import ArbitrageDetector
+from src.models import OpportunityCandidate, OpportunityLeg, OrderBook
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(market_id: str, shards: int) -> int:
+    """稳定的分片号（不使用按进程加盐的内置 hash）"""
+    return zlib.crc32(market_id.encode("utf-8")) % shards
+
+
+class ShardLayout:
+    """
+    共享内存布局，每个分片一行，工作进程只写自己的行：
+    - candidates[分片, max_candidates]: 候选机会（结构化数组，slot 为市场在本轮分片列表中的序号）
+    - counts[分片, 2]: 本轮检测到的候选总数、实际写入数
+    - top_bid / top_ask[分片, capacity, max_outcomes]: 各结果的最优买价 / 卖价，无报价为 NaN
+    - top_updated[分片, capacity]: 最优报价的更新时间 (time.time_ns)
+    """
+
+    def __init__(self, shards: int, capacity: int, max_candidates: int, max_outcomes: int):
+        self.shards = shards
+        self.capacity = capacity
+        self.max_candidates = max_candidates
+        self.max_outcomes = max_outcomes
+        self.candidate_dtype = np.dtype([
+            ("slot", np.int32),
+            ("buy_outcome", np.int16),
+            ("sell_outcome", np.int16),
+            ("basket", np.bool_),
+            ("num_legs", np.int16),
+            ("num_expected", np.int16),
+            ("buy_price", np.float64),
+            ("sell_price", np.float64),
+            ("profit_percentage", np.float64),
+            ("max_size", np.float64),
+            ("detected_ns", np.int64),
+            ("book_received_ns", np.int64),
+            ("leg_outcomes", np.int16, (max_outcomes,)),
+            ("leg_prices", np.float64, (max_outcomes,)),
+            ("expected_prices", np.float64, (max_outcomes,)),
+        ])
+        self._fields = [
+            ("candidates", self.candidate_dtype, (shards, max_candidates)),
+            ("counts", np.dtype(np.int64), (shards, 2)),
+            ("top_bid", np.dtype(np.float64), (shards, capacity, max_outcomes)),
+            ("top_ask", np.dtype(np.float64), (shards, capacity, max_outcomes)),
+            ("top_updated", np.dtype(np.int64), (shards, capacity)),
+        ]
+
+    @property
+    def size(self) -> int:
+        return sum(dtype.itemsize * int(np.prod(shape)) for _, dtype, shape in self._fields)
+
+    def views(self, buffer) -> Dict[str, np.ndarray]:
+        """在共享内存缓冲区上创建各数组的视图（不复制）"""
+        arrays = {}
+        offset = 0
+        for name, dtype, shape in self._fields:
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            offset += dtype.itemsize * int(np.prod(shape))
+        return arrays
+
+
+def _worker_main(
+    shard: int,
+    shm_name: str,
+    layout: ShardLayout,
+    api_factory: Callable[[], Any],
+    detector_options: Dict,
+    commands: "multiprocessing.Queue",
+    results: "multiprocessing.Queue"
+):
+    """工作进程：按命令扫描本分片的市场，结果写入共享内存后回报摘要"""
+    # 逐条机会日志由协调进程输出；导入主模块时 setup_logger 挂到 src 上的队列处理器在工作进程中移除，
+    # 警告和错误带分片号输出到控制台
+    logging.basicConfig(level=logging.WARNING, format=f"%(asctime)s - shard-{shard} - %(levelname)s - %(message)s")
+    package = logging.getLogger(PACKAGE_LOGGER)
+    package.setLevel(logging.WARNING)
+    for handler in list(package.handlers):
+        package.removeHandler(handler)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        _serve(shard, layout, shm.buf, api_factory, detector_options, commands, results)
+    finally:
+        shm.close()
+
+
+def _serve(
+    shard: int,
+    layout: ShardLayout,
+    buffer,
+    api_factory: Callable[[], Any],
+    detector_options: Dict,
+    commands: "multiprocessing.Queue",
+    results: "multiprocessing.Queue"
+):
+    """工作进程的命令循环；共享内存视图只在本函数内存活"""
+    arrays = layout.views(buffer)
+    candidates = arrays["candidates"][shard]
+    counts = arrays["counts"][shard]
+    top_bid = arrays["top_bid"][shard]
+    top_ask = arrays["top_ask"][shard]
+    top_updated = arrays["top_updated"][shard]
+    slots: Dict[str, int] = {}
+
+    def publish_top_of_book(market_id: str, order_book: OrderBook):
+        slot = slots.get(market_id)
+        if slot is None or slot >= layout.capacity or not isinstance(order_book, OrderBook):
+            return
+        top_bid[slot] = np.nan
+        top_ask[slot] = np.nan
+        for outcome_id, side in order_book.bids.items():
+            if 0 <= outcome_id < layout.max_outcomes and side.prices:
+                top_bid[slot, outcome_id] = side.prices[0]
+        for outcome_id, side in order_book.asks.items():
+            if 0 <= outcome_id < layout.max_outcomes and side.prices:
+                top_ask[slot, outcome_id] = side.prices[0]
+        top_updated[slot] = time.time_ns()
+
+    try:
+        detector = ArbitrageDetector(api_factory(), on_book=publish_top_of_book, **detector_options)
+    except Exception as e:
+        results.put((shard, -1, None, f"初始化失败: {e}"))
+        return
+
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+        cycle, markets = command
+        started = time.perf_counter()
+        try:
+            slots = {market.get("id"): slot for slot, market in enumerate(markets)}
+            found = detector.detect_candidates(markets)
+            written = _write_candidates(candidates, found, slots, layout.max_outcomes)
+            counts[0] = len(found)
+            counts[1] = written
+            summary = {
+                "scanned": detector.last_scan_count,
+                "screened_out": detector.last_screened_out,
+                "unchanged": detector.last_unchanged,
+                "seconds": time.perf_counter() - started,
+            }
+            results.put((shard, cycle, summary, None))
+        except Exception as e:
+            counts[:] = 0
+            results.put((shard, cycle, None, str(e)))
+
+
+def _write_candidates(
+    rows: np.ndarray,
+    found: List[OpportunityCandidate],
+    slots: Dict[str, int],
+    max_outcomes: int
+) -> int:
+    """按利润率从高到低写入至多 len(rows) 个候选，返回写入数"""
+    if len(found) > len(rows):
+        found = sorted(found, key=lambda c: c.profit_percentage, reverse=True)
+
+    written = 0
+    for candidate in found:
+        if written >= len(rows):
+            break
+        legs = candidate.legs
+        expected = candidate.expected_prices
+        if len(legs) > max_outcomes or len(expected) > max_outcomes:
+            logger.warning("市场 %s 的结果数超过 %d，候选机会未写入共享内存", candidate.market_id, max_outcomes)
+            continue
+        row = rows[written]
+        row["slot"] = slots[candidate.market_id]
+        row["buy_outcome"] = candidate.buy_outcome
+        row["sell_outcome"] = candidate.sell_outcome
+        row["basket"] = candidate.strategy == "basket"
+        row["num_legs"] = len(legs)
+        row["num_expected"] = len(expected)
+        row["buy_price"] = candidate.buy_price
+        row["sell_price"] = candidate.sell_price
+        row["profit_percentage"] = candidate.profit_percentage
+        row["max_size"] = candidate.max_size
+        row["detected_ns"] = candidate.detected_ns
+        row["book_received_ns"] = candidate.book_received_ns
+        for index, leg in enumerate(legs):
+            row["leg_outcomes"][index] = leg.outcome
+            row["leg_prices"][index] = leg.price
+        row["expected_prices"][:len(expected)] = expected
+        written += 1
+    return written
+
+
+class ShardedScanner:
+    """
+    协调进程一侧的分片扫描器
+    每轮把市场列表按哈希分片发给各工作进程，等待全部分片完成后从共享内存读出候选机会；
+    接口与 ArbitrageDetector.detect_candidates 对应，扫描统计字段同名
+    """
+
+    def __init__(
+        self,
+        api_factory: Callable[[], Any],
+        detector_options: Optional[Dict] = None,
+        shards: Optional[int] = None,
+        capacity: int = 8192,
+        max_candidates: int = 1024,
+        max_outcomes: int = 8,
+        timeout: float = 60.0
+    ):
+        # api_factory 在工作进程中调用，必须是可导入的顶层函数
+        self.api_factory = api_factory
+        self.detector_options = dict(detector_options or {})
+        self.shards = max(1, shards or os.cpu_count() or 1)
+        self.layout = ShardLayout(self.shards, capacity, max_candidates, max_outcomes)
+        self.timeout = timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._processes: List[multiprocessing.Process] = []
+        self._commands: List["multiprocessing.Queue"] = []
+        self._results: Optional["multiprocessing.Queue"] = None
+        self._cycle = 0
+        # 上一轮各分片的市场列表，用于把共享内存中的序号还原为市场
+        self._shard_markets: List[List[Dict]] = [[] for _ in range(self.shards)]
+        self._slots: Dict[str, Tuple[int, int]] = {}
+        self.last_scan_count = 0
+        self.last_screened_out = 0
+        self.last_unchanged = 0
+        # 超出 max_candidates 未写回的候选数
+        self.last_truncated = 0
+        self.last_shard_seconds: List[float] = [0.0] * self.shards
+
+    def start(self) -> "ShardedScanner":
+        """创建共享内存并启动工作进程"""
+        if self._processes:
+            return self
+        self._shm = shared_memory.SharedMemory(create=True, size=self.layout.size)
+        self._arrays = self.layout.views(self._shm.buf)
+        self._arrays["counts"][:] = 0
+        self._arrays["top_bid"][:] = np.nan
+        self._arrays["top_ask"][:] = np.nan
+        self._arrays["top_updated"][:] = 0
+        self._results = self._context.Queue()
+        for shard in range(self.shards):
+            commands = self._context.Queue()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(shard, self._shm.name, self.layout, self.api_factory, self.detector_options,
+                      commands, self._results),
+                name=f"ShardWorker-{shard}",
+                daemon=True
+            )
+            process.start()
+            self._commands.append(commands)
+            self._processes.append(process)
+        logger.info(f"分片扫描已启动: {self.shards} 个工作进程，共享内存 {self.layout.size / 1024 / 1024:.1f} MB")
+        return self
+
+    def stop(self):
+        """停止工作进程并释放共享内存"""
+        for commands in self._commands:
+            commands.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._commands = []
+        if self._shm:
+            # 先释放数组视图，否则无法关闭共享内存
+            self._arrays = {}
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def partition(self, markets: Iterable[Dict]) -> List[List[Dict]]:
+        """按市场 ID 哈希分片"""
+        shard_markets: List[List[Dict]] = [[] for _ in range(self.shards)]
+        for market in markets:
+            market_id = market.get("id")
+            if market_id:
+                shard_markets[shard_of(market_id, self.shards)].append(market)
+        return shard_markets
+
+    def detect_candidates(self, markets: Iterable[Dict]) -> List[OpportunityCandidate]:
+        """分片检测一轮，返回全部分片的候选机会（某个分片失败或超时时只返回其余分片的结果）"""
+        if not self._processes:
+            self.start()
+
+        self._cycle += 1
+        shard_markets = self.partition(markets)
+        for shard, commands in enumerate(self._commands):
+            commands.put((self._cycle, shard_markets[shard]))
+        self._shard_markets = shard_markets
+        self._slots = {}
+
+        self.last_scan_count = 0
+        self.last_screened_out = 0
+        self.last_unchanged = 0
+        self.last_truncated = 0
+        candidates: List[OpportunityCandidate] = []
+        pending = set(range(self.shards))
+        deadline = time.monotonic() + self.timeout
+        while pending:
+            try:
+                shard, cycle, summary, error = self._results.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                logger.error(f"分片 {sorted(pending)} 在 {self.timeout} 秒内未完成，本轮跳过")
+                break
+            # 超时分片迟到的结果属于之前的轮次，丢弃
+            if cycle != self._cycle or shard not in pending:
+                continue
+            pending.discard(shard)
+            if error:
+                logger.error(f"分片 {shard} 扫描出错: {error}")
+                continue
+            self.last_scan_count += summary["scanned"]
+            self.last_screened_out += summary["screened_out"]
+            self.last_unchanged += summary["unchanged"]
+            self.last_shard_seconds[shard] = summary["seconds"]
+            candidates.extend(self._read_candidates(shard))
+        return candidates
+
+    def top_of_book(self, market_id: str) -> Optional[Dict[int, Tuple[float, float]]]:
+        """上一轮发布的最优报价 {结果: (最优买价, 最优卖价)}，无数据时返回 None"""
+        if not self._slots:
+            self._slots = {
+                market.get("id"): (shard, slot)
+                for shard, markets in enumerate(self._shard_markets)
+                for slot, market in enumerate(markets)
+            }
+        location = self._slots.get(market_id)
+        if location is None or location[1] >= self.layout.capacity or not self._arrays:
+            return None
+        shard, slot = location
+        if not self._arrays["top_updated"][shard, slot]:
+            return None
+        bids = self._arrays["top_bid"][shard, slot]
+        asks = self._arrays["top_ask"][shard, slot]
+        return {
+            outcome_id: (float(bids[outcome_id]), float(asks[outcome_id]))
+            for outcome_id in range(self.layout.max_outcomes)
+            if not (np.isnan(bids[outcome_id]) and np.isnan(asks[outcome_id]))
+        }
+
+    def _read_candidates(self, shard: int) -> List[OpportunityCandidate]:
+        """从共享内存读出一个分片的候选机会"""
+        total, written = (int(value) for value in self._arrays["counts"][shard])
+        if total > written:
+            self.last_truncated += total - written
+            logger.warning(f"分片 {shard} 检测到 {total} 个候选机会，只保留利润率最高的 {written} 个")
+
+        markets = self._shard_markets[shard]
+        candidates = []
+        # 一次复制出本轮的行，之后逐行转换为 Python 对象
+        for row in self._arrays["candidates"][shard, :written].tolist():
+            (slot, buy_outcome, sell_outcome, basket, num_legs, num_expected, buy_price, sell_price,
+             profit_pct, max_size, detected_ns, book_received_ns, leg_outcomes, leg_prices, expected_prices) = row
+            market_id = markets[slot]["id"]
+            candidates.append(OpportunityCandidate(
+                market_id=market_id,
+                buy_outcome=buy_outcome,
+                sell_outcome=sell_outcome,
+                buy_price=buy_price,
+                sell_price=sell_price,
+                profit_percentage=profit_pct,
+                max_size=max_size,
+                detected_ns=detected_ns,
+                strategy="basket" if basket else "pair",
+                legs=[
+                    OpportunityLeg(market_id, int(leg_outcomes[index]), float(leg_prices[index]))
+                    for index in range(num_legs)
+                ],
+                expected_prices=expected_prices[:num_expected].tolist(),
+                book_received_ns=book_received_ns
+            ))
+        return candidates
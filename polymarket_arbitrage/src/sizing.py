@@ -0,0 +1,75 @@
+"""基于订单簿深度的可执行大小与成交均价计算"""
+from typing import List, Tuple
+
+from src.models import BookSide
+
+
+def max_cost_for_profit(min_profit_pct: float) -> float:
+    """
+    满足最小利润率时每单位（整组各腿各一份）允许的最高成本
+    利润率 = (1 - 成本) / 成本 × 100 >= min_profit_pct
+    """
+    return 1.0 / (1.0 + min_profit_pct / 100.0)
+
+
+def walk_executable_size(
+    sides: List[BookSide],
+    max_unit_cost: float,
+    max_size: float = float("inf")
+) -> Tuple[float, List[float]]:
+    """
+    同时沿多条腿的卖单档位向下吃单，
+    找出使各腿成交均价 (VWAP) 之和仍不超过 max_unit_cost 的最大数量
+
+    在相邻两个档位断点之间，各腿边际价格不变，
+    平均成本随数量单调变化，可以直接解出临界数量。
+    每条腿只遍历一次，复杂度 O(总档位数)
+
+    返回 (数量, 各腿成交均价)；数量为 0 表示最优档位都无法满足利润要求
+    """
+    if not sides:
+        return 0.0, []
+
+    indexes = [-1] * len(sides)
+    remaining = [0.0] * len(sides)
+    costs = [0.0] * len(sides)
+    filled = 0.0
+
+    while filled < max_size:
+        # 推进已吃完（或数量为0）的档位；任一腿档位耗尽即停止
+        for k, side in enumerate(sides):
+            while remaining[k] <= 1e-12:
+                indexes[k] += 1
+                if indexes[k] >= len(side.prices):
+                    return _result(filled, costs)
+                remaining[k] = side.sizes[indexes[k]]
+
+        # 当前段：各腿边际价格之和与段长度
+        marginal = sum(side.prices[i] for side, i in zip(sides, indexes))
+        step = min(min(remaining), max_size - filled)
+        partial = False
+
+        if marginal > max_unit_cost:
+            # 平均成本将随数量上升：(总成本 + 边际 × x) / (已成交 + x) <= 上限
+            room = (max_unit_cost * filled - sum(costs)) / (marginal - max_unit_cost)
+            if room <= 0:
+                break
+            if room < step:
+                step = room
+                partial = True
+
+        for k, side in enumerate(sides):
+            costs[k] += side.prices[indexes[k]] * step
+            remaining[k] -= step
+        filled += step
+
+        if partial:
+            break
+
+    return _result(filled, costs)
+
+
+def _result(filled: float, costs: List[float]) -> Tuple[float, List[float]]:
+    if filled <= 0:
+        return 0.0, []
+    return filled, [cost / filled for cost in costs]
@@ -0,0 +1,157 @@
+"""合成市场与订单簿生成器（用于本地测试和基准测试）"""
+import itertools
+import random
+from typing import Dict, Iterator, List, Optional
+
+
+class SyntheticMarketGenerator:
+    """
+    可复现的合成市场数据生成器
+    相同的种子生成完全相同的市场、订单簿和增量更新序列
+    """
+
+    TICK = 0.001
+
+    def __init__(
+        self,
+        num_markets: int = 100,
+        num_outcomes: int = 2,
+        depth: int = 5,
+        seed: int = 42,
+        arbitrage_rate: float = 0.05
+    ):
+        self.rng = random.Random(seed)
+        self.num_outcomes = num_outcomes
+        self.depth = depth
+        self.arbitrage_rate = arbitrage_rate
+        # market_id -> {"bids"/"asks": {outcome_id: {price: size}}}
+        self.books: Dict[str, Dict[str, Dict[int, Dict[float, float]]]] = {}
+        self.markets: List[Dict] = [self._make_market(i) for i in range(num_markets)]
+
+    def _make_market(self, index: int) -> Dict:
+        """生成单个市场及其初始订单簿"""
+        market_id = f"synthetic-{index}"
+
+        # 公允概率之和为1，部分市场整体偏低以制造套利机会
+        weights = [self.rng.uniform(0.2, 1.0) for _ in range(self.num_outcomes)]
+        total = sum(weights)
+        fair_prices = [w / total for w in weights]
+        if self.rng.random() < self.arbitrage_rate:
+            discount = self.rng.uniform(0.01, 0.05)
+            fair_prices = [max(p - discount, self.TICK * 10) for p in fair_prices]
+
+        self.books[market_id] = {
+            "bids": {},
+            "asks": {},
+        }
+        for outcome_id, fair in enumerate(fair_prices):
+            half_spread = self.rng.randint(1, 10) * self.TICK
+            self.books[market_id]["bids"][outcome_id] = {
+                self._round(fair - half_spread - k * self.TICK): self._random_size()
+                for k in range(self.depth)
+                if fair - half_spread - k * self.TICK > 0
+            }
+            self.books[market_id]["asks"][outcome_id] = {
+                self._round(fair + half_spread + k * self.TICK): self._random_size()
+                for k in range(self.depth)
+                if fair + half_spread + k * self.TICK < 1
+            }
+
+        return {
+            "id": market_id,
+            "question": f"Synthetic market #{index}",
+            "outcomes": [f"Outcome {i}" for i in range(self.num_outcomes)],
+            "outcomePrices": [str(round(p, 4)) for p in fair_prices],
+            "liquidity": round(self.rng.uniform(1000, 100000), 2),
+            "volume": round(self.rng.uniform(1000, 1000000), 2),
+            "active": True,
+        }
+
+    def _round(self, price: float) -> float:
+        return round(price, 3)
+
+    def _random_size(self) -> float:
+        return float(self.rng.randint(10, 500))
+
+    def order_book(self, market_id: str) -> Dict:
+        """以 CLOB 原始 JSON 格式返回当前订单簿"""
+        book = self.books.get(market_id)
+        if book is None:
+            return {}
+
+        return {
+            side: [
+                {"outcome_id": outcome_id, "price": str(price), "size": str(size)}
+                for outcome_id, levels in book[side].items()
+                for price, size in levels.items()
+            ]
+            for side in ("bids", "asks")
+        }
+
+    def step(self, market_id: str) -> List[Dict]:
+        """
+        对订单簿做一次随机变动，返回增量列表
+        size 为 0 表示删除该价格档位
+        """
+        book = self.books[market_id]
+        side = self.rng.choice(("bids", "asks"))
+        outcome_id = self.rng.randrange(self.num_outcomes)
+        levels = book[side][outcome_id]
+        changes = []
+
+        if levels and self.rng.random() < 0.8:
+            # 修改某一档位的数量
+            price = self.rng.choice(list(levels))
+            levels[price] = self._random_size()
+            changes.append({"side": side, "outcome_id": outcome_id, "price": price, "size": levels[price]})
+            return changes
+
+        # 撤掉最优档位并在另一侧挂出新档位，模拟价格移动
+        if levels:
+            best = max(levels) if side == "bids" else min(levels)
+            del levels[best]
+            changes.append({"side": side, "outcome_id": outcome_id, "price": best, "size": 0.0})
+
+        others = book["asks" if side == "bids" else "bids"][outcome_id]
+        if side == "bids":
+            anchor = min(others) if others else 0.5
+            price = self._round(anchor - self.rng.randint(1, 5) * self.TICK)
+        else:
+            anchor = max(others) if others else 0.5
+            price = self._round(anchor + self.rng.randint(1, 5) * self.TICK)
+
+        if 0 < price < 1:
+            levels[price] = self._random_size()
+            changes.append({"side": side, "outcome_id": outcome_id, "price": price, "size": levels[price]})
+
+        return changes
+
+
+class SyntheticAPI:
+    """
+    以合成数据代替 PolymarketAPI 的本地接口（基准测试 / 离线运行用）
+    订单簿每次请求都重新序列化，下单只分配本地订单号，不产生网络请求
+    """
+
+    def __init__(self, generator: SyntheticMarketGenerator):
+        self.generator = generator
+        self._order_ids = itertools.count(1)
+
+    def iter_markets(self, page_size: int = 100, max_markets: Optional[int] = None, prefetch: bool = True) -> Iterator[Dict]:
+        markets = self.generator.markets
+        yield from (markets[:max_markets] if max_markets else markets)
+
+    def get_markets(self, limit: int = 100, offset: int = 0) -> List[Dict]:
+        return self.generator.markets[offset:offset + limit]
+
+    def get_order_book(self, market_id: str) -> Optional[Dict]:
+        return self.generator.order_book(market_id) or None
+
+    def cache_stats(self) -> Dict:
+        return {}
+
+    def create_order(self, order_data: Dict) -> Optional[Dict]:
+        return {"id": f"synthetic-order-{next(self._order_ids)}", "status": "confirmed"}
+
+    def cancel_order(self, order_id: str) -> bool:
+        return True
@@ -1,14 +1,26 @@
 import logging
-import hashlib
-from typing import Optional, Tuple
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 from eth_account import Account
+from eth_account.messages import encode_defunct
+from eth_utils import keccak
 from src.models import Order, ArbitrageOpportunity, Trade
 from src.polymarket_api import PolymarketAPI
+from src.clock import SystemClock, system_clock
+from src.metrics import registry as metrics
 from config.settings import config
 
 logger = logging.getLogger(__name__)
 
+SIGN_LATENCY = metrics.histogram("order_sign_seconds", "订单签名耗时")
+SUBMIT_LATENCY = metrics.histogram("order_submit_seconds", "订单提交到交易所确认接收的耗时")
+# 订单簿到达 → 第一笔订单发出（模拟模式下为模拟成交的时刻）
+TICK_TO_TRADE = {
+    mode: metrics.histogram("tick_to_trade_seconds", "订单簿到达到发出订单的端到端延迟", mode=mode)
+    for mode in ("live", "simulated")
+}
+
 class OrderSigner:
     """订单签名和验证"""
     
@@ -17,7 +29,7 @@ class OrderSigner:
             self.account = Account.from_key(private_key)
             self.address = self.account.address
         except Exception as e:
-            logger.error(f"初始化账户失败: {e}")
+            logger.error("初始化账户失败: %s", e)
             self.account = None
             self.address = None
     
@@ -27,21 +39,22 @@ class OrderSigner:
             logger.error("账户未初始化，无法签署订单")
             return None
         
+        started = time.perf_counter_ns()
         try:
             # 创建订单哈希
             message_hash = self._create_order_hash(order_data)
             
-            # 使用账户签署消息
-            signed = self.account.sign_message({
-                "messageHash": message_hash
-            })
+            # 按 EIP-191 (personal_sign) 包装订单哈希后签名，接收方用 recover_message 还原地址
+            signed = self.account.sign_message(encode_defunct(primitive=message_hash))
             
             return signed.signature.hex()
         except Exception as e:
-            logger.error(f"签署订单失败: {e}")
+            logger.error("签署订单失败: %s", e)
             return None
+        finally:
+            SIGN_LATENCY.record_since(started)
     
-    def _create_order_hash(self, order_data: dict) -> str:
+    def _create_order_hash(self, order_data: dict) -> bytes:
         """创建订单的哈希值"""
         order_string = (
             f"{order_data.get('market_id', '')}"
@@ -50,54 +63,64 @@ class OrderSigner:
             f"{order_data.get('quantity', '')}"
             f"{order_data.get('is_buy', '')}"
         )
-        return hashlib.keccak256(order_string.encode()).digest()
+        return keccak(order_string.encode())
 
 class TradeExecutor:
     """交易执行引擎"""
     
-    def __init__(self, api: PolymarketAPI, signer: OrderSigner, enable_trading: bool = False):
+    def __init__(
+        self,
+        api: PolymarketAPI,
+        signer: OrderSigner,
+        enable_trading: bool = False,
+        clock: SystemClock = system_clock,
+        concurrent_legs: bool = False,
+        max_workers: int = 8
+    ):
         self.api = api
         self.signer = signer
         self.enable_trading = enable_trading
+        self.clock = clock
+        # 并发模式：各腿预先签名后同时提交，缩短单边暴露时间
+        self.concurrent_legs = concurrent_legs
+        self.max_workers = max(2, max_workers)
+        self._pool: Optional[ThreadPoolExecutor] = None
         self.active_trades = {}
     
     def execute_arbitrage(self, opportunity: ArbitrageOpportunity, size: float) -> Optional[Trade]:
         """执行套利交易"""
         
         if not self.enable_trading:
+            if opportunity.book_received_ns:
+                TICK_TO_TRADE["simulated"].record_since(opportunity.book_received_ns)
             logger.info(
-                f"交易模式禁用。模拟执行套利: {opportunity.opportunity_id} "
-                f"- 大小: {size} - 利润: {opportunity.profit_percentage:.2f}%"
+                "交易模式禁用。模拟执行套利: %s - 大小: %s - 利润: %.2f%%",
+                opportunity.opportunity_id, size, opportunity.profit_percentage
             )
-            return self._simulate_trade(opportunity, size)
+            if opportunity.legs:
+                trade = self._simulate_legs(opportunity, size)
+            else:
+                trade = self._simulate_trade(opportunity, size)
+            self.active_trades[trade.trade_id] = trade
+            return trade
+        
+        if opportunity.legs:
+            return self._execute_legs(opportunity, size)
         
         try:
-            logger.info(f"执行套利: {opportunity.opportunity_id}")
+            logger.info("执行套利: %s", opportunity.opportunity_id)
             
-            # 步骤1: 下买入订单
-            buy_order = self._create_buy_order(
-                opportunity.market_id,
-                opportunity.buy_outcome,
-                opportunity.buy_price,
-                size
-            )
+            # 买入腿和卖出腿
+            orders = self._place_legs([
+                (opportunity.market_id, opportunity.buy_outcome, opportunity.buy_price, True),
+                (opportunity.market_id, opportunity.sell_outcome, opportunity.sell_price, False),
+            ], size, opportunity.book_received_ns)
             
-            if not buy_order:
-                logger.error("创建买入订单失败")
+            if not orders:
+                logger.error("创建套利订单失败")
                 return None
             
-            # 步骤2: 下卖出订单
-            sell_order = self._create_sell_order(
-                opportunity.market_id,
-                opportunity.sell_outcome,
-                opportunity.sell_price,
-                size
-            )
-            
-            if not sell_order:
-                logger.error("创建卖出订单失败，取消买入订单")
-                self.api.cancel_order(buy_order.order_id)
-                return None
+            buy_order, sell_order = orders
             
             # 创建交易记录
             trade = Trade(
@@ -109,68 +132,83 @@ class TradeExecutor:
                 profit_amount=size * (opportunity.sell_price - opportunity.buy_price),
                 profit_percentage=opportunity.profit_percentage,
                 status="executed",
-                executed_at=datetime.now()
+                executed_at=self.clock.now(),
+                leg_skew_ms=self._leg_skew_ms(orders)
             )
             
             self.active_trades[trade.trade_id] = trade
-            logger.info(f"交易执行成功: {trade.trade_id} - 预期利润: {trade.profit_amount:.2f} USDC")
+            logger.info(
+                "交易执行成功: %s - 预期利润: %.2f USDC - 腿间隔: %.1fms",
+                trade.trade_id, trade.profit_amount, trade.leg_skew_ms or 0
+            )
             
             return trade
         
         except Exception as e:
-            logger.error(f"执行套利失败: {e}")
+            logger.error("执行套利失败: %s", e)
             return None
     
-    def _create_buy_order(
-        self, 
-        market_id: str, 
-        outcome_id: int, 
-        price: float, 
-        quantity: float
-    ) -> Optional[Order]:
-        """创建买入订单"""
+    def _execute_legs(self, opportunity: ArbitrageOpportunity, size: float) -> Optional[Trade]:
+        """执行多腿套利（如整篮）：买入每条腿，任一腿失败则撤销已下的订单"""
         try:
-            order_data = {
-                "market_id": market_id,
-                "token_id": outcome_id,
-                "price": price,
-                "quantity": quantity,
-                "is_buy": True,
-                "signer": self.signer.address,
-            }
-            
-            # 签署订单
-            signature = self.signer.sign_order(order_data)
-            if not signature:
-                return None
-            
-            order_data["signature"] = signature
+            logger.info("执行多腿套利: %s - 腿数: %d", opportunity.opportunity_id, len(opportunity.legs))
             
-            # 提交到API
-            response = self.api.create_order(order_data)
-            if not response or "id" not in response:
-                logger.error(f"API返回错误: {response}")
+            orders = self._place_legs(
+                [(leg.market_id, leg.outcome, leg.price, True) for leg in opportunity.legs],
+                size,
+                opportunity.book_received_ns
+            )
+            if not orders:
+                logger.error("创建多腿订单失败")
                 return None
             
-            order = Order(
-                order_id=response["id"],
-                market_id=market_id,
-                token_id=outcome_id,
-                price=price,
-                quantity=quantity,
-                is_buy=True,
-                total_cost=price * quantity,
-                created_at=datetime.now(),
-                status="confirmed"
-            )
+            trade = self._build_leg_trade(opportunity, size, orders, "executed")
+            self.active_trades[trade.trade_id] = trade
+            logger.info("交易执行成功: %s - 预期利润: %.2f USDC", trade.trade_id, trade.profit_amount)
             
-            logger.info(f"买入订单已创建: {order.order_id} - 价格: {price} - 数量: {quantity}")
-            return order
+            return trade
         
         except Exception as e:
-            logger.error(f"创建买入订单失败: {e}")
+            logger.error("执行多腿套利失败: %s", e)
             return None
     
+    def _build_leg_trade(
+        self,
+        opportunity: ArbitrageOpportunity,
+        size: float,
+        orders: List[Order],
+        status: str
+    ) -> Trade:
+        """
+        构建多腿交易记录
+        buy_order / sell_order 记录前两腿，全部订单见 leg_orders
+        """
+        prefix = "sim_trade" if status == "simulated" else "trade"
+        return Trade(
+            trade_id=f"{prefix}_{opportunity.opportunity_id}",
+            opportunity_id=opportunity.opportunity_id,
+            market_id=opportunity.market_id,
+            buy_order=orders[0],
+            sell_order=orders[1] if len(orders) > 1 else orders[0],
+            profit_amount=size * (opportunity.sell_price - opportunity.buy_price),
+            profit_percentage=opportunity.profit_percentage,
+            status=status,
+            executed_at=self.clock.now(),
+            leg_orders=orders,
+            leg_skew_ms=self._leg_skew_ms(orders) if status == "executed" else None
+        )
+    
+    def _create_buy_order(
+        self, 
+        market_id: str, 
+        outcome_id: int, 
+        price: float, 
+        quantity: float
+    ) -> Optional[Order]:
+        """创建买入订单"""
+        order_data = self._prepare_order(market_id, outcome_id, price, quantity, True)
+        return self._submit_order(order_data) if order_data else None
+    
     def _create_sell_order(
         self, 
         market_id: str, 
@@ -179,13 +217,25 @@ class TradeExecutor:
         quantity: float
     ) -> Optional[Order]:
         """创建卖出订单"""
+        order_data = self._prepare_order(market_id, outcome_id, price, quantity, False)
+        return self._submit_order(order_data) if order_data else None
+    
+    def _prepare_order(
+        self,
+        market_id: str,
+        outcome_id: int,
+        price: float,
+        quantity: float,
+        is_buy: bool
+    ) -> Optional[dict]:
+        """构建并签署订单，不提交"""
         try:
             order_data = {
                 "market_id": market_id,
                 "token_id": outcome_id,
                 "price": price,
                 "quantity": quantity,
-                "is_buy": False,
+                "is_buy": is_buy,
                 "signer": self.signer.address,
             }
             
@@ -195,31 +245,124 @@ class TradeExecutor:
                 return None
             
             order_data["signature"] = signature
-            
+            return order_data
+        
+        except Exception as e:
+            logger.error("签署订单失败: %s", e)
+            return None
+    
+    def _submit_order(self, order_data: dict) -> Optional[Order]:
+        """提交已签署的订单，记录交易所接收时间"""
+        side = "买入" if order_data["is_buy"] else "卖出"
+        try:
             # 提交到API
+            started = time.perf_counter_ns()
             response = self.api.create_order(order_data)
+            SUBMIT_LATENCY.record_since(started)
+            accepted_at = self.clock.now()
             if not response or "id" not in response:
-                logger.error(f"API返回错误: {response}")
+                logger.error("API返回错误: %s", response)
                 return None
             
             order = Order(
                 order_id=response["id"],
-                market_id=market_id,
-                token_id=outcome_id,
-                price=price,
-                quantity=quantity,
-                is_buy=False,
-                total_cost=price * quantity,
-                created_at=datetime.now(),
-                status="confirmed"
+                market_id=order_data["market_id"],
+                token_id=order_data["token_id"],
+                price=order_data["price"],
+                quantity=order_data["quantity"],
+                is_buy=order_data["is_buy"],
+                total_cost=order_data["price"] * order_data["quantity"],
+                created_at=accepted_at,
+                status="confirmed",
+                accepted_at=accepted_at
             )
             
-            logger.info(f"卖出订单已创建: {order.order_id} - 价格: {price} - 数量: {quantity}")
+            logger.info(
+                "%s订单已创建: %s - 价格: %s - 数量: %s",
+                side, order.order_id, order.price, order.quantity
+            )
             return order
         
         except Exception as e:
-            logger.error(f"创建卖出订单失败: {e}")
+            logger.error("创建%s订单失败: %s", side, e)
+            return None
+    
+    def _submit_concurrently(self, prepared: List[dict]) -> List[Optional[Order]]:
+        """并发提交所有已签署的订单，结果与输入顺序一致"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="OrderSubmit")
+        futures = [self._pool.submit(self._submit_order, order_data) for order_data in prepared]
+        return [future.result() for future in futures]
+    
+    def _unwind_order(self, order: Order):
+        """
+        撤销单边成交风险：先尝试撤单；
+        撤单失败（可能已成交）时以原价反向下单平掉该腿
+        """
+        if self.api.cancel_order(order.order_id):
+            logger.info("已撤销订单: %s", order.order_id)
+            return
+        
+        logger.warning("撤销订单 %s 失败，反向下单平仓", order.order_id)
+        offset = self._prepare_order(
+            order.market_id, order.token_id, order.price, order.quantity, not order.is_buy
+        )
+        if not offset or not self._submit_order(offset):
+            logger.error("订单 %s 平仓失败，存在单边头寸，请人工处理", order.order_id)
+    
+    def _place_legs(
+        self,
+        legs: List[Tuple[str, int, float, bool]],
+        size: float,
+        book_received_ns: int = 0
+    ) -> Optional[List[Order]]:
+        """
+        下所有腿的订单 (market_id, 结果, 价格, 是否买入)
+        并发模式下先签署全部订单再同时提交；任一腿失败则撤销 / 平掉已成功的腿
+        book_received_ns 非 0 时在第一笔订单发出前记录 tick-to-trade 延迟
+        """
+        if not self.concurrent_legs:
+            orders = []
+            for market_id, outcome_id, price, is_buy in legs:
+                order_data = self._prepare_order(market_id, outcome_id, price, size, is_buy)
+                if order_data and not orders and book_received_ns:
+                    TICK_TO_TRADE["live"].record_since(book_received_ns)
+                order = self._submit_order(order_data) if order_data else None
+                if not order:
+                    logger.error("创建第 %d 腿订单失败，撤销已下订单", len(orders) + 1)
+                    for placed in orders:
+                        self._unwind_order(placed)
+                    return None
+                orders.append(order)
+            return orders
+        
+        # 签名在提交前全部完成，避免签名耗时拉开各腿的提交间隔
+        prepared = []
+        for market_id, outcome_id, price, is_buy in legs:
+            order_data = self._prepare_order(market_id, outcome_id, price, size, is_buy)
+            if not order_data:
+                logger.error("签署第 %d 腿订单失败，未提交任何订单", len(prepared) + 1)
+                return None
+            prepared.append(order_data)
+        
+        if book_received_ns:
+            TICK_TO_TRADE["live"].record_since(book_received_ns)
+        results = self._submit_concurrently(prepared)
+        placed = [order for order in results if order]
+        if len(placed) < len(results):
+            logger.error("%d/%d 腿提交失败，撤销已成功的腿", len(results) - len(placed), len(results))
+            for order in placed:
+                self._unwind_order(order)
+            return None
+        return placed
+    
+    @staticmethod
+    def _leg_skew_ms(orders: List[Order]) -> Optional[float]:
+        """各腿被接收的最大时间差"""
+        accepted = [order.accepted_at for order in orders if order.accepted_at]
+        if len(accepted) < 2:
             return None
+        return (max(accepted) - min(accepted)).total_seconds() * 1000
     
     def _simulate_trade(self, opportunity: ArbitrageOpportunity, size: float) -> Trade:
         """模拟交易（测试模式）"""
@@ -231,7 +374,7 @@ class TradeExecutor:
             quantity=size,
             is_buy=True,
             total_cost=opportunity.buy_price * size,
-            created_at=datetime.now(),
+            created_at=self.clock.now(),
             status="simulated"
         )
         
@@ -243,7 +386,7 @@ class TradeExecutor:
             quantity=size,
             is_buy=False,
             total_cost=opportunity.sell_price * size,
-            created_at=datetime.now(),
+            created_at=self.clock.now(),
             status="simulated"
         )
         
@@ -258,29 +401,56 @@ class TradeExecutor:
             profit_amount=profit,
             profit_percentage=opportunity.profit_percentage,
             status="simulated",
-            executed_at=datetime.now()
+            executed_at=self.clock.now()
         )
         
         return trade
     
+    def _simulate_legs(self, opportunity: ArbitrageOpportunity, size: float) -> Trade:
+        """模拟多腿交易（测试模式），按预期成交均价成交"""
+        prices = opportunity.expected_prices or [leg.price for leg in opportunity.legs]
+        orders = [
+            Order(
+                order_id=f"sim_leg{index}_{opportunity.opportunity_id}",
+                market_id=leg.market_id,
+                token_id=leg.outcome,
+                price=prices[index],
+                quantity=size,
+                is_buy=True,
+                total_cost=prices[index] * size,
+                created_at=self.clock.now(),
+                status="simulated"
+            )
+            for index, leg in enumerate(opportunity.legs)
+        ]
+        return self._build_leg_trade(opportunity, size, orders, "simulated")
+    
+    def shutdown(self):
+        """关闭订单提交线程池"""
+        if self._pool:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+    
     def close_trade(self, trade_id: str) -> bool:
         """平仓交易"""
         try:
             trade = self.active_trades.get(trade_id)
             if not trade:
-                logger.warning(f"交易 {trade_id} 未找到")
+                logger.warning("交易 %s 未找到", trade_id)
                 return False
             
-            # 取消订单
-            self.api.cancel_order(trade.buy_order.order_id)
-            self.api.cancel_order(trade.sell_order.order_id)
+            # 取消订单（模拟交易的订单从未提交）
+            if trade.status != "simulated":
+                for order in trade.leg_orders or [trade.buy_order, trade.sell_order]:
+                    self.api.cancel_order(order.order_id)
             
             trade.status = "closed"
-            trade.closed_at = datetime.now()
+            trade.closed_at = self.clock.now()
+            del self.active_trades[trade_id]
             
-            logger.info(f"交易已平仓: {trade_id}")
+            logger.info("交易已平仓: %s", trade_id)
             return True
         
         except Exception as e:
-            logger.error(f"平仓交易 {trade_id} 失败: {e}")
+            logger.error("平仓交易 %s 失败: %s", trade_id, e)
             return False
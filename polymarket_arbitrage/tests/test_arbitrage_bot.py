@@ -0,0 +1,78 @@
+"""扫描模式：流式候选机会的执行顺序与统计"""
+from types import SimpleNamespace
+
+from src.arbitrage_bot import MAX_EXECUTIONS_PER_SCAN, ArbitrageBot
+from src.models import OpportunityCandidate
+
+
+def _candidate(market_id: str, profit_pct: float) -> OpportunityCandidate:
+    return OpportunityCandidate(market_id, 0, 1, 0.4, 0.5, profit_pct, 100.0, 0)
+
+
+class StreamingDetector:
+    """按顺序产出给定的候选机会，fail 为真时在最后抛出异常（模拟分页中途失败）"""
+
+    def __init__(self, candidates, fail: bool = False):
+        self.candidates = candidates
+        self.fail = fail
+        self.last_scan_count = 0
+        self.last_screened_out = 0
+        self.last_unchanged = 0
+        self.on_book = None
+        self.prescreen_exempt = None
+
+    def iter_candidates(self, markets):
+        list(markets)
+        for candidate in self.candidates:
+            self.last_scan_count += 1
+            yield candidate
+        if self.fail:
+            raise ConnectionError("第 30 页获取失败")
+
+    def to_opportunity(self, candidate):
+        return candidate
+
+
+def _bot(detector, immediate_profit_pct: float) -> ArbitrageBot:
+    api = SimpleNamespace(iter_markets=lambda **kwargs: iter([]))
+    bot = ArbitrageBot(api, detector, SimpleNamespace(), SimpleNamespace(), immediate_profit_pct=immediate_profit_pct)
+    bot.executed = []
+    bot._execute_opportunity = bot.executed.append
+    return bot
+
+
+def test_scan_executes_most_profitable_candidates():
+    profits = [0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 0.5, 20.0, 1.2]
+    detector = StreamingDetector([_candidate(f"m{i}", p) for i, p in enumerate(profits)])
+    bot = _bot(detector, immediate_profit_pct=0)
+
+    bot._scan_for_opportunities()
+
+    assert [c.profit_percentage for c in bot.executed] == [20.0, 1.2, 1.1, 1.0, 0.9]
+    assert bot.total_opportunities == len(profits)
+
+
+def test_high_profit_candidates_execute_immediately():
+    profits = [0.6, 5.0, 0.8, 3.0, 0.7, 1.0, 0.9]
+    detector = StreamingDetector([_candidate(f"m{i}", p) for i, p in enumerate(profits)])
+    bot = _bot(detector, immediate_profit_pct=2.0)
+
+    bot._scan_for_opportunities()
+
+    # 达到阈值的按到达顺序立即执行，剩余额度按利润率补足
+    assert [c.profit_percentage for c in bot.executed] == [5.0, 3.0, 1.0, 0.9, 0.8]
+    assert len(bot.executed) == MAX_EXECUTIONS_PER_SCAN
+
+
+def test_failed_page_still_executes_and_counts_detected_candidates():
+    detector = StreamingDetector([_candidate("m0", 0.6), _candidate("m1", 3.0), _candidate("m2", 0.9)], fail=True)
+    bot = _bot(detector, immediate_profit_pct=2.0)
+    cross_market_calls = []
+    bot.cross_market = SimpleNamespace(track=lambda markets: markets)
+    bot._detect_cross_market = lambda: cross_market_calls.append(True) or []
+
+    bot._scan_for_opportunities()
+
+    assert [c.market_id for c in bot.executed] == ["m1", "m2", "m0"]
+    assert bot.total_opportunities == 3
+    assert cross_market_calls == [True]
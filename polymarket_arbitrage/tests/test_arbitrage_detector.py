@@ -0,0 +1,88 @@
+"""套利检测：策略组合与检测路径的一致性"""
+import time
+from collections import Counter
+
+import pytest
+
+from src.arbitrage_detector import ArbitrageDetector
+from src.synthetic import SyntheticAPI, SyntheticMarketGenerator
+
+
+class FlakyAPI(SyntheticAPI):
+    """部分市场获取订单簿时抛出异常，其余按市场序号错开返回时间，打乱并发完成顺序"""
+
+    def get_order_book(self, market_id):
+        number = int(market_id.rsplit("-", 1)[1])
+        if number % 7 == 3:
+            raise ConnectionError(f"fetch {market_id} failed")
+        time.sleep((number * 37 % 5) / 1000)
+        return super().get_order_book(market_id)
+
+
+def _comparable(candidates):
+    """去掉与检测时刻相关的字段"""
+    return [
+        candidate._replace(detected_ns=0, book_received_ns=0, legs=tuple(candidate.legs),
+                           expected_prices=tuple(candidate.expected_prices))
+        for candidate in candidates
+    ]
+
+
+def _api(num_outcomes: int, num_markets: int = 200, seed: int = 3) -> SyntheticAPI:
+    return SyntheticAPI(SyntheticMarketGenerator(
+        num_markets=num_markets, num_outcomes=num_outcomes, seed=seed, arbitrage_rate=0.5
+    ))
+
+
+@pytest.mark.parametrize("engine", ["loop", "batch"])
+def test_both_strategy_does_not_duplicate_binary_trades(engine):
+    api = _api(num_outcomes=2)
+    markets = list(api.iter_markets())
+    detector = ArbitrageDetector(api, min_profit_pct=0.1, engine=engine, strategy="both")
+
+    candidates = detector.detect_candidates(markets)
+    pair_only = ArbitrageDetector(api, min_profit_pct=0.1, engine=engine, strategy="pair").detect_candidates(markets)
+
+    assert candidates
+    assert Counter(candidate.strategy for candidate in candidates) == {"pair": len(candidates)}
+    assert _comparable(candidates) == _comparable(pair_only)
+    # 每个市场至多一个候选机会
+    assert len({candidate.market_id for candidate in candidates}) == len(candidates)
+
+
+@pytest.mark.parametrize("engine", ["loop", "batch"])
+def test_both_strategy_keeps_baskets_for_multi_outcome_markets(engine):
+    api = _api(num_outcomes=3)
+    markets = list(api.iter_markets())
+    detector = ArbitrageDetector(api, min_profit_pct=0.1, engine=engine, strategy="both")
+
+    strategies = Counter(candidate.strategy for candidate in detector.detect_candidates(markets))
+    baskets = ArbitrageDetector(api, min_profit_pct=0.1, engine=engine, strategy="basket").detect_candidates(markets)
+
+    assert strategies["pair"] > 0
+    assert strategies["basket"] == len(baskets) > 0
+
+
+@pytest.mark.parametrize("engine", ["loop", "batch"])
+@pytest.mark.parametrize("strategy", ["pair", "both"])
+def test_concurrent_fetch_matches_serial(engine, strategy):
+    api = FlakyAPI(SyntheticMarketGenerator(num_markets=120, num_outcomes=3, seed=9, arbitrage_rate=0.5))
+    markets = list(api.iter_markets())
+
+    def detector(max_workers):
+        return ArbitrageDetector(api, min_profit_pct=0.1, max_workers=max_workers, engine=engine,
+                                 batch_size=16, strategy=strategy)
+
+    serial = detector(1).detect_candidates(markets)
+    concurrent = detector(8)
+    found = concurrent.detect_candidates(markets)
+
+    assert serial
+    assert _comparable(found) == _comparable(serial)
+    assert concurrent.last_scan_count == len(markets)
+    # 获取失败的市场被跳过，不影响其他市场
+    assert not any(int(c.market_id.rsplit("-", 1)[1]) % 7 == 3 for c in found)
+
+    # 流式产出按完成顺序，内容与串行路径相同
+    streamed = list(detector(8).iter_candidates(markets))
+    assert sorted(_comparable(streamed)) == sorted(_comparable(serial))
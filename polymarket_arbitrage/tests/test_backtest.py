@@ -0,0 +1,95 @@
+"""回放回测：ReplayAPI 按模拟时钟可见快照，相同记录的回测结果可复现"""
+import logging
+
+import pytest
+
+from src.backtest import ReplayAPI, run_backtest
+from src.book_recorder import BookRecorder, BookRecordReader
+from src.clock import SimulatedClock
+from src.synthetic import SyntheticMarketGenerator
+
+START_NS = 1_767_229_200 * 10**9  # 2026-01-01 01:00 UTC
+STEP_NS = 10**9
+
+
+@pytest.fixture(scope="module")
+def record_dir(tmp_path_factory):
+    """按合成增量逐秒记录订单簿，部分时刻只写未变化标记"""
+    root = str(tmp_path_factory.mktemp("book_records"))
+    generator = SyntheticMarketGenerator(num_markets=20, seed=7, arbitrage_rate=0.3)
+    recorder = BookRecorder(root, batch_size=64)
+    for market in generator.markets:
+        recorder.record(market["id"], generator.order_book(market["id"]), ts_ns=START_NS)
+    for step in range(1, 200):
+        ts_ns = START_NS + step * STEP_NS
+        market_id = generator.markets[step % len(generator.markets)]["id"]
+        if step % 5 == 0:
+            recorder.record_unchanged(market_id, ts_ns=ts_ns)
+        else:
+            generator.step(market_id)
+            recorder.record(market_id, generator.order_book(market_id), ts_ns=ts_ns)
+    recorder.close()
+    assert recorder.dropped == 0
+    return root
+
+
+def test_replay_shows_latest_snapshot_at_clock_time(record_dir):
+    reader = BookRecordReader(record_dir)
+    snapshots = list(reader.iter_snapshots())
+    clock = SimulatedClock(0)
+    api = ReplayAPI(reader, clock)
+    assert api.start_ns == START_NS
+    assert clock.time_ns() == START_NS
+
+    expected = {}
+    hashes = {}
+    for ts_ns, market_id, order_book in snapshots:
+        clock.advance_to(ts_ns)
+        expected[market_id] = order_book
+        visible = api.get_order_book(market_id)
+        assert visible.asks == order_book.asks and visible.bids == order_book.bids
+        # 未变化标记沿用上一快照，内容哈希不变
+        if order_book is hashes.get(market_id, (None, None))[0]:
+            assert api.get_order_book_hash(market_id) == hashes[market_id][1]
+        hashes[market_id] = (order_book, api.get_order_book_hash(market_id))
+
+
+def test_replay_lists_only_updated_markets(record_dir):
+    clock = SimulatedClock(0)
+    api = ReplayAPI(BookRecordReader(record_dir), clock)
+
+    first = [market["id"] for market in api.iter_markets()]
+    assert len(first) == 20
+
+    clock.sleep(3)
+    assert [market["id"] for market in api.iter_markets()] == ["synthetic-1", "synthetic-2", "synthetic-3"]
+
+    # 没有新快照时快进到下一个快照
+    listed = [market["id"] for market in api.iter_markets()]
+    assert listed == ["synthetic-4"]
+    assert clock.time_ns() == START_NS + 4 * STEP_NS
+
+    while not api.exhausted():
+        list(api.iter_markets())
+    assert clock.time_ns() == api.end_ns
+
+
+def test_backtest_is_deterministic(record_dir):
+    first = run_backtest(record_dir, min_profit_pct=0.1, max_position_size=50, check_interval=1)
+    second = run_backtest(record_dir, min_profit_pct=0.1, max_position_size=50, check_interval=1)
+    assert first == second
+    assert first["total_trades"] > 0
+    assert first["simulated_seconds"] == pytest.approx(199)
+
+
+def test_quiet_backtest_restores_logger_levels(record_dir):
+    loggers = [logging.getLogger(name) for name in ("ArbitrageBot", "src")]
+    previous = [logger.level for logger in loggers]
+    for logger in loggers:
+        logger.setLevel(logging.DEBUG)
+    try:
+        run_backtest(record_dir, min_profit_pct=0.1, max_position_size=50, check_interval=1, quiet=True)
+        assert [logger.level for logger in loggers] == [logging.DEBUG, logging.DEBUG]
+    finally:
+        for logger, level in zip(loggers, previous):
+            logger.setLevel(level)
@@ -0,0 +1,56 @@
+"""批量检测引擎与逐市场检测的结果一致"""
+import pytest
+
+from src.arbitrage_detector import ArbitrageDetector
+from src.synthetic import SyntheticMarketGenerator
+
+
+class MixedAPI:
+    """合并多个生成器的市场（结果数各不相同），市场 ID 加上结果数前缀"""
+
+    def __init__(self, outcome_counts, num_markets: int = 40, seed: int = 21):
+        self.markets = []
+        self.books = {}
+        for num_outcomes in outcome_counts:
+            generator = SyntheticMarketGenerator(
+                num_markets=num_markets, num_outcomes=num_outcomes, seed=seed + num_outcomes, arbitrage_rate=0.5
+            )
+            for market in generator.markets:
+                market_id = f"{num_outcomes}-{market['id']}"
+                self.markets.append({**market, "id": market_id})
+                self.books[market_id] = generator.order_book(market["id"])
+        # 交错排列，使每个批次都包含不同结果数的市场
+        self.markets.sort(key=lambda market: (market["id"].split("-", 1)[1], market["id"]))
+
+    def get_order_book(self, market_id):
+        return self.books.get(market_id)
+
+
+def _comparable(candidates):
+    return [
+        candidate._replace(detected_ns=0, book_received_ns=0, legs=tuple(candidate.legs),
+                           expected_prices=tuple(candidate.expected_prices))
+        for candidate in candidates
+    ]
+
+
+def _detect(api, engine: str, strategy: str):
+    detector = ArbitrageDetector(api, min_profit_pct=0.1, engine=engine, batch_size=32, strategy=strategy)
+    return _comparable(detector.detect_candidates(api.markets))
+
+
+@pytest.mark.parametrize("strategy", ["pair", "basket", "both"])
+@pytest.mark.parametrize("num_outcomes", [2, 3, 5])
+def test_batch_engine_matches_loop(num_outcomes, strategy):
+    api = MixedAPI([num_outcomes], num_markets=150)
+    loop = _detect(api, "loop", strategy)
+    assert loop
+    assert _detect(api, "batch", strategy) == loop
+
+
+@pytest.mark.parametrize("strategy", ["pair", "basket", "both"])
+def test_batch_engine_matches_loop_with_mixed_outcome_counts(strategy):
+    api = MixedAPI([2, 3, 5, 4])
+    loop = _detect(api, "loop", strategy)
+    assert len({candidate.market_id.split("-", 1)[0] for candidate in loop}) > 1
+    assert _detect(api, "batch", strategy) == loop
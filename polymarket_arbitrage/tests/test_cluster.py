@@ -0,0 +1,145 @@
+"""集群：分片分配与重新平衡、执行权租约的互斥"""
+import socket
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from src.cluster import ClusterCoordinator, ClusterNode, assign_shards
+from src.models import ArbitrageOpportunity
+from src.order_book_feed import send_message
+
+NUM_SHARDS = 32
+
+
+def _wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def _opportunity(opportunity_id: str, market_id: str = "m1", buy_price: float = 0.4) -> ArbitrageOpportunity:
+    return ArbitrageOpportunity(opportunity_id, market_id, 0, 1, buy_price, 0.5, 25.0, 100.0, datetime(2026, 1, 1))
+
+
+@pytest.fixture
+def coordinator():
+    coordinator = ClusterCoordinator(num_shards=NUM_SHARDS, lease_ttl=30.0).start()
+    yield coordinator
+    coordinator.stop()
+
+
+@pytest.fixture
+def connect(coordinator):
+    nodes = []
+
+    def connect_node(node_id: str, **options) -> ClusterNode:
+        node = ClusterNode(SimpleNamespace(), *coordinator.address, node_id=node_id, heartbeat_interval=0.05, **options)
+        assert node.connect(timeout=5)
+        nodes.append(node)
+        return node
+
+    yield connect_node
+    for node in nodes:
+        node.close()
+
+
+def test_assign_shards_moves_only_affected_shards():
+    before = assign_shards(["a", "b", "c"], NUM_SHARDS)
+    assert sorted(s for shards in before.values() for s in shards) == list(range(NUM_SHARDS))
+    assert before == assign_shards(["c", "a", "b"], NUM_SHARDS)
+
+    # 节点离开：只有它的分片移动
+    after = assign_shards(["a", "c"], NUM_SHARDS)
+    for node_id in ("a", "c"):
+        assert set(before[node_id]) <= set(after[node_id])
+
+    # 节点加入：新节点只从其他节点手中取走分片，其余分片不动
+    joined = assign_shards(["a", "b", "c", "d"], NUM_SHARDS)
+    for node_id in ("a", "b", "c"):
+        assert set(joined[node_id]) <= set(before[node_id])
+
+    assert assign_shards([], NUM_SHARDS) == {}
+
+
+def test_nodes_receive_disjoint_shards_and_rebalance_on_leave(coordinator, connect):
+    first = connect("node-a")
+    assert first.shards == set(range(NUM_SHARDS))
+
+    second = connect("node-b")
+    assert _wait_until(lambda: len(first.shards) + len(second.shards) == NUM_SHARDS)
+    assert first.shards.isdisjoint(second.shards)
+    assert second.shards
+    assert coordinator.assignment() == {"node-a": sorted(first.shards), "node-b": sorted(second.shards)}
+
+    markets = [{"id": f"market-{i}"} for i in range(200)]
+    for market in markets:
+        assert first.owns(market) != second.owns(market)
+
+    second.close()
+    assert _wait_until(lambda: first.shards == set(range(NUM_SHARDS)))
+    assert coordinator.nodes() == ["node-a"]
+
+
+def test_execution_lease_is_exclusive_per_market(coordinator, connect):
+    first = connect("node-a")
+    second = connect("node-b")
+
+    opportunity = _opportunity("op-1")
+    assert first.acquire(opportunity)
+    # 同一市场的其他机会也不授予第二个节点
+    assert not second.acquire(_opportunity("op-2", buy_price=0.41))
+    assert second.acquire(_opportunity("op-3", market_id="m2"))
+
+    # 未成交归还后另一个节点可以执行
+    first.release(opportunity, None)
+    retry = _opportunity("op-4")
+    assert _wait_until(lambda: coordinator.stats()["leases"] == 1)
+    assert second.acquire(retry)
+
+    # 成交后同一机会在去重窗口内不再授予任何节点
+    second.release(retry, trade=object())
+    assert _wait_until(lambda: coordinator.stats()["leases"] == 1)
+    assert not first.acquire(_opportunity("op-5"))
+    assert coordinator.stats()["rejected"] == 2
+
+
+def test_lease_expires_and_disconnect_releases_leases(connect, coordinator):
+    coordinator.lease_ttl = 0.2
+    first = connect("node-a")
+    second = connect("node-b")
+
+    assert first.acquire(_opportunity("op-1"))
+    assert not second.acquire(_opportunity("op-2", buy_price=0.41))
+    time.sleep(0.3)
+    assert second.acquire(_opportunity("op-3", buy_price=0.42))
+
+    # 持有租约的节点断开时立即收回
+    coordinator.lease_ttl = 30.0
+    assert second.acquire(_opportunity("op-4", market_id="m2"))
+    second.close()
+    assert _wait_until(lambda: coordinator.nodes() == ["node-a"])
+    assert first.acquire(_opportunity("op-5", market_id="m2"))
+
+
+def test_silent_node_is_removed_after_heartbeat_timeout():
+    coordinator = ClusterCoordinator(num_shards=NUM_SHARDS, heartbeat_timeout=0.4).start()
+    live = ClusterNode(SimpleNamespace(), *coordinator.address, node_id="live", heartbeat_interval=0.05)
+    # 加入后不再发送心跳的节点
+    silent = socket.create_connection(coordinator.address, timeout=5)
+    try:
+        assert live.connect(timeout=5)
+        send_message(silent, {"op": "join", "node_id": "silent"})
+        assert _wait_until(lambda: coordinator.nodes() == ["live", "silent"])
+        assert _wait_until(lambda: len(live.shards) < NUM_SHARDS)
+
+        assert _wait_until(lambda: coordinator.nodes() == ["live"])
+        assert _wait_until(lambda: live.shards == set(range(NUM_SHARDS)))
+    finally:
+        silent.close()
+        live.close()
+        coordinator.stop()
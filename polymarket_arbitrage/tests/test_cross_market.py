@@ -0,0 +1,142 @@
+"""跨市场检测：事件索引的增删与保留，YES / NO 篮子的兑付"""
+import pytest
+
+from src.clock import SimulatedClock
+from src.cross_market import NO, YES, CrossMarketDetector, EventIndex
+from src.models import OrderBook
+
+
+def _market(market_id: str, event_id: str = "E1", outcomes: str = '["Yes", "No"]', **fields) -> dict:
+    market = {
+        "id": market_id,
+        "conditionId": f"cond-{market_id}",
+        "outcomes": outcomes,
+        "negRisk": True,
+        "events": [{"id": event_id, "negRisk": True}],
+        "active": True,
+    }
+    market.update(fields)
+    return market
+
+
+def _book(market_id: str, yes_ask: float, no_ask: float, size: float = 100.0) -> OrderBook:
+    return OrderBook.from_levels(market_id, {}, {YES: [(yes_ask, size)], NO: [(no_ask, size)]})
+
+
+def _payouts(candidate, winners):
+    """每种结算结果下整篮每份的兑付：YES 腿在其市场胜出时兑付 1，NO 腿在其市场落选时兑付 1"""
+    side = YES if candidate.strategy == "cross_yes" else NO
+    return [
+        sum(1.0 for leg in candidate.legs if (leg.market_id == winner) == (side == YES))
+        for winner in winners
+    ]
+
+
+def test_index_groups_exclusive_binary_markets():
+    index = EventIndex()
+    assert index.update(_market("a")) == "E1"
+    assert index.update(_market("b", outcomes='["No", "Yes"]')) == "E1"
+    assert index.update(_market("c", event_id="E2")) == "E2"
+    # 非互斥事件、非二元市场不收录
+    assert index.update(_market("d", negRisk=False, events=[{"id": "E1"}])) is None
+    assert index.update(_market("e", outcomes='["A", "B", "C"]')) is None
+    # 同一条件重复上架的市场只保留一个
+    assert index.update(_market("a2", conditionId="cond-a")) is None
+
+    assert len(index) == 2 and index.market_count == 3
+    assert "d" not in index and "a2" not in index
+    assert index.outcome("a", YES) == 0 and index.outcome("b", YES) == 1
+    assert index.group("E1").complete
+
+
+def test_resolved_and_unlisted_markets_leave_the_index():
+    index = EventIndex()
+    for market_id in ("a", "b", "c"):
+        index.update(_market(market_id))
+    index.update(_market("x", event_id="E2"))
+
+    assert index.update(_market("a", closed=True)) is None
+    assert "a" not in index
+    assert not index.group("E1").complete
+
+    assert index.retain({"b"}) == ["c", "x"]
+    assert index.event_of("b") == "E1"
+    assert index.group("E2") is None
+    assert len(index) == 1 and index.market_count == 1
+
+
+def test_interrupted_listing_does_not_evict_markets():
+    detector = CrossMarketDetector()
+    detector.update_markets([_market("a"), _market("b"), _market("c")])
+
+    def failing_listing():
+        yield _market("a")
+        raise ConnectionError("page 2 failed")
+
+    with pytest.raises(ConnectionError):
+        for _ in detector.track(failing_listing()):
+            pass
+    assert detector.index.market_count == 3
+
+    detector.update_markets([_market("a"), _market("b")])
+    assert "c" not in detector.index
+
+
+@pytest.fixture
+def detector():
+    clock = SimulatedClock(0)
+    detector = CrossMarketDetector(min_profit_pct=0.5, max_book_age=30, clock=clock)
+    detector.update_markets([_market("a"), _market("b"), _market("c")])
+    return detector
+
+
+def test_yes_basket_pays_one_for_any_winner(detector):
+    for market_id in ("a", "b", "c"):
+        detector.observe_book(market_id, _book(market_id, yes_ask=0.3, no_ask=0.75))
+
+    (candidate,) = detector.detect_candidates()
+    assert candidate.strategy == "cross_yes"
+    assert candidate.market_id == "E1"
+    assert [leg.market_id for leg in candidate.legs] == ["a", "b", "c"]
+    assert candidate.buy_price == pytest.approx(0.9)
+    assert candidate.sell_price == 1.0
+    assert candidate.profit_percentage == pytest.approx(100 / 9)
+    assert candidate.max_size == pytest.approx(100)
+    assert _payouts(candidate, ["a", "b", "c"]) == [candidate.sell_price] * 3
+
+    # 没有新的订单簿时不再重复评估
+    assert detector.detect_candidates() == []
+    assert detector.last_groups_evaluated == 0
+
+
+def test_no_basket_pays_n_minus_one_for_any_winner(detector):
+    for market_id in ("a", "b", "c"):
+        detector.observe_book(market_id, _book(market_id, yes_ask=0.4, no_ask=0.6))
+
+    (candidate,) = detector.detect_candidates()
+    assert candidate.strategy == "cross_no"
+    assert candidate.buy_price == pytest.approx(1.8)
+    assert candidate.sell_price == 2.0
+    assert [leg.outcome for leg in candidate.legs] == [NO] * 3
+    assert _payouts(candidate, ["a", "b", "c"]) == [candidate.sell_price] * 3
+    # 赢家不在已上架的成员中时，NO 篮子兑付只会更多
+    assert _payouts(candidate, ["unlisted"]) == [3.0]
+
+
+def test_incomplete_group_only_trades_no_basket(detector):
+    detector.update_market(_market("c", closed=True))
+    for market_id in ("a", "b"):
+        detector.observe_book(market_id, _book(market_id, yes_ask=0.3, no_ask=0.45))
+
+    strategies = [candidate.strategy for candidate in detector.detect_candidates()]
+    assert strategies == ["cross_no"]
+
+
+def test_stale_member_book_skips_group(detector):
+    detector.observe_book("a", _book("a", yes_ask=0.3, no_ask=0.75))
+    detector.clock.sleep(60)
+    for market_id in ("b", "c"):
+        detector.observe_book(market_id, _book(market_id, yes_ask=0.3, no_ask=0.75))
+
+    assert detector.detect_candidates() == []
+    assert detector.last_groups_evaluated == 0
@@ -0,0 +1,59 @@
+"""交易数据库：增量汇总统计与从原始交易表重建的结果一致"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database import TradeDatabase
+from src.models import Order, Trade
+
+
+def _trade(trade_id: str, market_id: str, executed_at: datetime, status: str, profit: float) -> Trade:
+    order = Order(f"{trade_id}-o", market_id, 0, 0.4, 10.0, True, 4.0, executed_at, "confirmed")
+    return Trade(trade_id, f"{trade_id}-op", market_id, order, order, profit, profit * 2.5, status, executed_at)
+
+
+def _stats_rows(db: TradeDatabase) -> dict:
+    db.flush()
+    rows = db._conn.execute(
+        "SELECT scope, key, total_trades, closed_trades, profit_sum, profit_pct_sum, max_profit FROM trade_stats"
+    ).fetchall()
+    # 增量维护时计数归零的汇总行会保留，重建时不存在
+    return {(row[0], row[1]): tuple(row[2:]) for row in rows if row[2]}
+
+
+@pytest.mark.parametrize("write_behind", [False, True])
+def test_incremental_statistics_match_rebuild(tmp_path, write_behind):
+    db = TradeDatabase(str(tmp_path / "trades.db"), write_behind=write_behind, batch_size=7)
+    rng = random.Random(11)
+    start = datetime(2026, 1, 1, 12)
+    trades = {}
+    try:
+        for step in range(400):
+            if trades and rng.random() < 0.5:
+                # 重写已有交易：改状态、改利润，可能移除当前的最大利润
+                trade_id = rng.choice(list(trades))
+                market_id, executed_at = trades[trade_id]
+            else:
+                trade_id = f"t{step}"
+                market_id = f"m{rng.randrange(5)}"
+                executed_at = start + timedelta(days=rng.randrange(4), minutes=step)
+                trades[trade_id] = (market_id, executed_at)
+            status = rng.choice(("executed", "closed", "closed", "failed"))
+            profit = round(rng.uniform(-1, 10), 2)
+            assert db.save_trade(_trade(trade_id, market_id, executed_at, status, profit))
+
+        incremental = _stats_rows(db)
+        assert incremental[("all", "")][0] == len(trades)
+
+        assert db.rebuild_statistics()
+        rebuilt = _stats_rows(db)
+
+        assert incremental.keys() == rebuilt.keys()
+        for key, row in rebuilt.items():
+            assert incremental[key] == pytest.approx(row), key
+
+        closed = db.get_trades_by_status("closed", limit=1000, consistent=True)
+        assert db.get_statistics(consistent=True)["closed_trades"] == len(closed)
+    finally:
+        db.close()
@@ -0,0 +1,46 @@
+"""日志：项目模块的记录经队列由后台线程写出"""
+import logging
+
+import pytest
+
+import config.logger as log_config
+
+
+@pytest.fixture
+def fresh_logging(tmp_path, monkeypatch):
+    """在临时目录中重新创建队列处理器和写线程，结束后恢复原有配置"""
+    monkeypatch.chdir(tmp_path)
+    package = logging.getLogger(log_config.PACKAGE_LOGGER)
+    saved = (log_config._queue_handler, log_config._listener, package.level, list(package.handlers))
+    log_config._queue_handler = None
+    log_config._listener = None
+    yield tmp_path
+    log_config.shutdown_logging()
+    for name in ("TestLogger", log_config.PACKAGE_LOGGER):
+        logger = logging.getLogger(name)
+        if log_config._queue_handler in logger.handlers:
+            logger.removeHandler(log_config._queue_handler)
+    log_config._queue_handler, log_config._listener, level, handlers = saved
+    package.setLevel(level)
+    for handler in handlers:
+        if handler not in package.handlers:
+            package.addHandler(handler)
+
+
+def test_module_records_go_through_listener(fresh_logging):
+    log_config.setup_logger("TestLogger", "INFO")
+    executor_logger = logging.getLogger("src.trade_executor")
+    assert executor_logger.getEffectiveLevel() == logging.INFO
+
+    executor_logger.info("模拟执行套利: %s - 大小: %s", "op-1", 10)
+    executor_logger.error("API返回错误: %s", None)
+    log_config.setup_logger("src.arbitrage_detector", "INFO").info("检测到套利机会: %s", "m1")
+    log_config.shutdown_logging()
+
+    (log_file,) = (fresh_logging / "logs").iterdir()
+    lines = log_file.read_text(encoding="utf-8").splitlines()
+    assert any("src.trade_executor - INFO - 模拟执行套利: op-1 - 大小: 10" in line for line in lines)
+    assert any("src.trade_executor - ERROR - API返回错误: None" in line for line in lines)
+    # src 下的记录器经父记录器输出，只写一次
+    assert sum("检测到套利机会: m1" in line for line in lines) == 1
+    assert log_config.dropped_log_records() == 0
@@ -0,0 +1,153 @@
+"""订单簿推送镜像：序号缺口检测、重新同步与断线重连"""
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+from config.settings import config
+from src.arbitrage_bot import ArbitrageBot
+from src.clock import SimulatedClock
+from src.feed_server import FeedServer
+from src.order_book_feed import LocalOrderBook, OrderBookFeed
+from src.synthetic import SyntheticMarketGenerator
+
+
+def _wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def _non_empty(levels):
+    return {
+        side: {outcome: dict(prices) for outcome, prices in levels[side].items() if prices}
+        for side in ("bids", "asks")
+    }
+
+
+def test_delta_gap_invalidates_book():
+    book = LocalOrderBook("m")
+    book.apply_snapshot(5, [{"outcome_id": 0, "price": "0.4", "size": "10"}], [])
+
+    assert book.apply_delta(6, [{"side": "bids", "outcome_id": 0, "price": 0.4, "size": 20}])
+    assert book.levels["bids"][0] == {0.4: 20.0}
+
+    # 重复的增量被忽略
+    assert book.apply_delta(6, [{"side": "bids", "outcome_id": 0, "price": 0.4, "size": 99}])
+    assert book.levels["bids"][0] == {0.4: 20.0}
+
+    # 跳过序号 7，镜像失效，后续增量在重新同步前都不应用
+    assert not book.apply_delta(8, [{"side": "bids", "outcome_id": 0, "price": 0.4, "size": 30}])
+    assert not book.is_synced
+    assert not book.apply_delta(9, [])
+
+    book.apply_snapshot(9, [{"outcome_id": 0, "price": "0.41", "size": "5"}], [])
+    assert book.is_synced
+    assert book.levels["bids"][0] == {0.41: 5.0}
+
+
+def test_levels_without_outcome_are_skipped():
+    book = LocalOrderBook("m")
+    book.apply_snapshot(1, [{"price": "0.4", "size": "10"}, {"outcome_id": 1, "price": "0.3", "size": "5"}], [])
+    assert book.levels["bids"] == {1: {0.3: 5.0}}
+
+    assert book.apply_delta(2, [
+        {"side": "asks", "price": 0.6, "size": 7},
+        {"side": "asks", "outcome_id": 1, "price": 0.7, "size": 3},
+    ])
+    assert book.levels["asks"] == {1: {0.7: 3.0}}
+
+
+def test_feed_resyncs_after_dropped_deltas():
+    generator = SyntheticMarketGenerator(num_markets=5, seed=1)
+    market_ids = [market["id"] for market in generator.markets]
+    server = FeedServer(generator, drop_rate=0.3, seed=3)
+    # 不启动后台发布线程，由测试逐步推送增量
+    server_thread = threading.Thread(target=server._server.serve_forever, daemon=True)
+    server_thread.start()
+    feed = OrderBookFeed(*server.address)
+    try:
+        feed.connect(market_ids)
+        assert _wait_until(lambda: all(feed.books[m].is_synced for m in market_ids))
+
+        for _ in range(300):
+            server.publish_step()
+
+        # 停止丢包后每个市场至少再推送一次增量，之前丢失的尾部增量也会暴露为缺口
+        server.drop_rate = 0.0
+        touched = set()
+        while touched != set(market_ids):
+            touched.add(server.publish_step())
+
+        assert _wait_until(lambda: all(feed.books[m].seq == server.seqs[m] for m in market_ids))
+        assert feed.resync_count > 0
+        for market_id in market_ids:
+            assert _non_empty(feed.books[market_id].levels) == _non_empty(generator.books[market_id])
+    finally:
+        feed.close()
+        server.stop()
+
+
+def test_feed_detects_disconnect_and_resubscribes():
+    generator = SyntheticMarketGenerator(num_markets=3, seed=2)
+    market_ids = [market["id"] for market in generator.markets]
+    server = FeedServer(generator)
+    server_thread = threading.Thread(target=server._server.serve_forever, daemon=True)
+    server_thread.start()
+    feed = OrderBookFeed(*server.address)
+    try:
+        feed.connect(market_ids)
+        assert _wait_until(lambda: all(feed.books[m].is_synced for m in market_ids))
+        assert feed.connected
+
+        # 服务端断开所有连接
+        for client in list(server.clients):
+            client.request.shutdown(socket.SHUT_RDWR)
+        assert _wait_until(lambda: not feed.connected)
+        assert all(feed.get_order_book(m) is None for m in market_ids)
+
+        feed.connect(market_ids)
+        assert _wait_until(lambda: all(feed.books[m].is_synced for m in market_ids))
+        assert feed.connected
+    finally:
+        feed.close()
+        server.stop()
+
+
+class FlakyFeed:
+    """前 failures 次 connect 抛出连接错误"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.attempts = 0
+
+    def connect(self, market_ids):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionRefusedError("推送服务不可用")
+
+
+def _streaming_bot(clock: SimulatedClock) -> ArbitrageBot:
+    bot = ArbitrageBot(SimpleNamespace(), SimpleNamespace(), SimpleNamespace(), SimpleNamespace(), clock=clock)
+    bot.is_running = True
+    return bot
+
+
+def test_bot_reconnects_feed_with_backoff():
+    clock = SimulatedClock(0)
+    feed = FlakyFeed(failures=2)
+
+    assert _streaming_bot(clock)._reconnect_feed(feed, ["m1"])
+    assert feed.attempts == 3
+    # 每次失败后等待时间翻倍
+    assert clock.time() == config.FEED_RECONNECT_DELAY * (1 + 2 + 4)
+
+
+def test_bot_gives_up_after_reconnect_attempts():
+    feed = FlakyFeed(failures=100)
+
+    assert not _streaming_bot(SimulatedClock(0))._reconnect_feed(feed, ["m1"])
+    assert feed.attempts == config.FEED_RECONNECT_ATTEMPTS
@@ -0,0 +1,121 @@
+"""流水线：队列满时的溢出策略与停止时的积压处理"""
+import threading
+import time
+
+import pytest
+
+from src.pipeline import BLOCK, DROP_NEWEST, DROP_OLDEST, Pipeline, Stage
+
+
+def _wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def _queued(stage: Stage):
+    return list(stage.queue.queue)
+
+
+class GatedWorker:
+    """处理第一个条目时阻塞，直到 gate 打开；记录处理过的条目"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.seen = []
+
+    def __call__(self, item):
+        self.started.set()
+        self.gate.wait(timeout=5)
+        self.seen.append(item)
+        return item
+
+
+def test_drop_oldest_keeps_latest_items():
+    stage = Stage("s", lambda item: item, queue_size=2, overflow=DROP_OLDEST)
+
+    assert all(stage.put(item) for item in (1, 2, 3))
+
+    assert _queued(stage) == [2, 3]
+    assert (stage.received, stage.dropped) == (3, 1)
+
+
+def test_drop_newest_rejects_new_items():
+    stage = Stage("s", lambda item: item, queue_size=2, overflow=DROP_NEWEST)
+
+    assert [stage.put(item) for item in (1, 2, 3)] == [True, True, False]
+
+    assert _queued(stage) == [1, 2]
+    assert (stage.received, stage.dropped) == (2, 1)
+
+
+def test_block_applies_backpressure():
+    worker = GatedWorker()
+    stage = Stage("s", worker, queue_size=1, overflow=BLOCK)
+    stage.start()
+    try:
+        stage.put(1)
+        assert worker.started.wait(timeout=5)
+        stage.put(2)
+
+        # 工作线程卡在第一个条目、队列已满，第三个条目阻塞上游
+        producer = threading.Thread(target=stage.put, args=(3,), daemon=True)
+        producer.start()
+        producer.join(timeout=0.2)
+        assert producer.is_alive()
+
+        worker.gate.set()
+        producer.join(timeout=5)
+        assert not producer.is_alive()
+    finally:
+        worker.gate.set()
+        stage.stop(drain=True)
+
+    assert worker.seen == [1, 2, 3]
+    assert stage.dropped == 0
+
+
+def test_stop_with_drain_processes_backlog_through_every_stage():
+    collected = []
+    pipeline = Pipeline([
+        Stage("double", lambda item: item * 2, queue_size=100),
+        Stage("collect", collected.append, queue_size=100),
+    ]).start()
+    for item in range(50):
+        pipeline.submit(item)
+
+    pipeline.stop(drain=True)
+
+    assert sorted(collected) == [item * 2 for item in range(50)]
+    assert pipeline.idle()
+
+
+@pytest.mark.parametrize("critical", [False, True])
+def test_stop_without_drain_discards_backlog_unless_critical(critical):
+    worker = GatedWorker()
+    stage = Stage("s", worker, queue_size=10, critical=critical)
+    stage.start()
+    stage.put(0)
+    assert worker.started.wait(timeout=5)
+    for item in range(1, 5):
+        stage.put(item)
+
+    stopper = threading.Thread(target=stage.stop, kwargs={"drain": False}, daemon=True)
+    stopper.start()
+    if not critical:
+        assert _wait_until(lambda: stage.dropped == 4)
+    worker.gate.set()
+    stopper.join(timeout=5)
+    assert not stopper.is_alive()
+
+    if critical:
+        # 关键阶段停止时总是处理完积压
+        assert worker.seen == [0, 1, 2, 3, 4]
+        assert stage.dropped == 0
+    else:
+        assert worker.seen == [0]
+        assert stage.dropped == 4
@@ -0,0 +1,126 @@
+"""响应缓存：ETag / 304 条件请求重新验证与 LRU 字节上限"""
+import json
+
+import pytest
+
+from src.polymarket_api import PolymarketAPI
+from src.response_cache import CacheEntry, ResponseCache
+
+URL = "https://clob.polymarket.com/order-book/m1"
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body: bytes = b"", headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers or {}
+        self.json_calls = 0
+
+    def json(self):
+        self.json_calls += 1
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    """按顺序返回预设响应，记录每次请求携带的请求头"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.requests.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+def _api(responses, ttl: float = 0.0) -> PolymarketAPI:
+    api = PolymarketAPI(cache=ResponseCache(ttl=ttl))
+    api.session = FakeSession(responses)
+    return api
+
+
+def _entry(size: int) -> CacheEntry:
+    return CacheEntry(data={}, content_hash="", size=size)
+
+
+def test_not_modified_reuses_cached_data():
+    body = b'{"bids": [], "asks": []}'
+    api = _api([
+        FakeResponse(200, body, {"ETag": '"v1"', "Last-Modified": "Thu, 01 Jan 2026 00:00:00 GMT"}),
+        FakeResponse(304),
+    ])
+
+    first = api._get_json("order_book", URL)
+    second = api._get_json("order_book", URL)
+
+    assert second is first
+    assert api.session.requests == [
+        {},
+        {"If-None-Match": '"v1"', "If-Modified-Since": "Thu, 01 Jan 2026 00:00:00 GMT"},
+    ]
+    assert api.cache_stats()["order_book"]["revalidated"] == 1
+    assert api.cache_stats()["order_book"]["misses"] == 1
+
+
+def test_fresh_entry_is_served_without_request():
+    api = _api([FakeResponse(200, b"[1, 2]", {"ETag": '"v1"'})], ttl=60.0)
+
+    assert api._get_json("prices", URL) == [1, 2]
+    assert api._get_json("prices", URL) == [1, 2]
+
+    assert len(api.session.requests) == 1
+    assert api.cache_stats()["prices"]["hits"] == 1
+
+
+def test_unchanged_body_without_etag_skips_parsing():
+    unchanged = FakeResponse(200, b"[1, 2]")
+    api = _api([FakeResponse(200, b"[1, 2]"), unchanged, FakeResponse(200, b"[3]")])
+
+    first = api._get_json("prices", URL)
+    assert api._get_json("prices", URL) is first
+    assert unchanged.json_calls == 0
+
+    # 内容变化后重新解析
+    assert api._get_json("prices", URL) == [3]
+    assert api.cache_stats()["prices"] == {"hits": 0, "revalidated": 1, "misses": 2, "hit_rate": pytest.approx(1 / 3, abs=1e-4)}
+
+
+def test_lru_evicts_least_recently_used_beyond_byte_limit():
+    cache = ResponseCache(max_bytes=100)
+    cache.put("a", _entry(40))
+    cache.put("b", _entry(40))
+    cache.get("a")
+
+    cache.put("c", _entry(40))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.total_bytes == 80
+
+
+def test_replacing_entry_updates_byte_total():
+    cache = ResponseCache(max_bytes=100)
+    cache.put("a", _entry(60))
+    cache.put("a", _entry(30))
+    cache.put("b", _entry(70))
+
+    assert len(cache) == 2
+    assert cache.total_bytes == 100
+
+    # 单个超过上限的条目无法保留
+    cache.put("c", _entry(150))
+    assert len(cache) == 0
+    assert cache.total_bytes == 0
+
+
+def test_entry_count_limit():
+    cache = ResponseCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, _entry(1))
+
+    assert cache.get("a") is None
+    assert len(cache) == 2
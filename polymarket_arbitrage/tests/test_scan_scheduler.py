@@ -0,0 +1,99 @@
+"""自适应扫描调度：令牌桶限速与需求超出预算时的间隔放大"""
+import pytest
+
+from src.clock import SimulatedClock
+from src.scan_scheduler import AdaptiveScanScheduler
+
+START_NS = 1_767_229_200 * 10**9  # 2026-01-01 01:00 UTC
+
+
+def _markets(count: int):
+    return [{"id": f"m{i}"} for i in range(count)]
+
+
+def _scheduler(clock: SimulatedClock, **kwargs) -> AdaptiveScanScheduler:
+    kwargs.setdefault("min_interval", 0.5)
+    kwargs.setdefault("max_interval", 300.0)
+    return AdaptiveScanScheduler(clock=clock, **kwargs)
+
+
+def test_token_bucket_limits_requests_to_budget():
+    clock = SimulatedClock(START_NS)
+    scheduler = _scheduler(clock, request_budget=5.0)
+    scheduler.update_markets(_markets(20))
+
+    # 桶初始装满 1 秒的预算
+    assert len(scheduler.due()) == 5
+    assert scheduler.due() == []
+    assert scheduler.next_due_in() == pytest.approx(1 / 5)
+
+    clock.sleep(0.4)
+    assert len(scheduler.due()) == 2
+
+    # 长时间空闲后最多积累 1 秒的量
+    clock.sleep(100)
+    assert len(scheduler.due()) == 5
+    assert len(scheduler.due(limit=1)) == 0
+    assert scheduler.scheduled == 12
+
+
+def test_due_respects_limit_and_skips_in_flight_markets():
+    clock = SimulatedClock(START_NS)
+    scheduler = _scheduler(clock, request_budget=100.0)
+    scheduler.update_markets(_markets(3))
+
+    first = scheduler.due(limit=2)
+    assert [market["id"] for market in first] == ["m0", "m1"]
+    # 扫描中的市场不会再次取出
+    assert [market["id"] for market in scheduler.due()] == ["m2"]
+    assert scheduler.due() == []
+
+
+def test_intervals_scale_when_demand_exceeds_budget():
+    clock = SimulatedClock(START_NS)
+    scheduler = _scheduler(clock, request_budget=1.0, min_interval=1.0, max_interval=100.0)
+    markets = _markets(500)
+    scheduler.update_markets(markets)
+
+    # 没有流动性和到期信息的市场热度相同，间隔相同
+    interval = scheduler._states["m0"].interval
+    assert 1.0 < interval < 100.0
+    assert scheduler.scale == pytest.approx(500 / interval / 1.0)
+    assert scheduler.scale > 1.0
+
+    scheduler.complete(markets, {})
+    now = clock.time()
+    for market in markets:
+        state = scheduler._states[market["id"]]
+        assert state.due == pytest.approx(now + interval * scheduler.scale)
+
+    # 放大后的总请求速率恰好等于预算
+    assert sum(1 / (state.interval * scheduler.scale) for state in scheduler._states.values()) == pytest.approx(1.0)
+
+
+def test_no_scaling_within_budget():
+    clock = SimulatedClock(START_NS)
+    scheduler = _scheduler(clock, request_budget=1000.0)
+    markets = _markets(10)
+    scheduler.update_markets(markets)
+
+    scheduler.complete(markets, {})
+
+    assert scheduler.scale == 1.0
+    state = scheduler._states["m0"]
+    assert state.due == pytest.approx(clock.time() + state.interval)
+
+
+def test_opportunities_shorten_interval_and_removal_lowers_demand():
+    clock = SimulatedClock(START_NS)
+    scheduler = _scheduler(clock, request_budget=1000.0)
+    markets = _markets(2)
+    scheduler.update_markets(markets)
+
+    scheduler.complete(markets, {"m0": 3})
+    hot, cold = scheduler._states["m0"].interval, scheduler._states["m1"].interval
+    assert hot < cold
+    assert scheduler.heat("m0") > scheduler.heat("m1")
+
+    assert scheduler.update_markets(markets[1:]) == (0, 1)
+    assert scheduler.stats()["demand_rate"] == pytest.approx(1 / cold, abs=1e-3)
@@ -0,0 +1,82 @@
+"""分片扫描：哈希分片与经共享内存回传的候选机会、最优报价"""
+import pytest
+
+from src.arbitrage_detector import ArbitrageDetector
+from src.sharded_scanner import ShardedScanner, shard_of
+from src.synthetic import SyntheticAPI, SyntheticMarketGenerator
+
+DETECTOR_OPTIONS = {"min_profit_pct": 0.1, "strategy": "both"}
+
+
+def synthetic_api() -> SyntheticAPI:
+    """工作进程中调用的顶层工厂：相同种子生成与协调进程相同的数据"""
+    return SyntheticAPI(SyntheticMarketGenerator(num_markets=60, num_outcomes=3, seed=5, arbitrage_rate=0.3))
+
+
+def _comparable(candidates):
+    """去掉与进程和时刻相关的字段"""
+    return sorted(
+        candidate._replace(detected_ns=0, book_received_ns=0, legs=tuple(candidate.legs),
+                           expected_prices=tuple(candidate.expected_prices))
+        for candidate in candidates
+    )
+
+
+@pytest.fixture(scope="module")
+def api():
+    return synthetic_api()
+
+
+def test_partition_is_stable_and_complete(api):
+    scanner = ShardedScanner(synthetic_api, shards=4)
+    shards = scanner.partition(api.iter_markets())
+
+    assert sum(len(markets) for markets in shards) == len(api.generator.markets)
+    for shard, markets in enumerate(shards):
+        for market in markets:
+            assert shard_of(market["id"], 4) == shard
+    # 哈希不依赖进程的随机盐
+    assert shard_of("synthetic-0", 4) == shard_of("synthetic-0", 4)
+    assert [len(markets) for markets in scanner.partition(api.iter_markets())] == [len(m) for m in shards]
+
+
+def test_sharded_candidates_match_single_process(api):
+    expected = ArbitrageDetector(api, **DETECTOR_OPTIONS).detect_candidates(list(api.iter_markets()))
+    assert expected
+
+    scanner = ShardedScanner(synthetic_api, DETECTOR_OPTIONS, shards=3, timeout=30).start()
+    try:
+        found = scanner.detect_candidates(api.iter_markets())
+        assert scanner.last_scan_count == len(api.generator.markets)
+        assert scanner.last_truncated == 0
+        assert _comparable(found) == _comparable(expected)
+
+        # 最优报价经共享内存回传
+        for market in api.generator.markets[:10]:
+            book = api.generator.books[market["id"]]
+            top = scanner.top_of_book(market["id"])
+            for outcome_id in range(3):
+                best_bid = max(book["bids"][outcome_id])
+                best_ask = min(book["asks"][outcome_id])
+                assert top[outcome_id] == (best_bid, best_ask)
+        assert scanner.top_of_book("unknown-market") is None
+
+        # 第二轮使用新的轮次号，结果不受上一轮残留影响
+        assert _comparable(scanner.detect_candidates(api.iter_markets())) == _comparable(expected)
+    finally:
+        scanner.stop()
+
+
+def test_candidates_beyond_capacity_keep_most_profitable(api):
+    expected = ArbitrageDetector(api, **DETECTOR_OPTIONS).detect_candidates(list(api.iter_markets()))
+    assert len(expected) > 2
+
+    scanner = ShardedScanner(synthetic_api, DETECTOR_OPTIONS, shards=1, max_candidates=2, timeout=30).start()
+    try:
+        found = scanner.detect_candidates(api.iter_markets())
+    finally:
+        scanner.stop()
+
+    assert scanner.last_truncated == len(expected) - 2
+    best = sorted(expected, key=lambda c: c.profit_percentage, reverse=True)[:2]
+    assert _comparable(found) == _comparable(best)
@@ -0,0 +1,70 @@
+"""沿订单簿深度计算可执行大小：各腿成交均价之和不超过每单位成本上限"""
+import pytest
+
+from src.models import BookSide
+from src.sizing import max_cost_for_profit, walk_executable_size
+
+
+def _asks(*levels):
+    return BookSide.from_levels(False, list(levels))
+
+
+def test_max_cost_for_profit():
+    assert max_cost_for_profit(0) == 1.0
+    assert max_cost_for_profit(5.0) == pytest.approx(1 / 1.05)
+    cost = max_cost_for_profit(2.5)
+    assert (1 - cost) / cost * 100 == pytest.approx(2.5)
+
+
+def test_size_limited_by_shallowest_leg():
+    size, prices = walk_executable_size([_asks((0.4, 100)), _asks((0.5, 50))], 0.95)
+    assert size == pytest.approx(50)
+    assert prices == pytest.approx([0.4, 0.5])
+
+
+def test_partial_level_stops_at_crossover():
+    # 第一段 100 份边际成本 0.90；第二段边际 1.05，平均成本在 150 份时升到上限 0.95
+    sides = [_asks((0.40, 100), (0.55, 100)), _asks((0.50, 200))]
+    size, prices = walk_executable_size(sides, 0.95)
+    assert size == pytest.approx(150)
+    assert prices == pytest.approx([0.45, 0.50])
+    assert sum(prices) == pytest.approx(0.95)
+
+
+def test_crossover_matches_profit_threshold():
+    min_profit_pct = 5.0
+    limit = max_cost_for_profit(min_profit_pct)
+    sides = [_asks((0.30, 40), (0.45, 500)), _asks((0.60, 1000))]
+    size, prices = walk_executable_size(sides, limit)
+
+    # 40 份边际 0.90，之后边际 1.05：(36 + 1.05x) / (40 + x) = 1 / 1.05
+    expected = (limit * 40 - 36) / (1.05 - limit) + 40
+    assert size == pytest.approx(expected)
+    cost = sum(prices)
+    assert cost == pytest.approx(limit)
+    assert (1 - cost) / cost * 100 == pytest.approx(min_profit_pct)
+
+
+def test_zero_size_level_is_skipped():
+    size, prices = walk_executable_size([_asks((0.40, 0), (0.42, 100)), _asks((0.50, 100))], 0.95)
+    assert size == pytest.approx(100)
+    assert prices == pytest.approx([0.42, 0.50])
+
+
+def test_max_size_caps_fill():
+    sides = [_asks((0.40, 100), (0.41, 100)), _asks((0.50, 300))]
+    size, prices = walk_executable_size(sides, 0.95, max_size=150)
+    assert size == pytest.approx(150)
+    assert prices == pytest.approx([(0.40 * 100 + 0.41 * 50) / 150, 0.50])
+
+
+def test_top_level_not_clearing_returns_zero():
+    assert walk_executable_size([_asks((0.50, 100)), _asks((0.50, 100))], 0.95) == (0.0, [])
+    # 边际成本恰好等于上限时整段都可成交
+    size, _ = walk_executable_size([_asks((0.45, 100)), _asks((0.50, 100))], 0.95)
+    assert size == pytest.approx(100)
+
+
+def test_missing_depth_returns_zero():
+    assert walk_executable_size([], 0.95) == (0.0, [])
+    assert walk_executable_size([_asks((0.40, 100)), _asks()], 0.95) == (0.0, [])
@@ -0,0 +1,155 @@
+"""交易执行：任一腿失败时撤销或反向平掉已成功的腿"""
+import threading
+from datetime import datetime
+
+import pytest
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from eth_utils import keccak
+
+from src.models import ArbitrageOpportunity, OpportunityLeg
+from src.trade_executor import OrderSigner, TradeExecutor
+
+PRIVATE_KEY = "0x" + "11" * 32
+
+
+class FakeAPI:
+    """按 (市场, 结果, 方向) 决定下单是否失败，记录全部下单与撤单请求"""
+
+    def __init__(self, failing=(), cancel_succeeds: bool = True):
+        self.failing = set(failing)
+        self.cancel_succeeds = cancel_succeeds
+        self.created = []
+        self.cancelled = []
+        self._lock = threading.Lock()
+
+    def create_order(self, order_data):
+        with self._lock:
+            self.created.append(order_data)
+            if (order_data["market_id"], order_data["token_id"], order_data["is_buy"]) in self.failing:
+                return None
+            return {"id": f"order-{len(self.created)}"}
+
+    def cancel_order(self, order_id):
+        with self._lock:
+            self.cancelled.append(order_id)
+        return self.cancel_succeeds
+
+
+def _pair_opportunity() -> ArbitrageOpportunity:
+    return ArbitrageOpportunity(
+        "op-pair", "m1", 0, 1, 0.4, 0.5, 25.0, 100.0, datetime(2026, 1, 1)
+    )
+
+
+def _basket_opportunity() -> ArbitrageOpportunity:
+    legs = [OpportunityLeg(f"m{i}", 0, 0.3) for i in range(3)]
+    return ArbitrageOpportunity(
+        "op-basket", "event-1", -1, -1, 0.9, 1.0, 11.1, 100.0, datetime(2026, 1, 1),
+        strategy="cross_yes", legs=legs
+    )
+
+
+def _executor(api: FakeAPI, concurrent_legs: bool = False) -> TradeExecutor:
+    return TradeExecutor(api, OrderSigner(PRIVATE_KEY), enable_trading=True, concurrent_legs=concurrent_legs)
+
+
+@pytest.mark.parametrize("concurrent_legs", [False, True])
+def test_failed_leg_cancels_placed_leg(concurrent_legs):
+    api = FakeAPI(failing={("m1", 1, False)})
+    executor = _executor(api, concurrent_legs)
+    try:
+        assert executor.execute_arbitrage(_pair_opportunity(), 10) is None
+    finally:
+        executor.shutdown()
+
+    # 并发提交时两腿的先后不确定，按下单记录找到成功的买入腿
+    placed = [f"order-{i + 1}" for i, order in enumerate(api.created) if order["is_buy"]]
+    assert len(api.created) == 2
+    assert api.cancelled == placed
+    assert executor.active_trades == {}
+
+
+def test_failed_cancel_places_offsetting_order():
+    api = FakeAPI(failing={("m1", 1, False)}, cancel_succeeds=False)
+    executor = _executor(api)
+
+    assert executor.execute_arbitrage(_pair_opportunity(), 10) is None
+
+    assert api.cancelled == ["order-1"]
+    first, _, offset = api.created
+    assert (offset["market_id"], offset["token_id"], offset["price"], offset["quantity"]) == \
+        (first["market_id"], first["token_id"], first["price"], first["quantity"])
+    assert first["is_buy"] and not offset["is_buy"]
+
+
+def test_concurrent_basket_unwinds_every_placed_leg():
+    api = FakeAPI(failing={("m1", 0, True)})
+    executor = _executor(api, concurrent_legs=True)
+    try:
+        assert executor.execute_arbitrage(_basket_opportunity(), 10) is None
+    finally:
+        executor.shutdown()
+
+    placed = {f"order-{i + 1}" for i, order in enumerate(api.created) if order["market_id"] != "m1"}
+    assert len(api.created) == 3
+    assert sorted(api.cancelled) == sorted(placed)
+
+
+def test_sequential_basket_stops_at_failed_leg():
+    api = FakeAPI(failing={("m1", 0, True)})
+    executor = _executor(api)
+
+    assert executor.execute_arbitrage(_basket_opportunity(), 10) is None
+
+    # 第三腿不再提交，只撤销第一腿
+    assert [order["market_id"] for order in api.created] == ["m0", "m1"]
+    assert api.cancelled == ["order-1"]
+
+
+def test_all_legs_placed_records_trade():
+    api = FakeAPI()
+    executor = _executor(api, concurrent_legs=True)
+    try:
+        trade = executor.execute_arbitrage(_basket_opportunity(), 10)
+    finally:
+        executor.shutdown()
+
+    assert trade is not None and trade.status == "executed"
+    assert len(trade.leg_orders) == 3
+    assert api.cancelled == []
+    assert executor.active_trades == {trade.trade_id: trade}
+
+
+ORDER_DATA = {"market_id": "m1", "token_id": "0", "price": 0.4, "quantity": 10, "is_buy": True}
+
+
+def test_order_hash_is_keccak_of_order_fields():
+    signer = OrderSigner(PRIVATE_KEY)
+
+    assert signer._create_order_hash(ORDER_DATA) == keccak(b"m100.410True")
+
+
+def test_signature_recovers_signer_address():
+    signer = OrderSigner(PRIVATE_KEY)
+    signature = signer.sign_order(ORDER_DATA)
+    assert signature is not None
+
+    # 签名对象是 EIP-191 (personal_sign) 包装后的订单哈希
+    message = encode_defunct(primitive=signer._create_order_hash(ORDER_DATA))
+    assert Account.recover_message(message, signature=bytes.fromhex(signature.removeprefix("0x"))) == signer.address
+
+
+def test_tampered_order_does_not_recover_signer():
+    signer = OrderSigner(PRIVATE_KEY)
+    signature = signer.sign_order(ORDER_DATA)
+
+    tampered = encode_defunct(primitive=signer._create_order_hash({**ORDER_DATA, "price": 0.41}))
+    assert Account.recover_message(tampered, signature=bytes.fromhex(signature.removeprefix("0x"))) != signer.address
+
+
+def test_uninitialised_signer_returns_none():
+    signer = OrderSigner("not-a-key")
+
+    assert signer.address is None
+    assert signer.sign_order(ORDER_DATA) is None